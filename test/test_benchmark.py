@@ -0,0 +1,385 @@
+import os
+import logging
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import pytest
+import numpy as np
+import PIL.Image
+import trimesh
+import pyvista as pv
+import vision6D as vis
+
+logger = logging.getLogger("vision6D")
+np.set_printoptions(suppress=True)
+
+def run_isolated(code):
+    """Run `code` in a fresh interpreter and return (wall time, peak RSS in MB) measured inside it"""
+    script = f"""
+import resource, time
+import numpy as np
+import vision6D as vis
+baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+start = time.perf_counter()
+{code}
+elapsed = time.perf_counter() - start
+print(elapsed, (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline) / 1024)
+"""
+    output = subprocess.run([sys.executable, "-c", script], check=True, capture_output=True, text=True).stdout
+    elapsed, peak_rss = output.split()[-2:]
+    return float(elapsed), float(peak_rss)
+
+def import_time(module):
+    """Import `module` in a fresh interpreter with `-X importtime`, returns {imported module: cumulative seconds}"""
+    stderr = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], check=True, capture_output=True, text=True).stderr
+    imported = {}
+    for line in stderr.splitlines():
+        fields = line.replace("import time:", "", 1).split("|")
+        if len(fields) != 3 or not fields[1].strip().isdigit(): continue
+        imported[fields[2].strip()] = int(fields[1]) / 1e6
+    return imported
+
+@pytest.mark.parametrize("module", ["vision6D", "vision6D.config", "vision6D.utils", "vision6D.raster", "vision6D.dataset"])
+def test_benchmark_import_time(module):
+    # regression guard for headless workers: no Qt and no gt pose loading at import
+    imported = import_time(module)
+    logger.debug(f"import {module}: {imported[module]:.3f} s, {len(imported)} modules")
+    assert not any(name.split(".")[0] in ("PyQt5", "pyvistaqt", "qtpy") for name in imported)
+    assert "vision6D.interface" not in imported and "vision6D.mainwindow" not in imported
+    if module == "vision6D": assert imported[module] < 0.5
+
+@pytest.mark.parametrize(
+    "mesh_path",
+    [vis.config.OSSICLES_MESH_PATH_5997_right,
+    vis.config.FACIAL_NERVE_MESH_PATH_5997_right,
+    vis.config.SCALA_TYMPANI_MESH_PATH_5997_right,
+    ]
+)
+def test_benchmark_meshfile(mesh_path):
+    # the legacy reader copies every block through np.fromfile, the MeshFile maps them
+    readers = {
+        "load_meshobj": f"mesh = vis.utils.load_meshobj(r'{mesh_path}'); mesh.vertices.sum(); mesh.triangles.sum()",
+        "MeshFile": f"mesh = vis.utils.MeshFile(r'{mesh_path}'); mesh.vertices.sum(); mesh.triangles.sum()",
+        "load_trimesh": f"mesh = vis.utils.load_trimesh(r'{mesh_path}')",
+    }
+    for name, code in readers.items():
+        elapsed, peak_rss = run_isolated(code)
+        logger.debug(f"{name:>14}: {elapsed * 1000:.2f} ms, peak RSS +{peak_rss:.2f} MB")
+
+    meshobj = vis.utils.load_meshobj(mesh_path)
+    meshfile = vis.utils.MeshFile(mesh_path)
+    assert (meshfile.vertices.T == meshobj.vertices).all()
+    assert (meshfile.triangles.T == meshobj.triangles).all()
+
+@pytest.mark.parametrize(
+    "mesh_path",
+    [vis.config.OSSICLES_MESH_PATH_5997_right,
+    vis.config.SCALA_TYMPANI_MESH_PATH_5997_right,
+    ]
+)
+def test_benchmark_mesh_cache(tmp_path, mesh_path):
+    mesh_cache = vis.cache.MeshCache(cache_dir=tmp_path)
+
+    start = time.perf_counter()
+    mesh = vis.utils.load_trimesh(mesh_path)
+    mesh_data = pv.wrap(mesh)
+    logger.debug(f"parse + pv.wrap: {(time.perf_counter() - start) * 1000:.2f} ms")
+
+    start = time.perf_counter()
+    mesh_cache.load_polydata(mesh_path)
+    logger.debug(f"cold cache: {(time.perf_counter() - start) * 1000:.2f} ms")
+
+    start = time.perf_counter()
+    cached_data = mesh_cache.load_polydata(mesh_path)
+    logger.debug(f"warm cache: {(time.perf_counter() - start) * 1000:.2f} ms")
+
+    assert (cached_data.points == mesh_data.points).all()
+    assert (cached_data.faces == mesh_data.faces).all()
+
+@pytest.mark.parametrize(
+    "mesh_path",
+    [vis.config.OSSICLES_MESH_PATH_5997_right,
+    vis.config.SCALA_TYMPANI_MESH_PATH_5997_right,
+    ]
+)
+def test_benchmark_render_session(mesh_path):
+    mesh = vis.utils.load_trimesh(mesh_path)
+    colors = vis.utils.color_mesh(mesh.vertices, nocs=True)
+    camera = pv.Camera()
+    camera.position = (0, 0, -500)
+    camera.focal_point = (0, 0, 0)
+    camera.up = (0, -1, 0)
+    poses = [vis.config.gt_pose_5997_right @ trimesh.transformations.rotation_matrix(np.deg2rad(i * 5), (0, 0, 1)) for i in range(10)]
+
+    # what the export buttons used to do: clear the plotter and add a freshly wrapped mesh for every frame
+    render = pv.Plotter(window_size=[1920, 1080], lighting=None, off_screen=True)
+    render.set_background('black')
+    expected = []
+    start = time.perf_counter()
+    for pose in poses:
+        render.clear()
+        actor = render.add_mesh(pv.wrap(mesh), scalars=colors, rgb=True, style='surface', opacity=1, name="mesh")
+        actor.user_matrix = pose
+        render.camera = camera.copy()
+        render.disable(); render.show(auto_close=False)
+        expected.append(render.last_image)
+    logger.debug(f"pv.Plotter per frame: {len(poses) / (time.perf_counter() - start):.2f} FPS")
+    render.close()
+
+    session = vis.render.RenderSession((1920, 1080))
+    images = []
+    start = time.perf_counter()
+    for pose in poses:
+        session.set_mesh("mesh", mesh.vertices, mesh.faces, colors=colors, user_matrix=pose)
+        images.append(session.show(["mesh"], camera.copy()))
+    logger.debug(f"RenderSession: {len(poses) / (time.perf_counter() - start):.2f} FPS")
+
+    for image, expected_image in zip(images, expected): assert (image == expected_image).all()
+
+def test_benchmark_render_farm(tmp_path):
+    cases = [(vis.config.OSSICLES_MESH_PATH_455_right, vis.config.gt_pose_455_right),
+             (vis.config.OSSICLES_MESH_PATH_5997_right, vis.config.gt_pose_5997_right),
+             (vis.config.OSSICLES_MESH_PATH_6088_right, vis.config.gt_pose_6088_right),
+             (vis.config.OSSICLES_MESH_PATH_6108_right, vis.config.gt_pose_6108_right)]
+    rows = ["mesh,pose"]
+    for i, (mesh_path, gt_pose) in enumerate(cases):
+        # a few perturbed poses per case
+        for j in range(8):
+            pose = gt_pose.copy()
+            pose[:3, 3] += np.random.default_rng(j).normal(0, 0.5, 3)
+            np.save(tmp_path / f"pose_{i}_{j}.npy", pose)
+            rows.append(f"{mesh_path},pose_{i}_{j}.npy")
+    with open(tmp_path / "manifest.csv", "w") as f: f.write("\n".join(rows))
+    manifest = vis.dataset.read_manifest(tmp_path / "manifest.csv")
+
+    for workers in sorted({1, 2, os.cpu_count()}):
+        start = time.perf_counter()
+        vis.dataset.render_dataset(manifest, tmp_path / f"output_{workers}", workers=workers)
+        logger.debug(f"{workers} workers: {len(manifest) / (time.perf_counter() - start):.2f} FPS")
+
+    # the workers render exactly what the single plotter renders
+    for row in manifest:
+        expected = np.load(tmp_path / "output_1" / "depth" / f"{row['name']}.npy")
+        for workers in sorted({2, os.cpu_count()}):
+            assert np.array_equal(np.load(tmp_path / f"output_{workers}" / "depth" / f"{row['name']}.npy"), expected, equal_nan=True)
+
+def test_benchmark_render_pose_sweep():
+    # jitter the gt pose with small rotations and translations
+    rng = np.random.default_rng(0)
+    poses = []
+    for _ in range(20):
+        pose = vis.config.gt_pose_5997_right @ trimesh.transformations.rotation_matrix(np.deg2rad(rng.normal(0, 2)), rng.normal(size=3))
+        pose[:3, 3] += rng.normal(0, 0.5, 3)
+        poses.append(pose)
+    poses = np.array(poses)
+
+    expected = []
+    start = time.perf_counter()
+    for pose in poses[:5]:
+        app = vis.App(off_screen=True)
+        app.set_transformation_matrix(pose)
+        app.load_meshes({'ossicles': vis.config.OSSICLES_MESH_PATH_5997_right})
+        expected.append(app.plot(return_depth_map=True))
+    logger.debug(f"App per pose: {5 / (time.perf_counter() - start):.2f} FPS")
+
+    app = vis.App(off_screen=True)
+    app.set_transformation_matrix(poses[0])
+    app.load_meshes({'ossicles': vis.config.OSSICLES_MESH_PATH_5997_right})
+    start = time.perf_counter()
+    frames = list(app.render_pose_sweep(poses))
+    logger.debug(f"render_pose_sweep: {len(poses) / (time.perf_counter() - start):.2f} FPS")
+
+    assert len(frames) == len(poses)
+    for (color_mask, depth_map), (expected_color_mask, expected_depth_map) in zip(frames, expected):
+        assert (color_mask == expected_color_mask).all()
+        assert np.array_equal(depth_map, expected_depth_map, equal_nan=True)
+
+def test_benchmark_image_backend():
+    # a 4K frame behind the ossicles, rendered while the camera orbits like an interactor drag
+    y, x = np.mgrid[0:2160, 0:3840]
+    image = np.stack((x * 256 // 3840, y * 256 // 2160, (x + y) * 256 // 6000), axis=-1).astype(np.uint8)
+    images = {}
+    for backend in ("grid", "texture"):
+        app = vis.App(off_screen=True, image_backend=backend)
+        app.set_transformation_matrix(vis.config.gt_pose_5997_right)
+        app.load_image(image, scale_factor=[0.005, 0.005, 1])
+        app.load_meshes({'ossicles': vis.config.OSSICLES_MESH_PATH_5997_right})
+        images[backend] = app.plot()
+        start = time.perf_counter()
+        for _ in range(10):
+            app.plotter.camera.azimuth += 0.5
+            app.plotter.render()
+        logger.debug(f"{backend} image backend: {10 / (time.perf_counter() - start):.2f} FPS")
+
+    # the texel centers fall on the grid points, only the interpolation between them differs
+    assert (np.abs(images["grid"].astype(int) - images["texture"].astype(int)) <= 2).mean() > 0.99
+
+def test_benchmark_scene_batch():
+    # a keypress that changes the opacity and the pose of 12 loaded meshes
+    plotter = pv.Plotter(window_size=[1920, 1080], off_screen=True)
+    mesh = vis.utils.load_trimesh(vis.config.OSSICLES_MESH_PATH_5997_right)
+    actors = {f"mesh_{i}": plotter.add_mesh(pv.wrap(mesh), opacity=1, name=f"mesh_{i}") for i in range(12)}
+    camera = pv.Camera()
+    camera.position = (0, 0, -500)
+    camera.focal_point = (0, 0, 0)
+    camera.up = (0, -1, 0)
+    plotter.camera = camera
+    plotter.show(auto_close=False)
+
+    # what the opacity and pose handlers used to do: re-add every actor to apply a change
+    start = time.perf_counter()
+    for i in range(10):
+        for name, actor in actors.items():
+            actor.user_matrix = vis.config.gt_pose_5997_right
+            actor.GetProperty().opacity = 1 - (i % 2) * 0.2
+            plotter.add_actor(actor, pickable=True, name=name)
+        plotter.render()
+    expected = plotter.screenshot(return_img=True)
+    logger.debug(f"add_actor per actor: {(time.perf_counter() - start) / 10 * 1000:.1f} ms per keypress")
+
+    scene = vis.layers.SceneBatch(plotter)
+    start = time.perf_counter()
+    for i in range(10):
+        with scene:
+            for actor in actors.values():
+                scene.set_matrix(actor, vis.config.gt_pose_5997_right)
+                scene.set_opacity(actor, 1 - (i % 2) * 0.2)
+    logger.debug(f"SceneBatch: {(time.perf_counter() - start) / 10 * 1000:.1f} ms per keypress")
+
+    assert (plotter.screenshot(return_img=True) == expected).all()
+
+def test_benchmark_pose_journal(tmp_path):
+    # the journal is written from the pick and release callbacks, it should not be noticeable
+    poses = [trimesh.transformations.translation_matrix((0, 0, 300)) @ trimesh.transformations.rotation_matrix(np.deg2rad(i * 0.1), (0, 0, 1)) for i in range(10000)]
+    with vis.journal.PoseJournal(tmp_path / "session.journal") as journal:
+        start = time.perf_counter()
+        for pose in poses: journal.append("5997_right_ossicles_processed", pose)
+        elapsed = (time.perf_counter() - start) / len(poses)
+    logger.debug(f"append: {elapsed * 1e6:.1f} us per pose")
+
+    start = time.perf_counter()
+    journal = vis.journal.PoseJournal(tmp_path / "session.journal")
+    logger.debug(f"replay {len(poses)} records: {(time.perf_counter() - start) * 1000:.1f} ms")
+    journal.close()
+
+    assert elapsed < 1e-3
+    assert (journal.restored["5997_right_ossicles_processed"] == poses[-1]).all()
+
+def test_benchmark_pnp_solvers():
+    # runtime against the pose error of every backend on a synthetic nocs render of the gt pose
+    app = vis.App(off_screen=True)
+    mesh = vis.cache.load_trimesh(vis.config.OSSICLES_MESH_PATH_5997_right)
+    gt_pose = vis.config.gt_pose_5997_right
+    colors = vis.utils.color_mesh(mesh.vertices, nocs=True)
+    color_mask = vis.raster.rasterize(mesh.vertices, mesh.faces, colors, app.camera_intrinsics, gt_pose, app.window_size[0], app.window_size[1], app.camera.position)[0]
+    pts3d, pts2d = vis.utils.create_2d_3d_pairs(color_mask, mesh.vertices)
+
+    errors = {}
+    for backend in ["epnp", "sqpnp", "ap3p", "iterative"]:
+        for refine in [None, "lm", "vvs"]:
+            solver = vis.pnp.PnPSolver(backend, refine=refine)
+            start = time.perf_counter()
+            predicted_pose, inliers = solver.solve(pts2d, pts3d, app.camera_intrinsics, app.camera.position)
+            elapsed = time.perf_counter() - start
+            errors[(backend, refine)] = vis.pnp.pose_error(predicted_pose, gt_pose)
+            logger.debug(f"{solver}: {elapsed * 1000:.1f} ms, {len(inliers)}/{len(pts2d)} inliers, rotation {errors[(backend, refine)][0]:.3f} deg, translation {errors[(backend, refine)][1]:.3f} mm")
+
+    # the refinement should never make a pose worse
+    for backend in ["epnp", "sqpnp", "ap3p", "iterative"]:
+        assert errors[(backend, "lm")][0] <= errors[(backend, None)][0] + 1e-3
+    assert all(rotation_error < 2 and translation_error < 2 for rotation_error, translation_error in errors.values())
+
+@pytest.mark.parametrize("window_size", [(1920, 1080), (3840, 2160)])
+def test_benchmark_correspondences(window_size):
+    # a nocs colored disc, about the size of the ossicles in a close up frame
+    width, height = window_size
+    rng = np.random.default_rng(0)
+    rows, cols = np.mgrid[:height, :width]
+    disc = (cols - width * 0.55) ** 2 + (rows - height * 0.45) ** 2 < (height * 0.2) ** 2
+    color_mask = np.zeros((height, width, 3), dtype=np.uint8)
+    color_mask[disc] = rng.integers(1, 256, (disc.sum(), 3))
+
+    def where_pairs():
+        # what create_2d_3d_pairs did before the fused extraction
+        binary_mask = np.zeros(color_mask[..., :1].shape, dtype=np.uint8)
+        x, y, _ = np.where(color_mask != [0., 0., 0.])
+        binary_mask[x, y] = 1
+        idx = np.where(binary_mask == 1)[:2][::-1]
+        pts = np.stack((idx[0], idx[1]), axis=1)
+        return pts, color_mask[pts[:, 1], pts[:, 0]]
+
+    timings = {}
+    for name, extract in {"np.where": where_pairs, "fused": lambda: vis.utils.extract_correspondences(color_mask)}.items():
+        start = time.perf_counter()
+        result = extract()
+        elapsed = time.perf_counter() - start
+        tracemalloc.start()
+        extract()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        timings[name] = elapsed, peak
+        logger.debug(f"{name} {width}x{height}: {elapsed * 1000:.1f} ms, {peak / 2**20:.1f} MiB peak allocations")
+    pts, rgb = where_pairs()
+
+    assert (result[:, :2] == pts).all() and (result[:, 2:] == rgb).all()
+    assert timings["fused"][1] < timings["np.where"][1]
+    # a stride keeps the pixels on the full frame grid whether or not the frame is cropped
+    assert (vis.utils.extract_correspondences(color_mask, stride=4) == vis.utils.extract_correspondences(color_mask, stride=4, roi=False)).all()
+
+@pytest.mark.parametrize("case_id", ["5997", "6088", "6108"])
+def test_benchmark_correspondence_sampler(case_id):
+    # the nocs cases of test_pnp_from_dataset_with_seg_mask, solved with all the correspondences and with samples of them
+    seg_mask_path, ossicles_path = getattr(vis.config, f"SEG_MASK_PATH_{case_id}"), getattr(vis.config, f"OSSICLES_MESH_PATH_{case_id}_right")
+    gt_pose_path = vis.config.OP_DATA_DIR / "gt_poses" / f"{case_id}_right_gt_pose.npy"
+    if not (seg_mask_path.exists() and ossicles_path.exists() and gt_pose_path.exists()): pytest.skip(f"no data for case {case_id}")
+    RT = getattr(vis.config, f"gt_pose_{case_id}_right")
+
+    app = vis.App(off_screen=True, nocs_color=True, point_clouds=False)
+    seg_mask = np.expand_dims(np.array(PIL.Image.open(seg_mask_path)).astype("bool"), axis=-1)
+    app.set_transformation_matrix(RT)
+    app.load_meshes({'ossicles': ossicles_path})
+    color_mask = (app.plot() * seg_mask).astype(np.uint8)
+    pts3d, pts2d = vis.utils.create_2d_3d_pairs(color_mask, app.ossicles_mesh.vertices)
+
+    errors = {}
+    for sampler in [None, "grid", "farthest", "edge"]:
+        solver = vis.pnp.PnPSolver(sampler=sampler, samples=1000)
+        start = time.perf_counter()
+        predicted_pose, inliers = solver.solve(pts2d, pts3d, app.camera_intrinsics, app.camera.position)
+        elapsed = time.perf_counter() - start
+        errors[sampler] = rotation_error, translation_error = vis.pnp.pose_error(predicted_pose, RT)
+        logger.debug(f"{sampler} of {len(pts2d)} correspondences: {elapsed * 1000:.1f} ms, {len(inliers)} inliers, rotation {rotation_error:.3f} deg, translation {translation_error:.3f} mm")
+
+    # the 8-bit colors of a predicted mask are a few mm off, the samples should not lose much more
+    assert errors[None][0] < 5 and errors[None][1] < 10
+    for sampler in ["grid", "farthest", "edge"]:
+        assert errors[sampler][0] < errors[None][0] + 1 and errors[sampler][1] < errors[None][1] + 2
+
+def test_benchmark_mesh_actor_geometry():
+    # the exports and the solves ask for the geometry of the same actors again and again
+    plotter = pv.Plotter(off_screen=True)
+    mesh = trimesh.creation.icosphere(6, 5)
+    mesh_data = pv.wrap(mesh)
+    mesh_data.point_data["colors"] = vis.utils.color_mesh(mesh.vertices)
+    actor = plotter.add_mesh(mesh_data, scalars="colors", rgb=True)
+    plotter.show(auto_close=False)
+
+    start = time.perf_counter()
+    vertices, faces = vis.utils.get_mesh_actor_vertices_faces(actor)
+    first = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(100): assert vis.utils.get_mesh_actor_vertices_faces(actor)[0] is vertices
+    cached = (time.perf_counter() - start) / 100
+    logger.debug(f"get_mesh_actor_vertices_faces: {first * 1000:.2f} ms, then {cached * 1e6:.1f} us cached")
+    assert (vertices == mesh.vertices).all() and (faces == mesh.faces).all()
+    assert not vertices.flags.writeable and cached < first
+
+    # a modified actor is read again
+    mesh_data.points[0] = (9, 9, 9)
+    plotter.render()
+    assert (vis.utils.get_mesh_actor_vertices_faces(actor)[0][0] == (9, 9, 9)).all()
+    mesh_data.point_data["colors"] = np.zeros((len(vertices), 3))
+    plotter.render()
+    assert (vis.utils.get_mesh_actor_scalars(actor) == 0).all()
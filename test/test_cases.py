@@ -0,0 +1,59 @@
+import logging
+import time
+
+import pytest
+import numpy as np
+import vision6D as vis
+
+logger = logging.getLogger("vision6D")
+np.set_printoptions(suppress=True)
+
+@pytest.fixture
+def data_dir(tmp_path):
+    for folder, case_id, side in [("CIP.455.8381493978235_video_trim", "455", "right"), ("CIP.6742.8381574350255_video_trim", "6742", "left")]:
+        meshes = tmp_path / "data" / "surgical_planning" / folder / "mesh" / "processed_meshes"
+        meshes.mkdir(parents=True)
+        for organ in ("ossicles", "facial_nerve", "chorda", "scala_tympani"): (meshes / f"{case_id}_{side}_{organ}_processed.mesh").touch()
+        (tmp_path / "data" / "frames" / folder).mkdir(parents=True)
+        (tmp_path / "data" / "frames" / folder / f"{folder}_0.png").touch()
+        (tmp_path / "seg" / f"{folder}_right_with_poses" / "seg_masks" / "ossicles").mkdir(parents=True)
+        (tmp_path / "seg" / f"{folder}_right_with_poses" / "seg_masks" / "ossicles" / f"{folder}.png").touch()
+    (tmp_path / "data" / "gt_poses").mkdir()
+    np.save(tmp_path / "data" / "gt_poses" / "455_right_gt_pose.npy", np.eye(4))
+    return tmp_path
+
+def test_case_index(data_dir):
+    index = vis.cases.CaseIndex(data_dir / "data", data_dir / "seg", data_dir / "case_index.json")
+    assert len(index) == 2 and ("455", "right") in index and ("455", "left") not in index
+    assert index.mesh_path(455, "right", "chorda") == data_dir / "data" / "surgical_planning" / "CIP.455.8381493978235_video_trim" / "mesh" / "processed_meshes" / "455_right_chorda_processed.mesh"
+    assert (index.gt_pose(455) == np.eye(4)).all()
+    assert index.get(6742, "left")["gt_pose"] is None
+    assert index.find("CIP.6742.8381574350255_video_trim_12.png")["side"] == "left"
+    with pytest.raises(KeyError): index.get(6088)
+
+    # a second index is read from the JSON file, until a new case is added
+    assert (data_dir / "case_index.json").exists()
+    assert vis.cases.CaseIndex(data_dir / "data", data_dir / "seg", data_dir / "case_index.json").cases == index.cases
+    meshes = data_dir / "data" / "surgical_planning" / "CIP.6088.1681356523312_video_trim" / "mesh" / "processed_meshes"
+    meshes.mkdir(parents=True)
+    (meshes / "6088_right_ossicles_processed.mesh").touch()
+    assert ("6088", "right") in vis.cases.CaseIndex(data_dir / "data", data_dir / "seg", data_dir / "case_index.json")
+
+    # or a file is added to the folder of an existing case
+    np.save(data_dir / "data" / "gt_poses" / "6742_left_gt_pose.npy", np.eye(4))
+    (data_dir / "data" / "frames" / "CIP.6088.1681356523312_video_trim").mkdir()
+    (data_dir / "data" / "frames" / "CIP.6088.1681356523312_video_trim" / "CIP.6088.1681356523312_video_trim_0.png").touch()
+    (meshes / "6088_right_chorda_processed.mesh").touch()
+    index = vis.cases.CaseIndex(data_dir / "data", data_dir / "seg", data_dir / "case_index.json")
+    assert index.get(6742, "left")["gt_pose"] is not None and index.get(6088)["image"] is not None and "chorda" in index.get(6088)["meshes"]
+
+@pytest.mark.skipif(not vis.config.OP_DATA_DIR.is_dir(), reason=f"no data directory {vis.config.OP_DATA_DIR}")
+def test_case_index_config():
+    # the index finds the same files as the hand-written constants
+    start = time.perf_counter()
+    index = vis.cases.get_case_index()
+    logger.debug(f"CaseIndex: {time.perf_counter() - start:.3f} s for {len(index)} cases")
+    for case_id, side in [("455", "right"), ("5997", "right"), ("6088", "right"), ("6742", "left"), ("6087", "left")]:
+        assert index.mesh_path(case_id, side) == getattr(vis.config, f"OSSICLES_MESH_PATH_{case_id}_{side}")
+        assert index.mesh_path(case_id, side, "facial_nerve") == getattr(vis.config, f"FACIAL_NERVE_MESH_PATH_{case_id}_{side}")
+        assert (index.gt_pose(case_id, side) == getattr(vis.config, f"gt_pose_{case_id}_{side}")).all()
@@ -3,6 +3,7 @@ import pytest
 import PIL
 import matplotlib.pyplot as plt
 import numpy as np
+import trimesh
 import cv2
 from scipy.spatial.transform import Rotation as R
 import vision6D as vis
@@ -368,7 +369,6 @@ def test_pnp_from_dataset_with_seg_mask(seg_mask_path, ossicles_path, RT, resize
         # swap the points for opencv, maybe because they handle RGB image differently (RGB -> BGR in opencv)
         idx = idx[:2][::-1]
         pts2d = np.stack((idx[0], idx[1]), axis=1)
-        pts3d = []
         
         # Obtain the rg color
         color = color_mask[pts2d[:,1], pts2d[:,0]][..., :2]
@@ -376,20 +376,8 @@ def test_pnp_from_dataset_with_seg_mask(seg_mask_path, ossicles_path, RT, resize
         gx = color[:, 0]
         gy = color[:, 1]
 
-        # lst = []
-        lat = np.array(app.latlon[..., 0])
-        lon = np.array(app.latlon[..., 1])
-        lonf = lon[mesh.faces]
-        msk = (np.sum(lonf>=0, axis=1)==3) & (np.sum(lat[mesh.faces]>=0, axis=1)==3)
-        for i in range(len(pts2d)):
-            pt = vis.utils.latLon2xyz(mesh, lat, lonf, msk, gx[i], gy[i])
-            pts3d.append(pt)
-        #     if (pt != [0, 0, 0]).all():
-        #         lst.append(i)
-        #         pts3d.append(pt)
-
-        # pts2d = pts2d[lst]
-        pts3d = np.array(pts3d).reshape((len(pts3d), 3))
+        app.latlon_index = vis.utils.get_latlon_index(app.latlon, mesh.faces, app.latlon_index)
+        pts3d = app.latlon_index.query(mesh.vertices, gx, gy)
 
         # use EPNP to predict the pose
         predicted_pose = vis.utils.solve_epnp_cv2(pts2d, pts3d, app.camera_intrinsics, app.camera.position)
@@ -403,4 +391,40 @@ def test_pnp_from_dataset_with_seg_mask(seg_mask_path, ossicles_path, RT, resize
         #     predicted_pose[:3, :3] = cv2.Rodrigues(rotation_vector)[0]
         #     predicted_pose[:3, 3] = np.squeeze(translation_vector) + np.array(app.cam_position)
 
-        print('hhh')
\ No newline at end of file
+        print('hhh')
+
+def test_render_dataset(tmp_path):
+    cases = [(vis.config.OSSICLES_MESH_PATH_5997_right, vis.config.gt_pose_5997_right, vis.config.SEG_MASK_PATH_5997),
+             (vis.config.OSSICLES_MESH_PATH_6088_right, vis.config.gt_pose_6088_right, vis.config.SEG_MASK_PATH_6088)]
+    rows = ["mesh,pose,seg_mask"]
+    for i, (mesh_path, gt_pose, seg_mask_path) in enumerate(cases):
+        np.save(tmp_path / f"pose_{i}.npy", gt_pose)
+        rows.append(f"{mesh_path},pose_{i}.npy,{seg_mask_path}")
+    with open(tmp_path / "manifest.csv", "w") as f: f.write("\n".join(rows))
+
+    vis.dataset.main([str(tmp_path / "manifest.csv"), str(tmp_path / "output")])
+
+    for i, (mesh_path, gt_pose, _) in enumerate(cases):
+        name = f"{mesh_path.stem}_{i}"
+        assert (tmp_path / "output" / "color_mask" / f"{name}.png").exists()
+        depth_map = np.load(tmp_path / "output" / "depth" / f"{name}.npy")
+        assert np.isclose(-500 - np.nanmean(depth_map), gt_pose[2, 3], atol=2)
+        assert (np.load(tmp_path / "output" / "gt_poses" / f"{name}.npy") == gt_pose).all()
+
+def test_plot_reload_mesh():
+    # the frames of a dataset reuse the actors, a mesh or a style loaded under the same name is drawn anew
+    app = vis.App(off_screen=True, nocs_color=True)
+    app.set_transformation_matrix(np.array([[1, 0, 0, 0], [0, 1, 0, 0], [0, 0, 1, 300], [0, 0, 0, 1]]))
+    app.load_meshes({'mesh': trimesh.creation.icosphere(3, 5)})
+    sphere = app.plot().any(axis=-1).sum()
+    app.load_meshes({'mesh': trimesh.creation.box((30, 30, 30))})
+    box = app.plot().any(axis=-1).sum()
+    assert box > sphere and len(app.plotter.renderer.actors) == 1
+
+    expected = vis.App(off_screen=True, nocs_color=True)
+    expected.set_transformation_matrix(app.transformation_matrix)
+    expected.load_meshes({'mesh': trimesh.creation.box((30, 30, 30))})
+    assert box == expected.plot().any(axis=-1).sum()
+
+    app.point_clouds = True
+    assert app.plot().any(axis=-1).sum() < box
@@ -0,0 +1,53 @@
+import logging
+import time
+
+import pytest
+import numpy as np
+import PIL.Image
+import cv2
+import vision6D as vis
+
+logger = logging.getLogger("vision6D")
+np.set_printoptions(suppress=True)
+
+@pytest.fixture
+def frames(tmp_path):
+    rng = np.random.default_rng(0)
+    frames = [rng.integers(0, 256, (108, 192, 3), dtype=np.uint8) for _ in range(30)]
+    for i, frame in enumerate(frames): PIL.Image.fromarray(frame).save(tmp_path / f"CIP.455.8381493978235_video_trim_{i}.png")
+    return tmp_path, frames
+
+def test_frame_sequence(frames):
+    folder, expected = frames
+    with vis.frames.FrameSequence(folder, capacity=8, prefetch=4) as sequence:
+        assert len(sequence) == len(expected)
+        # frame 10 sorts after frame 9
+        assert sequence.name(10).name == "CIP.455.8381493978235_video_trim_10.png"
+        assert sequence.index(folder / "CIP.455.8381493978235_video_trim_12.png") == 12
+
+        # scrub forward, back and jump around
+        for i in list(range(30)) + list(range(29, -1, -1)) + [15, 3, -1]: assert (sequence[i] == expected[i]).all()
+        assert len(sequence.buffer) <= 8
+        with pytest.raises(IndexError): sequence[30]
+
+        # the frames ahead, in the stepping direction, are decoded in the background
+        sequence[9], sequence[10]
+        start = time.perf_counter()
+        while not all(i in sequence.buffer for i in range(11, 15)) and time.perf_counter() - start < 5: time.sleep(0.01)
+        assert all(i in sequence.buffer for i in range(11, 15))
+
+def test_frame_sequence_video(tmp_path, frames):
+    _, expected = frames
+    writer = cv2.VideoWriter(str(tmp_path / "video_trim.avi"), cv2.VideoWriter_fourcc(*"MJPG"), 25, (192, 108))
+    for frame in expected: writer.write(cv2.cvtColor(frame, cv2.COLOR_RGB2BGR))
+    writer.release()
+
+    capture = cv2.VideoCapture(str(tmp_path / "video_trim.avi"))
+    decoded = [cv2.cvtColor(capture.read()[1], cv2.COLOR_BGR2RGB) for _ in range(len(expected))]
+    capture.release()
+
+    with vis.frames.FrameSequence(tmp_path / "video_trim.avi", capacity=8, prefetch=4) as sequence:
+        assert len(sequence) == len(expected)
+        assert sequence.name(3) == tmp_path / "video_trim_3.png"
+        # seeking gives the same frames as reading the video in order
+        for i in [0, 1, 2, 20, 19, 18, 5, 29]: assert (sequence[i] == decoded[i]).all()
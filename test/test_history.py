@@ -0,0 +1,44 @@
+import logging
+
+import pytest
+import numpy as np
+import vision6D as vis
+
+logger = logging.getLogger("vision6D")
+np.set_printoptions(suppress=True)
+
+def translation(x):
+    pose = np.eye(4)
+    pose[0, 3] = x
+    return pose
+
+def test_pose_history():
+    history = vis.history.PoseHistory(capacity=4)
+    # click without moving, then drag from 0 to 1 and from 1 to 2
+    history.push("ossicles", translation(0))
+    history.push("ossicles", translation(0))
+    history.push("ossicles", translation(1))
+    assert history.undoable("ossicles") == 1
+
+    assert (history.undo("ossicles", translation(2)) == translation(1)).all()
+    assert (history.undo("ossicles", translation(1)) == translation(0)).all()
+    assert history.undo("ossicles", translation(0)) is None
+    assert (history.redo("ossicles", translation(0)) == translation(1)).all()
+    assert history.redoable("ossicles") == 1
+
+    # a new move drops what could be redone
+    history.push("ossicles", translation(1))
+    assert history.redo("ossicles", translation(5)) is None and history.redoable("ossicles") == 0
+    assert (history.undo("ossicles", translation(5)) == translation(1)).all()
+
+    # every actor has its own history
+    assert history.undo("facial_nerve", translation(0)) is None
+
+def test_pose_history_capacity():
+    history = vis.history.PoseHistory(capacity=4)
+    for x in range(10): history.push("ossicles", translation(x))
+    # only the last 4 poses are kept, the buffer is never reallocated
+    assert history.rings["ossicles"]["poses"].shape == (4, 4, 4)
+    poses = [history.undo("ossicles", translation(9))]
+    while poses[-1] is not None: poses.append(history.undo("ossicles", poses[-1]))
+    assert [pose[0, 3] for pose in poses[:-1]] == [8, 7, 6]
@@ -0,0 +1,66 @@
+import logging
+
+import pytest
+import numpy as np
+import vision6D as vis
+
+logger = logging.getLogger("vision6D")
+np.set_printoptions(suppress=True)
+
+def translation(x):
+    pose = np.eye(4)
+    pose[0, 3] = x
+    return pose
+
+def test_pose_journal(tmp_path):
+    path = tmp_path / "session.journal"
+    journal = vis.journal.PoseJournal(path)
+    for x in range(3): journal.append("5997_right_ossicles_processed", translation(x))
+    journal.append("5997_right_ossicles_processed", translation(2))
+    journal.append("5997_right_facial_nerve_processed", translation(7))
+    assert path.stat().st_size == 4 * vis.journal.RECORD.itemsize
+
+    # a crash in the middle of the next record, which releases the lock of the session, then the next session replays the journal
+    journal.close()
+    with open(path, "ab") as f: f.write(b"\x00" * 10)
+    journal = vis.journal.PoseJournal(path)
+    assert sorted(journal.restored) == ["5997_right_facial_nerve_processed", "5997_right_ossicles_processed"]
+    assert (journal.restored["5997_right_ossicles_processed"] == translation(2)).all()
+    journal.append("5997_right_ossicles_processed", translation(3))
+    assert path.stat().st_size == 5 * vis.journal.RECORD.itemsize
+
+    # export the ossicles, only the facial nerve is left to restore
+    journal.compact({"5997_right_ossicles_processed": tmp_path / "5997_right_gt_pose.npy"})
+    assert (np.load(tmp_path / "5997_right_gt_pose.npy") == translation(3)).all()
+    journal.close()
+    with vis.journal.PoseJournal(path) as journal:
+        assert list(journal.restored) == ["5997_right_facial_nerve_processed"]
+        assert (journal.restored["5997_right_facial_nerve_processed"] == translation(7)).all()
+
+def test_pose_journal_names(tmp_path):
+    # a name longer than the record field is journaled, restored and compacted under the same key
+    path = tmp_path / "session.journal"
+    name = "CIP.455.8381493978235_video_trim_" * 3 + "ossicles"
+    with vis.journal.PoseJournal(path) as journal:
+        journal.append(name, translation(1))
+        journal.append(name[:-1], translation(2))
+    with vis.journal.PoseJournal(path) as journal:
+        assert len(journal.restored) == 2 and (journal.restore(name) == translation(1)).all()
+        journal.append(name, translation(3))
+        journal.compact({name: tmp_path / "455_right_gt_pose.npy"})
+        assert (np.load(tmp_path / "455_right_gt_pose.npy") == translation(3)).all()
+    with vis.journal.PoseJournal(path) as journal:
+        assert journal.restore(name) is None and (journal.restore(name[:-1]) == translation(2)).all()
+
+def test_pose_journal_sessions(tmp_path):
+    # a second session journals aside, its compaction leaves the records of the first one
+    path = tmp_path / "session.journal"
+    first, second = vis.journal.PoseJournal(path), vis.journal.PoseJournal(path)
+    assert first.path == path and second.path != path
+    first.append("5997_right_ossicles_processed", translation(1))
+    second.append("6088_right_ossicles_processed", translation(2))
+    second.compact({"6088_right_ossicles_processed": tmp_path / "6088_right_gt_pose.npy"})
+    first.append("5997_right_facial_nerve_processed", translation(3))
+    first.close()
+    second.close()
+    assert len(vis.journal.read_journal(path)) == 2 and len(vis.journal.read_journal(second.path)) == 0
@@ -0,0 +1,63 @@
+import json
+import logging
+import time
+
+import pytest
+import numpy as np
+import trimesh
+import vision6D as vis
+
+logger = logging.getLogger("vision6D")
+np.set_printoptions(suppress=True)
+
+@pytest.fixture
+def ossicles():
+    with open(vis.utils.CWD / "data" / "ossiclesCoordinateMapping.json", "r") as f: data = json.load(f)
+    mesh = trimesh.Trimesh(np.array(data['verts']), np.array(data['faces']), process=False)
+    latlon = vis.utils.load_latitude_longitude()
+    return mesh, latlon[..., 0], latlon[..., 1]
+
+def test_latlon_to_xyz(ossicles):
+    mesh, lat, lon = ossicles
+    rng = np.random.default_rng(0)
+    # 8-bit colors as read from a rendered mask, the vertices themselves and points outside of the domain
+    gx = np.concatenate((rng.integers(0, 256, 2000) / 255, lat[:100], rng.random(100) * 2 - 0.5))
+    gy = np.concatenate((rng.integers(0, 256, 2000) / 255, lon[:100], rng.random(100) * 2 - 0.5))
+
+    lonf = lon[mesh.faces]
+    msk = (np.sum(lonf>=0, axis=1)==3) & (np.sum(lat[mesh.faces]>=0, axis=1)==3)
+    start = time.perf_counter()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        expected = np.array([vis.utils.latLon2xyz(mesh, lat, lonf, msk, gx[i], gy[i]) for i in range(len(gx))])
+    logger.debug(f"latLon2xyz: {time.perf_counter() - start:.3f} s")
+
+    start = time.perf_counter()
+    pts3d = vis.utils.latlon_to_xyz(mesh, lat, lon, gx, gy)
+    logger.debug(f"latlon_to_xyz: {time.perf_counter() - start:.3f} s")
+
+    assert (pts3d == expected).all()
+
+def test_latlon_index(ossicles):
+    mesh, lat, lon = ossicles
+    rng = np.random.default_rng(1)
+    gx = np.concatenate((rng.integers(0, 256, 2000) / 255, rng.random(200) * 3 - 1.5))
+    gy = np.concatenate((rng.integers(0, 256, 2000) / 255, rng.random(200) * 3 - 1.5))
+
+    start = time.perf_counter()
+    index = vis.utils.LatLonIndex(lat, lon, mesh.faces)
+    logger.debug(f"LatLonIndex build: {time.perf_counter() - start:.3f} s")
+    assert index.matches(mesh.faces)
+    assert not index.matches(mesh.faces[::-1])
+    latlon = np.stack((lat, lon), axis=-1)
+    assert vis.utils.get_latlon_index(latlon, mesh.faces, index) is index
+    assert vis.utils.get_latlon_index(latlon, mesh.faces[::-1], index) is not index
+
+    start = time.perf_counter()
+    pts3d = index.query(mesh.vertices, gx, gy)
+    logger.debug(f"LatLonIndex query: {time.perf_counter() - start:.3f} s")
+
+    lonf = lon[mesh.faces]
+    msk = (np.sum(lonf>=0, axis=1)==3) & (np.sum(lat[mesh.faces]>=0, axis=1)==3)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        expected = np.array([vis.utils.latLon2xyz(mesh, lat, lonf, msk, gx[i], gy[i]) for i in range(len(gx))])
+    assert (pts3d == expected).all()
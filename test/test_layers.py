@@ -0,0 +1,82 @@
+import logging
+
+import pytest
+import numpy as np
+import pyvista as pv
+import vision6D as vis
+
+logger = logging.getLogger("vision6D")
+np.set_printoptions(suppress=True)
+
+def test_image_layer():
+    plotter = pv.Plotter(off_screen=True)
+    layer = vis.layers.ImageLayer(plotter, 'image')
+    rng = np.random.default_rng(0)
+    first, second = rng.integers(0, 256, (2, 108, 192, 3), dtype=np.uint8)
+
+    actor = layer.set_data(first, spacing=[0.01, 0.01, 1], opacity=0.5)
+    assert np.shares_memory(layer.data, first)
+    assert np.allclose(layer.grid.center, 0)
+
+    # a new frame of the same size only swaps the buffer
+    assert layer.set_data(second, spacing=[0.01, 0.01, 1], opacity=0.5) is actor
+    assert np.shares_memory(layer.data, second)
+    layer.set_mirror(True, False)
+    assert (layer.data.reshape(second.shape) == second[:, ::-1]).all()
+    layer.set_mirror(True, True)
+    assert (layer.data.reshape(second.shape) == second[::-1, ::-1]).all()
+    layer.set_spacing([0.02, 0.02, 1])
+    assert np.allclose(layer.grid.center, 0) and layer.grid.spacing == (0.02, 0.02, 1)
+
+    # a single channel mask needs a new actor
+    mask = rng.integers(0, 2, (108, 192), dtype=np.uint8)
+    assert layer.set_data(mask, spacing=[0.01, 0.01, 1], opacity=0.5) is not actor
+    assert layer.data.shape == (108 * 192, 1)
+
+    layer.remove()
+    assert layer.actor is None and 'image' not in plotter.actors
+
+def test_image_layer_texture():
+    plotter = pv.Plotter(off_screen=True)
+    layer = vis.layers.ImageLayer(plotter, 'image', backend='texture')
+    rng = np.random.default_rng(0)
+    first, second = rng.integers(0, 256, (2, 108, 192, 3), dtype=np.uint8)
+
+    # one textured quad, half a spacing larger than the grid on every side
+    actor = layer.set_data(first, spacing=[0.01, 0.01, 1], opacity=0.5)
+    assert actor.GetTexture() is not None and layer.quad.n_points == 4
+    assert np.allclose(layer.quad.bounds, (-0.96, 0.96, -0.54, 0.54, 0, 0))
+    assert (vis.utils.get_image_mask_actor_scalars(actor) == first).all()
+
+    assert layer.set_data(second, spacing=[0.01, 0.01, 1], opacity=0.5) is actor
+    assert (vis.utils.get_image_mask_actor_scalars(actor) == second).all()
+    layer.set_spacing([0.02, 0.02, 1])
+    assert np.allclose(layer.quad.bounds, (-1.92, 1.92, -1.08, 1.08, 0, 0))
+
+    # masks keep the grid and its gray colormap
+    mask = rng.integers(0, 2, (108, 192), dtype=np.uint8)
+    assert layer.set_data(mask, spacing=[0.01, 0.01, 1], opacity=0.5).GetTexture() is None
+
+def test_scene_batch():
+    plotter = pv.Plotter(off_screen=True)
+    actors = [plotter.add_mesh(pv.Sphere(center=(i, 0, 0)), name=f"mesh_{i}") for i in range(3)]
+    plotter.show(auto_close=False)
+    renders = []
+    plotter.render = lambda: renders.append(1)
+    scene = vis.layers.SceneBatch(plotter)
+
+    # one render per batch, the last change of an actor wins
+    matrix = np.eye(4); matrix[:3, 3] = (0, 0, 5)
+    with scene:
+        for actor in actors:
+            scene.set_matrix(actor, np.eye(4))
+            scene.set_matrix(actor, matrix)
+            scene.set_opacity(actor, 0.5)
+        assert len(renders) == 0 and actors[0].GetProperty().opacity == 1
+    assert len(renders) == 1
+    assert all((actor.user_matrix == matrix).all() and actor.GetProperty().opacity == 0.5 for actor in actors)
+    assert all(plotter.renderer.actors[f"mesh_{i}"] is actor for i, actor in enumerate(actors))
+
+    # outside of a batch a change is rendered right away
+    scene.set_opacity(actors[0], 0.2)
+    assert len(renders) == 2 and actors[0].GetProperty().opacity == 0.2
@@ -0,0 +1,72 @@
+import logging
+
+import pytest
+import numpy as np
+import cv2
+import vision6D as vis
+
+logger = logging.getLogger("vision6D")
+np.set_printoptions(suppress=True)
+
+def test_solve_epnp_objects():
+    app = vis.App(off_screen=True)
+    mesh_paths = {'ossicles': vis.config.OSSICLES_MESH_PATH_5997_right,
+                  'facial_nerve': vis.config.FACIAL_NERVE_MESH_PATH_5997_right,
+                  'chorda': vis.config.CHORDA_MESH_PATH_5997_right}
+    gt_pose = vis.config.gt_pose_5997_right
+    meshes = {name: vis.cache.load_trimesh(mesh_path) for name, mesh_path in mesh_paths.items()}
+
+    # a multi-label nocs color mask of all the meshes together
+    label_mask = vis.raster.rasterize_labels([(mesh.vertices, mesh.faces, gt_pose) for mesh in meshes.values()], app.camera_intrinsics, app.window_size[0], app.window_size[1], app.camera.position)
+    color_mask = np.zeros((app.window_size[1], app.window_size[0], 3), dtype=np.uint8)
+    for label, mesh in enumerate(meshes.values()):
+        colors = vis.utils.color_mesh(mesh.vertices, nocs=True)
+        color_mask[label_mask == label] = vis.raster.rasterize(mesh.vertices, mesh.faces, colors, app.camera_intrinsics, gt_pose, app.window_size[0], app.window_size[1], app.camera.position)[0][label_mask == label]
+
+    objects = {name: (label, mesh.vertices) for label, (name, mesh) in enumerate(meshes.items())}
+    poses, stats, seconds = vis.pnp.solve_epnp_objects(color_mask, label_mask, objects, app.camera_intrinsics, app.camera.position)
+    logger.debug(f"solve_epnp_objects: {seconds:.3f} s, {stats}")
+
+    assert sorted(poses) == sorted(mesh_paths)
+    for name, predicted_pose in poses.items():
+        assert stats[name]["inliers"] > 0 and stats[name]["correspondences"] == (label_mask == objects[name][0]).sum()
+        # the nocs colors are quantized to 8 bits
+        assert np.isclose(predicted_pose, gt_pose, atol=2).all()
+
+@pytest.mark.parametrize("backend", ["epnp", "sqpnp", "iterative"])
+@pytest.mark.parametrize("refine", [None, "lm", "vvs"])
+def test_pnp_solver(backend, refine):
+    rng = np.random.default_rng(0)
+    camera_intrinsics = np.array([[5e4, 0, 960], [0, 5e4, 540], [0, 0, 1]])
+    camera_position = (0, 0, -500)
+    gt_pose = np.eye(4)
+    gt_pose[:3, :3] = cv2.Rodrigues(np.array([0.3, -0.2, 0.1]))[0]
+    gt_pose[:3, 3] = (2, -1, 10)
+    pts3d = rng.uniform(-10, 10, (500, 3))
+
+    # project the points with the gt pose, then corrupt a fifth of them
+    camera_points = pts3d @ gt_pose[:3, :3].T + gt_pose[:3, 3] - camera_position
+    pts2d = camera_points @ camera_intrinsics.T
+    pts2d = pts2d[:, :2] / pts2d[:, 2:] + rng.normal(0, 0.5, (500, 2))
+    pts2d[:100] += rng.uniform(50, 100, (100, 2))
+
+    predicted_pose, inliers = vis.pnp.PnPSolver(backend, iterations=200, reprojection_error=4.0, refine=refine).solve(pts2d, pts3d, camera_intrinsics, camera_position)
+    rotation_error, translation_error = vis.pnp.pose_error(predicted_pose, gt_pose)
+    assert rotation_error < 1 and translation_error < 1
+    assert len(inliers) > 350 and (inliers >= 100).all()
+
+def test_register_backend():
+    with pytest.raises(AssertionError): vis.pnp.PnPSolver("unknown")
+    vis.pnp.register_backend("unknown", vis.pnp.PNP_BACKENDS["epnp"])
+    assert vis.pnp.PnPSolver("unknown").backend == "unknown"
+    del vis.pnp.PNP_BACKENDS["unknown"]
+
+@pytest.mark.parametrize("method", ["grid", "farthest", "edge"])
+def test_sample_correspondences(method):
+    rows, cols = np.mgrid[:400, :600]
+    pts2d = np.stack((cols, rows), axis=-1)[(cols - 300) ** 2 + (rows - 200) ** 2 < 150 ** 2]
+    index = vis.pnp.sample_correspondences(pts2d, 500, method)
+    assert abs(len(index) - 500) < 50 and len(np.unique(index)) == len(index) and (np.diff(index) > 0).all()
+    # the samples cover the whole mask
+    assert np.allclose(pts2d[index].mean(axis=0), (300, 200), atol=15)
+    assert (vis.pnp.sample_correspondences(pts2d[:100], 500, method) == np.arange(100)).all()
@@ -0,0 +1,127 @@
+import logging
+import time
+
+import pytest
+import numpy as np
+import vision6D as vis
+
+logger = logging.getLogger("vision6D")
+np.set_printoptions(suppress=True)
+
+@pytest.mark.parametrize(
+    "mesh_path, gt_pose, nocs_color",
+    [(vis.config.OSSICLES_MESH_PATH_5997_right, vis.config.gt_pose_5997_right, True),
+     (vis.config.OSSICLES_MESH_PATH_5997_right, vis.config.gt_pose_5997_right, False),
+     (vis.config.OSSICLES_MESH_PATH_6088_right, vis.config.gt_pose_6088_right, True)]
+)
+def test_rasterize(mesh_path, gt_pose, nocs_color):
+    app = vis.App(off_screen=True, nocs_color=nocs_color)
+    app.set_transformation_matrix(gt_pose)
+    app.load_meshes({'ossicles': str(mesh_path)})
+    start = time.perf_counter()
+    expected_color_mask, expected_depth_map = app.plot(return_depth_map=True)
+    logger.debug(f"App.plot: {time.perf_counter() - start:.3f} s")
+
+    mesh, colors = app.ossicles_mesh, app.mesh_polydata['ossicles'][1]
+    start = time.perf_counter()
+    color_mask, depth_map = vis.raster.rasterize(mesh.vertices, mesh.faces, colors, app.camera_intrinsics, gt_pose, app.window_size[0], app.window_size[1], (0, 0, app.cam_position))
+    logger.debug(f"vis.raster.rasterize: {time.perf_counter() - start:.3f} s")
+
+    # only the pixels on the triangle edges may be rasterized differently by the GPU
+    expected_mask, mask = ~np.isnan(expected_depth_map), ~np.isnan(depth_map)
+    assert (expected_mask == mask).sum() / mask.size > 0.999
+    assert ((expected_mask & mask).sum() / (expected_mask | mask).sum()) > 0.97
+
+    both = expected_mask & mask
+    diff = np.abs(expected_color_mask[both].astype(np.int64) - color_mask[both]).max(axis=-1)
+    assert (diff <= 1).mean() > 0.97
+    assert np.nanmedian(np.abs(expected_depth_map - depth_map)) < 0.01
+
+def test_rasterize_faces_max_fragments():
+    # a triangle over the whole window is split across the chunks, in front of it a small one hides a few pixels
+    uv = np.array([[-100, -100], [5000, -100], [-100, 5000], [10, 10], [50, 10], [10, 50]], dtype=np.float64)
+    z = np.array([10, 10, 10, 5, 5, 5], dtype=np.float64)
+    faces = np.array([[0, 1, 2], [3, 4, 5]])
+    expected = vis.raster.rasterize_faces(uv, z, faces, 1920, 1080)
+    for max_fragments in (100000, 777):
+        result = vis.raster.rasterize_faces(uv, z, faces, 1920, 1080, max_fragments=max_fragments)
+        assert all((a == b).all() for a, b in zip(result, expected))
+    assert (expected[0] == 1).sum() == 814 and (expected[0] == 0).sum() == 1920 * 1080 - 814
+
+@pytest.mark.parametrize(
+    "mesh_path, gt_pose",
+    [(vis.config.OSSICLES_MESH_PATH_5997_right, vis.config.gt_pose_5997_right),
+     (vis.config.OSSICLES_MESH_PATH_6088_right, vis.config.gt_pose_6088_right)]
+)
+@pytest.mark.parametrize("surface", [True, False])
+def test_correspondences(mesh_path, gt_pose, surface):
+    app = vis.App(off_screen=True)
+    mesh = vis.cache.load_trimesh(mesh_path)
+    start = time.perf_counter()
+    pts2d, pts3d = vis.raster.correspondences(mesh.vertices, mesh.faces, app.camera_intrinsics, gt_pose, app.window_size[0], app.window_size[1], (0, 0, app.cam_position), surface=surface)
+    logger.debug(f"vis.raster.correspondences: {time.perf_counter() - start:.3f} s for {len(pts2d)} pairs")
+    assert pts2d.dtype == np.float32 and pts3d.dtype == np.float32 and len(pts2d) == len(pts3d)
+
+    # the pairs are exact, so the pose is recovered up to the float32 precision
+    predicted_pose = vis.utils.solve_epnp_cv2(pts2d, pts3d, app.camera_intrinsics, app.camera.position)
+    assert np.isclose(predicted_pose, gt_pose, atol=1e-3).all()
+
+@pytest.mark.parametrize(
+    "mesh_path, gt_pose",
+    [(vis.config.OSSICLES_MESH_PATH_5997_right, vis.config.gt_pose_5997_right),
+     (vis.config.OSSICLES_MESH_PATH_6088_right, vis.config.gt_pose_6088_right)]
+)
+def test_plot_nocs(mesh_path, gt_pose):
+    app = vis.App(off_screen=True, nocs_color=True)
+    app.set_transformation_matrix(gt_pose)
+    app.load_meshes({'ossicles': str(mesh_path)})
+    color_mask, nocs = app.plot(), app.plot_nocs()
+    assert nocs.dtype == np.float32 and (nocs.any(axis=-1) == color_mask.any(axis=-1)).mean() > 0.999
+
+    # the float colors are the software ones up to the depth precision, the 8-bit ones are 1/255 off
+    mesh = app.ossicles_mesh
+    expected = vis.raster.rasterize(mesh.vertices, mesh.faces, vis.utils.color_mesh(mesh.vertices), app.camera_intrinsics, gt_pose, app.window_size[0], app.window_size[1], (0, 0, app.cam_position), dtype=np.float64)[0]
+    both = expected.any(axis=-1) & nocs.any(axis=-1)
+    assert np.median(np.abs(nocs[both] - expected[both])) < np.median(np.abs(color_mask[both] / 255 - expected[both])) / 4
+
+    # a few hundred float pairs recover the pose better than all the 8-bit ones
+    errors = {}
+    for name, mask, samples in [("8-bit", color_mask, None), ("float", nocs, 200)]:
+        pts3d, pts2d = vis.utils.create_2d_3d_pairs(mask, mesh.vertices)
+        predicted_pose, _ = vis.pnp.PnPSolver(sampler="grid" if samples else None, samples=samples or 2000).solve(pts2d, pts3d, app.camera_intrinsics, app.camera.position)
+        errors[name] = vis.pnp.pose_error(predicted_pose, gt_pose)
+        logger.debug(f"{name} colors, {samples or len(pts2d)} pairs: rotation {errors[name][0]:.4f} deg, translation {errors[name][1]:.4f} mm")
+    assert errors["float"][0] < errors["8-bit"][0] and errors["float"][1] < errors["8-bit"][1]
+
+@pytest.mark.parametrize(
+    "mesh_path, gt_pose, mirror_objects",
+    [(vis.config.OSSICLES_MESH_PATH_5997_right, vis.config.gt_pose_5997_right, False),
+     (vis.config.OSSICLES_MESH_PATH_6088_right, vis.config.gt_pose_6088_right, False),
+     (vis.config.OSSICLES_MESH_PATH_5997_right, vis.config.gt_pose_5997_right, True)]
+)
+def test_face_id_buffer(mesh_path, gt_pose, mirror_objects):
+    app = vis.App(off_screen=True, nocs_color=True, mirror_objects=mirror_objects)
+    app.set_transformation_matrix(gt_pose)
+    app.load_meshes({'ossicles': str(mesh_path)})
+    color_mask = app.plot()
+    actor = app.mesh_actors['ossicles']
+
+    session = vis.render.RenderSession(app.window_size, anti_aliasing=False)
+    start = time.perf_counter()
+    face_ids = vis.utils.get_mesh_actor_face_ids(actor, session, app.camera.copy())
+    vertices, faces = vis.utils.get_mesh_actor_vertices_faces(actor)
+    pts3d, pts2d = vis.utils.pick_surface_points(face_ids, vertices, faces, app.camera_intrinsics, actor.user_matrix, app.camera.position, mask=vis.utils.color2binary_mask(color_mask))
+    logger.debug(f"id buffer and barycentric solve: {time.perf_counter() - start:.3f} s for {len(pts2d)} pixels")
+
+    # the GPU picks the same triangles as the software rasterizer, up to the triangle edges
+    uv, z = vis.raster.project_vertices(vertices, app.camera_intrinsics, actor.user_matrix, app.camera.position)
+    expected_face_ids = vis.raster.rasterize_faces(uv, z, faces, app.window_size[0], app.window_size[1])[0]
+    both = (face_ids != -1) & (expected_face_ids != -1)
+    assert (face_ids[both] == expected_face_ids[both]).mean() > 0.99
+
+    # the pairs are exact surface points, the pose is recovered from a few hundred of them;
+    # the pixels of mirrored actors are flipped back like the interface does, to give the unmirrored pose
+    if mirror_objects: pts2d[:, 0] = app.window_size[0] - pts2d[:, 0]
+    index = vis.pnp.sample_correspondences(pts2d, 200)
+    predicted_pose = vis.utils.solve_epnp_cv2(pts2d[index], pts3d[index], app.camera_intrinsics, app.camera.position)
+    assert np.isclose(predicted_pose, gt_pose, atol=1e-3).all()
@@ -172,6 +172,9 @@ class MyMainWindow(MainWindow):
                     elif button_clicked == QtWidgets.QMessageBox.No:
                         self.image_path = file_path
                         self.add_image_file(prompt=False)
+            elif file_path.endswith(('.mp4', '.avi', '.mov')):  # add the frames of a video
+                self.image_path = file_path
+                self.add_frames_file(prompt=False)
             elif file_path.endswith('.npy'):
                 self.pose_path = file_path
                 self.add_pose_file(prompt=False)
@@ -198,6 +201,8 @@ class MyMainWindow(MainWindow):
         self.mesh_path = None
         self.pose_path = None
         self.meshdict = {}
+        self.frames = None
+        self.frame_index = 0
         
         os.makedirs(vis.config.GITROOT / "output", exist_ok=True)
         os.makedirs(vis.config.GITROOT / "output" / "image", exist_ok=True)
@@ -210,6 +215,7 @@ class MyMainWindow(MainWindow):
         fileMenu = mainMenu.addMenu('File')
         fileMenu.addAction('Add Workspace', self.add_workspace)
         fileMenu.addAction('Add Image', self.add_image_file)
+        fileMenu.addAction('Add Frames', self.add_frames_file)
         fileMenu.addAction('Add Mask', self.add_mask_file)
         fileMenu.addAction('Add Mesh', self.add_mesh_file)
         fileMenu.addAction('Add Pose', self.add_pose_file)
@@ -230,6 +236,11 @@ class MyMainWindow(MainWindow):
         CameraMenu.addAction('Zoom In (x)', self.zoom_in)
         CameraMenu.addAction('Zoom Out (z)', self.zoom_out)
 
+        # step through the frames of a video trim
+        FramesMenu = mainMenu.addMenu('Frames')
+        FramesMenu.addAction('Next Frame (n)', self.next_frame)
+        FramesMenu.addAction('Previous Frame (b)', self.previous_frame)
+
         # add mirror actors related actions
         mirrorMenu = mainMenu.addMenu('Mirror')
         mirror_x = functools.partial(self.mirror_actors, direction='x')
@@ -243,10 +254,12 @@ class MyMainWindow(MainWindow):
         RegisterMenu.addAction('Update GT Pose (l)', self.update_gt_pose)
         RegisterMenu.addAction('Current Pose (t)', self.current_pose)
         RegisterMenu.addAction('Undo Pose (s)', self.undo_pose)
+        RegisterMenu.addAction('Redo Pose (d)', self.redo_pose)
 
         # Add pnp algorithm related actions
         PnPMenu = mainMenu.addMenu('Run')
         PnPMenu.addAction('EPnP with mesh', self.epnp_mesh)
+        PnPMenu.addAction('EPnP with all meshes', self.epnp_meshes)
         epnp_nocs_mask = functools.partial(self.epnp_mask, True)
         PnPMenu.addAction('EPnP with nocs mask', epnp_nocs_mask)
         epnp_latlon_mask = functools.partial(self.epnp_mask, False)
@@ -309,13 +322,15 @@ class MyMainWindow(MainWindow):
                 if ok:
                     try: self.image_spacing = ast.literal_eval(spacing)
                     except: QtWidgets.QMessageBox.warning(self, 'vision6D', "Format is not correct", QtWidgets.QMessageBox.Ok, QtWidgets.QMessageBox.Ok)
-                    self.add_image(self.image_path)
+                    self.image_layer.set_spacing(self.image_spacing)
+                    self.reset_camera()
             elif checked_button.text() == 'mask':
                 spacing, ok = self.input_dialog.getText(self, 'Input', "Set Spacing", text=str(self.mask_spacing))
                 if ok:
                     try: self.mask_spacing = ast.literal_eval(spacing)
                     except: QtWidgets.QMessageBox.warning(self, 'vision6D', "Format is not correct", QtWidgets.QMessageBox.Ok, QtWidgets.QMessageBox.Ok)
-                    self.add_mask(self.mask_path)
+                    self.mask_layer.set_spacing(self.mask_spacing)
+                    self.reset_camera()
             else:
                 spacing, ok = self.input_dialog.getText(self, 'Input', "Set Spacing", text=str(self.mesh_spacing))
                 if ok:
@@ -355,9 +370,50 @@ class MyMainWindow(MainWindow):
 
         if self.image_path != '':
             self.hintLabel.hide()
+            self.close_frames()
             image_source = np.array(PIL.Image.open(self.image_path), dtype='uint8')
             if len(image_source.shape) == 2: image_source = image_source[..., None]
             self.add_image(image_source)
+
+    def add_frames_file(self, prompt=True):
+        if prompt:
+            frames_path, _ = self.file_dialog.getOpenFileName(None, "Open file", "" if self.image_path is None else str(pathlib.Path(self.image_path).parent), "Files (*.png *.jpg *.mp4 *.avi *.mov)")
+        else:
+            frames_path = self.image_path
+        if frames_path != '':
+            self.hintLabel.hide()
+            self.close_frames()
+            # a picked frame opens the whole folder of frames, starting at that frame
+            frames_path = pathlib.Path(frames_path)
+            is_image = frames_path.suffix in vis.frames.IMAGE_SUFFIXES
+            self.frames = vis.frames.FrameSequence(frames_path.parent if is_image else frames_path)
+            self.set_frame(self.frames.index(frames_path) if is_image else 0)
+
+    def close_frames(self):
+        if self.frames is not None: self.frames.close()
+        self.frames = None
+        self.frame_index = 0
+
+    def set_frame(self, index):
+        self.frame_index = index
+        # keep image_path pointing at the current frame, the exports are named after it
+        self.image_path = str(self.frames.name(index))
+        if self.image_actor is None: self.add_image(self.frames[index])
+        else: self.update_image(self.frames[index])
+        self.output_text.clear()
+        self.output_text.append(f"Frame {index + 1}/{len(self.frames)}: {pathlib.Path(self.image_path).name}")
+
+    def next_frame(self):
+        if self.frames is None:
+            QtWidgets.QMessageBox.warning(self, 'vision6D', "Need to load frames first", QtWidgets.QMessageBox.Ok, QtWidgets.QMessageBox.Ok)
+            return 0
+        if self.frame_index < len(self.frames) - 1: self.set_frame(self.frame_index + 1)
+
+    def previous_frame(self):
+        if self.frames is None:
+            QtWidgets.QMessageBox.warning(self, 'vision6D', "Need to load frames first", QtWidgets.QMessageBox.Ok, QtWidgets.QMessageBox.Ok)
+            return 0
+        if self.frame_index > 0: self.set_frame(self.frame_index - 1)
             
     def add_mask_file(self, prompt=True):
         if prompt:
@@ -390,6 +446,11 @@ class MyMainWindow(MainWindow):
             transformation_matrix = self.transformation_matrix
             if self.mirror_x: transformation_matrix = np.array([[-1, 0, 0, 0], [0, 1, 0, 0], [0, 0, 1, 0], [0, 0, 0, 1]]) @ transformation_matrix
             if self.mirror_y: transformation_matrix = np.array([[1, 0, 0, 0], [0, -1, 0, 0], [0, 0, 1, 0], [0, 0, 0, 1]]) @ transformation_matrix                   
+            # a pose of this mesh that the last session journaled but did not export
+            journal_name = pathlib.Path(self.mesh_path).stem
+            restored_pose = self.journal.restore(journal_name)
+            if restored_pose is not None:
+                if QtWidgets.QMessageBox.question(self, 'vision6D', f"Restore the unsaved pose of {journal_name} from the last session?", QtWidgets.QMessageBox.Yes | QtWidgets.QMessageBox.No) == QtWidgets.QMessageBox.Yes: transformation_matrix = restored_pose
             self.add_mesh(mesh_name, self.mesh_path, transformation_matrix)
                       
     def add_pose_file(self, prompt=True):
@@ -412,25 +473,21 @@ class MyMainWindow(MainWindow):
         if direction == 'x': self.mirror_x = not self.mirror_x
         elif direction == 'y': self.mirror_y = not self.mirror_y
 
-        #^ mirror the image actor
-        if self.image_actor is not None:
-            original_image_data = np.array(PIL.Image.open(self.image_path), dtype='uint8')
-            if len(original_image_data.shape) == 2: original_image_data = original_image_data[..., None]
-            self.add_image(original_image_data)
+        #^ mirror the image and the mask actors, the layers keep the original data
+        self.image_layer.set_mirror(self.mirror_x, self.mirror_y)
+        self.mask_layer.set_mirror(self.mirror_x, self.mirror_y)
 
-        #^ mirror the mask actor
-        if self.mask_actor is not None:
-            original_mask_data = np.array(PIL.Image.open(self.mask_path), dtype='uint8')
-            if len(original_mask_data.shape) == 2: original_mask_data = original_mask_data[..., None]
-            self.add_mask(original_mask_data)
-
-        #^ mirror the mesh actors
+        #^ mirror the mesh actors, only their user matrix changes so they keep their colors
         if len(self.mesh_actors) != 0:
-            for actor_name, _ in self.mesh_actors.items():
-                transformation_matrix = self.transformation_matrix
-                if self.mirror_x: transformation_matrix = np.array([[-1, 0, 0, 0], [0, 1, 0, 0], [0, 0, 1, 0], [0, 0, 0, 1]]) @ transformation_matrix
-                if self.mirror_y: transformation_matrix = np.array([[1, 0, 0, 0], [0, -1, 0, 0], [0, 0, 1, 0], [0, 0, 0, 1]]) @ transformation_matrix
-                self.add_mesh(actor_name, self.meshdict[actor_name], transformation_matrix)
+            transformation_matrix = self.transformation_matrix
+            if self.mirror_x: transformation_matrix = np.array([[-1, 0, 0, 0], [0, 1, 0, 0], [0, 0, 1, 0], [0, 0, 0, 1]]) @ transformation_matrix
+            if self.mirror_y: transformation_matrix = np.array([[1, 0, 0, 0], [0, -1, 0, 0], [0, 0, 1, 0], [0, 0, 0, 1]]) @ transformation_matrix
+            self.initial_pose = transformation_matrix
+            with self.scene:
+                for actor in self.mesh_actors.values(): self.scene.set_matrix(actor, transformation_matrix)
+            # the nocs and latlon colors are computed from the mirrored vertices
+            for actor_name, color in self.mesh_colors.items():
+                if color in ('nocs', 'latlon'): self.set_scalar(color == 'nocs', actor_name)
                 
     def remove_actor(self, button):
         name = button.text()
@@ -438,21 +495,26 @@ class MyMainWindow(MainWindow):
             actor = self.image_actor
             self.image_actor = None
             self.image_path = None
+            self.image_layer.remove()
+            self.close_frames()
         elif name == 'mask':
             actor = self.mask_actor
             self.mask_actor = None
             self.mask_path = None
+            self.mask_layer.remove()
         else: 
             actor = self.mesh_actors[name]
             del self.mesh_actors[name] # remove the item from the mesh dictionary
             del self.mesh_colors[name]
             del self.mesh_opacity[name]
             del self.meshdict[name]
+            self.history.clear(name)
             self.reference = None
             self.color_button.setText("Color")
             self.mesh_spacing = [1, 1, 1]
 
         self.plotter.remove_actor(actor)
+        self.render.remove(name)
         self.track_actors_names.remove(name)
         self.output_text.clear(); self.output_text.append(f"Remove actor: <span style='background-color:yellow; color:black;'>{name}</span>")
         # remove the button from the button group
@@ -483,7 +545,13 @@ class MyMainWindow(MainWindow):
 
         self.hintLabel.show()
 
+        # Drop the cached off-screen actors and the image/mask grids
+        self.render.clear()
+        self.image_layer.remove()
+        self.mask_layer.remove()
+
         # Re-initial the dictionaries
+        self.close_frames()
         self.image_path = None
         self.mask_path = None
         self.mesh_path = None
@@ -504,7 +572,7 @@ class MyMainWindow(MainWindow):
         self.image_actor = None
         self.mask_actor = None
         self.mesh_actors = {}
-        self.undo_poses = {}
+        self.history.clear()
         self.track_actors_names = []
 
         self.colors = ["cyan", "magenta", "yellow", "lime", "deepskyblue", "salmon", "silver", "aquamarine", "plum", "blueviolet"]
@@ -526,16 +594,9 @@ class MyMainWindow(MainWindow):
         if reply == QtWidgets.QMessageBox.Yes: camera = self.camera.copy()
         else: camera = self.plotter.camera.copy()
 
-        self.render.clear()
-        image_actor = self.image_actor.copy(deep=True)
-        image_actor.GetProperty().opacity = 1
-        self.render.add_actor(image_actor, pickable=False, name="image")
-        self.render.camera = camera
-        self.render.disable()
-        self.render.show(auto_close=False)
-
+        self.render.set_actor("image", self.image_actor)
         # obtain the rendered image
-        image = self.render.last_image
+        image = self.render.show(["image"], camera)
         mirror = np.any((self.mirror_x, self.mirror_y))
         output_name = pathlib.Path(self.image_path).stem if not mirror else pathlib.Path(self.image_path).stem + "_mirrored"
         output_path = vis.config.GITROOT / "output" / "image" / (output_name + '.png')
@@ -552,16 +613,9 @@ class MyMainWindow(MainWindow):
         if reply == QtWidgets.QMessageBox.Yes: camera = self.camera.copy()
         else: camera = self.plotter.camera.copy()
 
-        self.render.clear()
-        mask_actor = self.mask_actor.copy(deep=True)
-        mask_actor.GetProperty().opacity = 1
-        self.render.add_actor(mask_actor, pickable=False, name="mask")
-        self.render.camera = camera
-        self.render.disable()
-        self.render.show(auto_close=False)
-
+        self.render.set_actor("mask", self.mask_actor)
         # obtain the rendered image
-        image = self.render.last_image
+        image = self.render.show(["mask"], camera)
         mirror = np.any((self.mirror_x, self.mirror_y))
         output_name = pathlib.Path(self.mask_path).stem if not mirror else pathlib.Path(self.mask_path).stem + "_mirrored"
         output_path = vis.config.GITROOT / "output" / "mask" / (output_name + '.png')
@@ -587,7 +641,6 @@ class MyMainWindow(MainWindow):
         if reply_export_surface == QtWidgets.QMessageBox.No: point_clouds = True
         else: point_clouds = False
         
-        self.render.clear()
         reference_name = pathlib.Path(self.meshdict[self.reference]).stem
 
         mirror = np.any((self.mirror_x, self.mirror_y))
@@ -602,20 +655,12 @@ class MyMainWindow(MainWindow):
             if not render_all_meshes:
                 if mesh_name != self.reference: continue
             vertices, faces = vis.utils.get_mesh_actor_vertices_faces(mesh_actor)
-            mesh_data = pv.wrap(trimesh.Trimesh(vertices, faces, process=False))
             colors = vis.utils.get_mesh_actor_scalars(mesh_actor)
-            if colors is not None: 
-                assert colors.shape == vertices.shape, "colors shape should be the same as vertices shape"
-                mesh = self.render.add_mesh(mesh_data, scalars=colors, rgb=True, style='surface', opacity=1, name=mesh_name) if not point_clouds else self.render.add_mesh(mesh_data, scalars=colors, rgb=True, style='points', point_size=1, render_points_as_spheres=False, opacity=1, name=mesh_name)
-            else:
-                mesh = self.render.add_mesh(mesh_data, color=self.mesh_colors[mesh_name], style='surface', opacity=1, name=mesh_name) if not point_clouds else self.render.add_mesh(mesh_data, color=self.mesh_colors[mesh_name], style='points', point_size=1, render_points_as_spheres=False, opacity=1, name=mesh_name)
-            mesh.user_matrix = self.mesh_actors[self.reference].user_matrix
+            if colors is not None: assert colors.shape == vertices.shape, "colors shape should be the same as vertices shape"
+            self.render.set_mesh(mesh_name, vertices, faces, colors=colors, color=self.mesh_colors[mesh_name], point_clouds=point_clouds, user_matrix=self.mesh_actors[self.reference].user_matrix)
         
-        self.render.camera = camera
-        self.render.disable(); self.render.show(auto_close=False)
-
         # obtain the rendered image
-        image = self.render.last_image
+        image = self.render.show(list(self.mesh_actors) if render_all_meshes else [self.reference], camera)
 
         if save_render:
             output_path = vis.config.GITROOT / "output" / "mesh" / (output_name + ".png")
@@ -644,17 +689,10 @@ class MyMainWindow(MainWindow):
         if reply_export_surface == QtWidgets.QMessageBox.No: point_clouds = True
         else: point_clouds = False
 
-        self.render.clear()
-        mask_actor = self.mask_actor.copy(deep=True)
-        mask_actor.GetProperty().opacity = 1
-        self.render.add_actor(mask_actor, pickable=False, name="mask")
-        self.render.camera = camera
-        self.render.disable()
-        self.render.show(auto_close=False)
-        segmask = self.render.last_image
+        self.render.set_actor("mask", self.mask_actor)
+        segmask = self.render.show(["mask"], camera)
         if np.max(segmask) > 1: segmask = segmask / 255
 
-        self.render.clear()
         reference_name = pathlib.Path(self.meshdict[self.reference]).stem
 
         mirror = np.any((self.mirror_x, self.mirror_y))
@@ -666,21 +704,12 @@ class MyMainWindow(MainWindow):
         
         # Render the targeting objects
         vertices, faces = vis.utils.get_mesh_actor_vertices_faces(self.mesh_actors[self.reference])
-        mesh_data = pv.wrap(trimesh.Trimesh(vertices, faces, process=False))
         colors = vis.utils.get_mesh_actor_scalars(self.mesh_actors[self.reference])
-        if colors is not None: 
-            assert colors.shape == vertices.shape, "colors shape should be the same as vertices shape"
-            mesh = self.render.add_mesh(mesh_data, scalars=colors, rgb=True, style='surface', opacity=1, name=self.reference) if not point_clouds else self.render.add_mesh(mesh_data, scalars=colors, rgb=True, style='points', point_size=1, render_points_as_spheres=False, opacity=1, name=self.reference)
-        else:
-            mesh = self.render.add_mesh(mesh_data, color=self.mesh_colors[self.reference], style='surface', opacity=1, name=self.reference) if not point_clouds else self.render.add_mesh(mesh_data, color=self.mesh_colors[self.reference], style='points', point_size=1, render_points_as_spheres=False, opacity=1, name=self.reference)
-
-        mesh.user_matrix = self.mesh_actors[self.reference].user_matrix
-
-        self.render.camera = camera
-        self.render.disable(); self.render.show(auto_close=False)
+        if colors is not None: assert colors.shape == vertices.shape, "colors shape should be the same as vertices shape"
+        self.render.set_mesh(self.reference, vertices, faces, colors=colors, color=self.mesh_colors[self.reference], point_clouds=point_clouds, user_matrix=self.mesh_actors[self.reference].user_matrix)
 
         # obtain the rendered image
-        image = self.render.last_image
+        image = self.render.show([self.reference], camera)
         image = (image * segmask).astype(np.uint8)
         output_path = vis.config.GITROOT / "output" / "segmesh" / (output_name + ".png")
         rendered_image = PIL.Image.fromarray(image)
@@ -705,7 +734,10 @@ class MyMainWindow(MainWindow):
         else: output_name = "_".join(mesh_path_name[:2]) + '_gt_pose' if not mirror else "_".join(mesh_path_name[:2]) + f'_mirrored_gt_pose'
 
         output_path = vis.config.GITROOT / "output" / "gt_poses" / (output_name + ".npy")
-        np.save(output_path, self.transformation_matrix)
+        # the exported pose leaves the journal
+        journal_name = pathlib.Path(self.meshdict[self.reference]).stem
+        self.journal.append(journal_name, self.transformation_matrix)
+        self.journal.compact({journal_name: output_path})
         self.output_text.clear(); self.output_text.append(f"\nSaved:\n{self.transformation_matrix}\nExport to:\n {str(output_path)}")
 
     # ^Panel
@@ -882,15 +914,18 @@ class MyMainWindow(MainWindow):
         self.frame.setFixedSize(*self.window_size)
         self.plotter = QtInteractor(self.frame)
         # self.plotter.setFixedSize(*self.window_size) # but camera locate in the center instead of top left
-        self.render = pv.Plotter(window_size=[self.window_size[0], self.window_size[1]], lighting=None, off_screen=True) 
-        self.render.set_background('black'); 
+        self.render = vis.render.RenderSession(self.window_size, background='black')
         assert self.render.background_color == "black", "render's background need to be black"
+        # triangle id buffer of the reference mesh for the pixel to surface lookup of the EPnP
+        self.id_buffer = vis.render.RenderSession(self.window_size, background='black', anti_aliasing=False)
         self.signal_close.connect(self.plotter.close)
 
     def show_plot(self):
         self.plotter.enable_joystick_actor_style()
         self.plotter.enable_trackball_actor_style()
         self.plotter.iren.interactor.AddObserver("LeftButtonPressEvent", self.pick_callback)
+        # a drag commits the poses of the actors when the button is released
+        self.plotter.iren.interactor.AddObserver("LeftButtonReleaseEvent", self.journal_poses)
 
         # camera related key bindings
         self.plotter.add_key_event('c', self.reset_camera)
@@ -902,6 +937,11 @@ class MyMainWindow(MainWindow):
         self.plotter.add_key_event('l', self.update_gt_pose)
         self.plotter.add_key_event('t', self.current_pose)
         self.plotter.add_key_event('s', self.undo_pose)
+        self.plotter.add_key_event('d', self.redo_pose)
+
+        # frame related key bindings
+        self.plotter.add_key_event('n', self.next_frame)
+        self.plotter.add_key_event('b', self.previous_frame)
 
         self.plotter.add_axes()
         self.plotter.add_camera_orientation_widget()
@@ -29,9 +29,27 @@ LOGGING_CONFIG = {
 # Setup the logging configuration
 logging.config.dictConfig(LOGGING_CONFIG)
 
-from .app import App
-from .interface import Interface
-from .interface_gui import Interface_GUI
-from . import utils
-from . import config
-from .run_gui import exe
\ No newline at end of file
+# the submodules are imported on first access, so `import vision6D.utils` or a headless
+# render worker does not pay for (or need) Qt
+import importlib
+
+_LAZY_ATTRIBUTES = {
+    "App": ".app",
+    "Interface": ".interface",
+    "Interface_GUI": ".interface_gui",
+    "exe": ".run_gui",
+}
+_LAZY_SUBMODULES = ("utils", "cache", "cases", "frames", "layers", "history", "journal", "pnp", "render", "raster", "dataset", "config")
+
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        value = getattr(importlib.import_module(_LAZY_ATTRIBUTES[name], __name__), name)
+    elif name in _LAZY_SUBMODULES:
+        value = importlib.import_module(f".{name}", __name__)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(list(globals()) + list(_LAZY_ATTRIBUTES) + list(_LAZY_SUBMODULES))
@@ -26,7 +26,9 @@ class App:
             cam_focal_length:int=50000,
             cam_position: int=-500,
             cam_viewup: Tuple=(0,-1,0),
-            mirror_objects: bool=False
+            mirror_objects: bool=False,
+            # 'grid' draws the image as one colored point per pixel, 'texture' as one textured quad
+            image_backend: str='grid'
         ):
         
         self.off_screen = off_screen
@@ -34,9 +36,11 @@ class App:
         self.point_clouds = point_clouds
         self.window_size = (int(width), int(height))
         self.mirror_objects = mirror_objects
+        self.image_backend = image_backend
         self.transformation_matrix = None
         self.reference = None
         self.latlon = vis.utils.load_latitude_longitude()
+        self.latlon_index = None
         
         # initial the dictionaries
         self.image_actor = None
@@ -44,8 +48,7 @@ class App:
         self.image_polydata = {}
         self.mesh_polydata = {}
         self.binded_meshes = {}
-        self.undo_poses = []
-        self.redo_poses = []
+        self.history = vis.history.PoseHistory()
         
         # default opacity for image and surface
         self.set_image_opacity(1) # self.image_opacity = 0.35
@@ -61,19 +64,15 @@ class App:
         
         # plot image and ossicles
         self.plotter = pv.Plotter(window_size=[self.window_size[0], self.window_size[1]], off_screen=off_screen)
+        self.image_layer = vis.layers.ImageLayer(self.plotter, 'image', backend=self.image_backend)
+        # property and pose changes of the actors, rendered once per event
+        self.scene = vis.layers.SceneBatch(self.plotter)
 
     def load_image(self, image_source:np.ndarray, scale_factor:list=[0.01,0.01,1]):
-        
-        self.image_polydata['image'] = pv.UniformGrid(dimensions=(1920, 1080, 1), spacing=scale_factor, origin=(0.0, 0.0, 0.0))
-        self.image_polydata['image'].point_data["values"] = image_source.reshape((1920*1080, 3)) # order = 'C
-        self.image_polydata['image'] = self.image_polydata['image'].translate(-1 * np.array(self.image_polydata['image'].center), inplace=False)
-
-        # Then add it to the plotter
-        image = self.plotter.add_mesh(self.image_polydata['image'], rgb=True, opacity=self.image_opacity, name='image')
-        actor, _ = self.plotter.add_actor(image, pickable=False, name="image")
 
-        # Save actor for later
-        self.image_actor = actor    
+        # the layer centers the image at the origin and reuses its actor for the next frame
+        self.image_actor = self.image_layer.set_data(image_source, scale_factor, self.image_opacity)
+        self.image_polydata['image'] = self.image_layer.grid
 
     def load_meshes(self, paths: Dict[str, (pathlib.Path or pv.PolyData)]):
 
@@ -86,7 +85,7 @@ class App:
 
             if isinstance(mesh_source, pathlib.WindowsPath) or isinstance(mesh_source, str):
                 # Load the '.mesh' file
-                if '.mesh' in str(mesh_source): mesh_source = vis.utils.load_trimesh(mesh_source)
+                if '.mesh' in str(mesh_source): mesh_source = vis.cache.load_trimesh(mesh_source)
                 # Load the '.ply' file
                 elif '.ply' in str(mesh_source): mesh_source = pv.read(mesh_source)
 
@@ -110,27 +109,35 @@ class App:
             if not flag:
                 raise RuntimeError("Do not support the current format!")
 
+            # the actor of a mesh loaded before under the same name is rebuilt at the next plot
+            if mesh_name in self.mesh_actors: self.plotter.remove_actor(self.mesh_actors.pop(mesh_name))
+
             # Save the mesh data to dictionary
             self.mesh_polydata[mesh_name] = (mesh_data, colors)
 
         if len(self.mesh_polydata) == 1: self.set_reference(reference_name)
 
+    def clear_meshes(self):
+        for actor in self.mesh_actors.values(): self.plotter.remove_actor(actor)
+        self.mesh_actors = {}
+        self.mesh_polydata = {}
+        self.binded_meshes = {}
+        self.reference = None
+
     def set_mirror_objects(self, mirror_objects: bool):
         self.mirror_objects = mirror_objects
 
     def set_image_opacity(self, image_opacity: float):
         self.image_opacity = image_opacity
-        if self.image_actor is not None:
-            self.image_actor.GetProperty().opacity = image_opacity
-            self.plotter.add_actor(self.image_actor, pickable=False, name='image')
+        if self.image_actor is not None: self.scene.set_opacity(self.image_actor, image_opacity)
     
     def set_mesh_opacity(self, surface_opacity: float):
         self.surface_opacity = surface_opacity
         if len(self.mesh_actors) != 0:
-            for actor_name, actor in self.mesh_actors.items():
-                actor.user_matrix = pv.array_from_vtkmatrix(actor.GetMatrix())
-                actor.GetProperty().opacity = self.surface_opacity
-                self.plotter.add_actor(actor, pickable=True, name=actor_name)
+            with self.scene:
+                for actor in self.mesh_actors.values():
+                    self.scene.set_matrix(actor, pv.array_from_vtkmatrix(actor.GetMatrix()))
+                    self.scene.set_opacity(actor, self.surface_opacity)
 
     def set_camera_extrinsics(self, cam_position, cam_viewup):
         self.camera.SetPosition((0,0,cam_position))
@@ -205,8 +212,7 @@ class App:
             if self.image_opacity <= 0:
                 self.image_opacity = 0
         
-        self.image_actor.GetProperty().opacity = self.image_opacity
-        self.plotter.add_actor(self.image_actor, pickable=False, name="image")
+        self.scene.set_opacity(self.image_actor, self.image_opacity)
 
         logger.debug("event_toggle_image_opacity callback complete")
         
@@ -221,40 +227,36 @@ class App:
                 self.surface_opacity = 0
                 
         transformation_matrix = self.mesh_actors[self.reference].user_matrix
-        for actor_name, actor in self.mesh_actors.items():
-            actor.user_matrix = transformation_matrix if not "_mirror" in actor_name else np.array([[-1, 0, 0, 0], [0, 1, 0, 0], [0, 0, 1, 0], [0, 0, 0, 1]]) @ transformation_matrix
-            actor.GetProperty().opacity = self.surface_opacity
-            self.plotter.add_actor(actor, pickable=True, name=actor_name)
+        with self.scene:
+            for actor_name, actor in self.mesh_actors.items():
+                self.scene.set_matrix(actor, transformation_matrix if not "_mirror" in actor_name else np.array([[-1, 0, 0, 0], [0, 1, 0, 0], [0, 0, 1, 0], [0, 0, 0, 1]]) @ transformation_matrix)
+                self.scene.set_opacity(actor, self.surface_opacity)
 
         logger.debug("event_toggle_surface_opacity callback complete")
         
     def event_track_registration(self, *args):
         
         transformation_matrix = self.mesh_actors[self.reference].user_matrix
-        for actor_name, actor in self.mesh_actors.items():
-            actor.user_matrix = transformation_matrix if not "_mirror" in actor_name else np.array([[-1, 0, 0, 0], [0, 1, 0, 0], [0, 0, 1, 0], [0, 0, 0, 1]]) @ transformation_matrix
-            self.plotter.add_actor(actor, pickable=True, name=actor_name)
-            logger.debug(f"<Actor {actor_name}> RT: \n{actor.user_matrix}")
-            print(f"<Actor {actor_name}> RT: \n{actor.user_matrix}")
+        with self.scene:
+            for actor_name, actor in self.mesh_actors.items():
+                user_matrix = transformation_matrix if not "_mirror" in actor_name else np.array([[-1, 0, 0, 0], [0, 1, 0, 0], [0, 0, 1, 0], [0, 0, 0, 1]]) @ transformation_matrix
+                self.scene.set_matrix(actor, user_matrix)
+                logger.debug(f"<Actor {actor_name}> RT: \n{user_matrix}")
+                print(f"<Actor {actor_name}> RT: \n{user_matrix}")
     
     def event_undo_registration(self, *args):
-        if len(self.undo_poses) != 0: 
-            transformation_matrix = self.undo_poses.pop()
-            for actor_name, actor in self.mesh_actors.items():
-                actor.user_matrix = transformation_matrix if not "_mirror" in actor_name else np.array([[-1, 0, 0, 0], [0, 1, 0, 0], [0, 0, 1, 0], [0, 0, 0, 1]]) @ transformation_matrix
-                self.plotter.add_actor(actor, pickable=True, name=actor_name)
-            self.redo_poses.append(transformation_matrix)
-            if len(self.redo_poses) > 20: self.redo_poses.pop(0)
+        transformation_matrix = self.history.undo(self.reference, self.mesh_actors[self.reference].user_matrix)
+        if transformation_matrix is not None:
+            with self.scene:
+                for actor_name, actor in self.mesh_actors.items():
+                    self.scene.set_matrix(actor, transformation_matrix if not "_mirror" in actor_name else np.array([[-1, 0, 0, 0], [0, 1, 0, 0], [0, 0, 1, 0], [0, 0, 0, 1]]) @ transformation_matrix)
 
-    # redo function still need improvment
     def event_redo_registration(self, *args):
-        if len(self.redo_poses) != 0:
-            transformation_matrix = self.redo_poses.pop()
-            if (transformation_matrix == self.mesh_actors[self.reference].user_matrix).all():
-                transformation_matrix = self.redo_poses.pop()
-            for actor_name, actor in self.mesh_actors.items():
-                actor.user_matrix = transformation_matrix if not "_mirror" in actor_name else np.array([[-1, 0, 0, 0], [0, 1, 0, 0], [0, 0, 1, 0], [0, 0, 0, 1]]) @ transformation_matrix
-                self.plotter.add_actor(actor, pickable=True, name=actor_name)
+        transformation_matrix = self.history.redo(self.reference, self.mesh_actors[self.reference].user_matrix)
+        if transformation_matrix is not None:
+            with self.scene:
+                for actor_name, actor in self.mesh_actors.items():
+                    self.scene.set_matrix(actor, transformation_matrix if not "_mirror" in actor_name else np.array([[-1, 0, 0, 0], [0, 1, 0, 0], [0, 0, 1, 0], [0, 0, 0, 1]]) @ transformation_matrix)
         
     def event_realign_meshes(self, *args, main_mesh=None, other_meshes=[]):
         
@@ -262,35 +264,33 @@ class App:
         
         transformation_matrix = self.mesh_actors[f"{objs['fix']}"].user_matrix
         
-        for obj in objs['move']:
-            self.mesh_actors[f"{obj}"].user_matrix = transformation_matrix if not "_mirror" in obj else np.array([[-1, 0, 0, 0], [0, 1, 0, 0], [0, 0, 1, 0], [0, 0, 0, 1]]) @ transformation_matrix
-            self.plotter.add_actor(self.mesh_actors[f"{obj}"], pickable=True, name=obj)
+        with self.scene:
+            for obj in objs['move']:
+                self.scene.set_matrix(self.mesh_actors[f"{obj}"], transformation_matrix if not "_mirror" in obj else np.array([[-1, 0, 0, 0], [0, 1, 0, 0], [0, 0, 1, 0], [0, 0, 0, 1]]) @ transformation_matrix)
         
         logger.debug(f"realign: main => {main_mesh}, others => {other_meshes} complete")
         
     def event_gt_position(self, *args):
         
-        for actor_name, actor in self.mesh_actors.items():
-            actor.user_matrix = self.initial_pose
-            self.plotter.add_actor(actor, pickable=True, name=actor_name)
+        with self.scene:
+            for actor in self.mesh_actors.values(): self.scene.set_matrix(actor, self.initial_pose)
 
         logger.debug("event_gt_position callback complete")
         
     def event_update_position(self, *args):
         self.transformation_matrix = self.mesh_actors[self.reference].user_matrix
-        for actor_name, actor in self.mesh_actors.items():
-            # update the the actor's user matrix
-            self.transformation_matrix = self.transformation_matrix if not '_mirror' in actor_name else np.array([[-1, 0, 0, 0], [0, 1, 0, 0], [0, 0, 1, 0], [0, 0, 0, 1]]) @ self.transformation_matrix
-            actor.user_matrix = self.transformation_matrix
-            self.initial_pose = self.transformation_matrix
-            self.plotter.add_actor(actor, pickable=True, name=actor_name)
+        with self.scene:
+            for actor_name, actor in self.mesh_actors.items():
+                # update the the actor's user matrix
+                self.transformation_matrix = self.transformation_matrix if not '_mirror' in actor_name else np.array([[-1, 0, 0, 0], [0, 1, 0, 0], [0, 0, 1, 0], [0, 0, 0, 1]]) @ self.transformation_matrix
+                self.scene.set_matrix(actor, self.transformation_matrix)
+                self.initial_pose = self.transformation_matrix
         
         logger.debug(f"\ncurrent transformation matrix: \n{self.transformation_matrix}")
         logger.debug("event_update_position callback complete")
     
     def track_click_callback(self, *args):
-        if len(self.undo_poses) > 20: self.undo_poses.pop(0)
-        self.undo_poses.append(self.mesh_actors[self.reference].user_matrix)
+        self.history.push(self.reference, self.mesh_actors[self.reference].user_matrix)
     
     def plot(self, return_depth_map=False):
         
@@ -301,6 +301,12 @@ class App:
         # load the mesh pyvista data
         for mesh_name, mesh_info in self.mesh_polydata.items():
             
+            # off screen, an actor from a previous frame only needs to be moved, unless it was drawn in another style
+            if self.off_screen and mesh_name in self.mesh_actors and self.mesh_actors[mesh_name].GetProperty().GetRepresentationAsString() == ('Points' if self.point_clouds else 'Surface'):
+                self.mesh_actors[mesh_name].user_matrix = self.transformation_matrix if not self.mirror_objects else np.array([[-1, 0, 0, 0], [0, 1, 0, 0], [0, 0, 1, 0], [0, 0, 0, 1]]) @ self.transformation_matrix
+                self.initial_pose = self.transformation_matrix
+                continue
+
             mesh_data, colors = mesh_info
 
             # add the color to plotter
@@ -364,8 +370,45 @@ class App:
             self.plotter.show("vision6D")
         else:
             if len(self.image_polydata) < 1: self.plotter.set_background('black')
-            self.plotter.show()
+            # keep the render window open so the same plotter can render the next frame
+            self.plotter.show(auto_close=False)
             rendered_image = self.plotter.last_image
             # obtain the depth map
             if return_depth_map: depth_map = self.plotter.get_image_depth()
-            return rendered_image if not return_depth_map else (rendered_image, depth_map)
\ No newline at end of file
+            return rendered_image if not return_depth_map else (rendered_image, depth_map)
+
+    def plot_nocs(self):
+        """Float32 NOCS colors of the reference mesh, read back from the depth buffer
+
+        The 8-bit colors of `plot` quantize the NOCS coordinates to 1/255 of the mesh extent.
+        Here every pixel of the float depth map is back-projected to the mesh frame and
+        normalized like `vis.utils.color_mesh`, so `vis.utils.create_2d_3d_pairs` recovers the
+        surface point of the pixel up to the depth precision. Returns shape (H, W, 3) with a
+        black background.
+        """
+        assert len(self.mesh_polydata) == 1, "the depth map only tells the reference mesh apart when it is the only mesh"
+        _, depth_map = self.plot(return_depth_map=True)
+        points = vis.raster.backproject_depth(depth_map, self.camera_intrinsics, self.mesh_actors[self.reference].user_matrix, self.camera.position)
+        vertices = self.mesh_polydata[self.reference][0].points
+        nocs = np.clip((points - vertices.min(axis=0)) / (vertices.max(axis=0) - vertices.min(axis=0)), 0, 1)
+        return np.nan_to_num(nocs).astype(np.float32)
+
+    def render_pose_sweep(self, poses: np.ndarray):
+        """Render the loaded meshes under every pose in `poses` (N, 4, 4), yielding (color_mask, depth_map)
+
+        The meshes are colored and added to the plotter once with the first pose, the following
+        frames only update the actors' user_matrix and re-render with the same camera.
+        """
+        assert self.off_screen == True, "Should set off_screen to True!"
+        poses = np.asarray(poses)
+        assert poses.ndim == 3 and poses.shape[1:] == (4, 4), "poses should have the shape (N, 4, 4)"
+
+        for i, pose in enumerate(poses):
+            self.set_transformation_matrix(pose)
+            if i == 0:
+                yield self.plot(return_depth_map=True)
+                continue
+            user_matrix = pose if not self.mirror_objects else np.array([[-1, 0, 0, 0], [0, 1, 0, 0], [0, 0, 1, 0], [0, 0, 0, 1]]) @ pose
+            for actor in self.mesh_actors.values(): actor.user_matrix = user_matrix
+            self.plotter.render()
+            yield self.plotter.screenshot(return_img=True), self.plotter.get_image_depth()
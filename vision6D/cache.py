@@ -0,0 +1,116 @@
+import os
+import json
+import shutil
+import hashlib
+import pathlib
+import logging
+
+import numpy as np
+import pyvista as pv
+import trimesh
+import vision6D as vis
+
+logger = logging.getLogger("vision6D")
+
+class MeshCache:
+    """Content-addressed on-disk cache for parsed `.mesh` files
+
+    Every entry lives in `cache_dir / <sha1 of the file content>` and holds the already
+    oriented and scaled vertices plus the VTK-ready face connectivity ([3, i, j, k] per
+    triangle) as raw `.npy` arrays, so a repeat load is a memory map instead of a parse.
+    A small index keyed by the source path remembers the (size, mtime) the digest was
+    computed for, so unchanged files are not re-hashed. Entries are evicted least
+    recently used first once the cache grows over `max_bytes`.
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=2 * 1024**3):
+        self.cache_dir = pathlib.Path(cache_dir) if cache_dir is not None else vis.config.CACHE_DIR
+        self.max_bytes = max_bytes
+        os.makedirs(self.cache_dir / "index", exist_ok=True)
+
+    def digest(self, meshpath):
+        meshpath = pathlib.Path(meshpath).resolve()
+        stat = meshpath.stat()
+        index_path = self.cache_dir / "index" / (hashlib.sha1(str(meshpath).encode()).hexdigest() + ".json")
+
+        if index_path.exists():
+            with open(index_path, "r") as f: index = json.load(f)
+            if index["size"] == stat.st_size and index["mtime_ns"] == stat.st_mtime_ns: return index["digest"]
+
+        sha1 = hashlib.sha1()
+        with open(meshpath, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""): sha1.update(chunk)
+        index = {"path": str(meshpath), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "digest": sha1.hexdigest()}
+
+        tmp_path = index_path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, "w") as f: json.dump(index, f)
+        os.replace(tmp_path, index_path)
+        return index["digest"]
+
+    def load(self, meshpath):
+        """Return the memory-mapped (vertices, faces) of `meshpath`, parsing it on a cache miss"""
+        entry = self.cache_dir / self.digest(meshpath)
+
+        if not (entry / "faces.npy").exists():
+            mesh = vis.utils.load_trimesh(meshpath)
+            faces = np.hstack((np.full((len(mesh.faces), 1), 3, dtype=np.int64), mesh.faces.astype(np.int64))).ravel()
+            # write into a private directory first so concurrent readers never see half an entry
+            tmp_entry = entry.with_name(f"{entry.name}.{os.getpid()}.tmp")
+            os.makedirs(tmp_entry, exist_ok=True)
+            np.save(tmp_entry / "vertices.npy", np.ascontiguousarray(mesh.vertices, dtype=np.float64))
+            np.save(tmp_entry / "faces.npy", faces)
+            try: os.rename(tmp_entry, entry)
+            except OSError: shutil.rmtree(tmp_entry, ignore_errors=True) # another process won the race
+            logger.debug(f"cached {meshpath} to {entry}")
+            self.evict()
+        else:
+            # mark the entry as recently used
+            os.utime(entry)
+
+        # copy-on-write maps: callers may modify the arrays without touching the cache
+        vertices = np.load(entry / "vertices.npy", mmap_mode="c")
+        faces = np.load(entry / "faces.npy", mmap_mode="c")
+        return vertices, faces
+
+    def load_trimesh(self, meshpath):
+        vertices, faces = self.load(meshpath)
+        return trimesh.Trimesh(vertices=vertices, faces=faces.reshape((-1, 4))[:, 1:], process=False)
+
+    def load_polydata(self, meshpath):
+        vertices, faces = self.load(meshpath)
+        return pv.PolyData(vertices, faces)
+
+    def entries(self):
+        return [path for path in self.cache_dir.iterdir() if path.is_dir() and path.name != "index" and path.suffix != ".tmp"]
+
+    def size(self, entry=None):
+        entries = [entry] if entry is not None else self.entries()
+        return sum(f.stat().st_size for path in entries for f in path.iterdir())
+
+    def evict(self):
+        entries = sorted(self.entries(), key=lambda path: path.stat().st_mtime)
+        sizes = {entry: self.size(entry) for entry in entries}
+        total = sum(sizes.values())
+        # drop the least recently used entries first, but always keep the newest one
+        for entry in entries[:-1]:
+            if total <= self.max_bytes: break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= sizes[entry]
+            logger.debug(f"evicted {entry} from the mesh cache")
+
+    def clear(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        os.makedirs(self.cache_dir / "index", exist_ok=True)
+
+_mesh_cache = None
+
+def get_mesh_cache():
+    global _mesh_cache
+    if _mesh_cache is None: _mesh_cache = MeshCache()
+    return _mesh_cache
+
+def load_trimesh(meshpath):
+    return get_mesh_cache().load_trimesh(meshpath)
+
+def load_polydata(meshpath):
+    return get_mesh_cache().load_polydata(meshpath)
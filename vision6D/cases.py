@@ -0,0 +1,136 @@
+import os
+import json
+import pathlib
+import logging
+
+import numpy as np
+import vision6D as vis
+
+logger = logging.getLogger("vision6D")
+
+class CaseIndex:
+    """Index of the cases found in the data directory
+
+    `surgical_planning/`, `frames/`, `gt_poses/` and the segmentation runs are scanned once
+    and the result is persisted as JSON in `index_path`. The index is only rebuilt when one
+    of the folders read by the scan was modified or created (a case, a mesh, a frame or a
+    mask was added or removed), so lookups by case id and side are a dictionary access and
+    new cases need no code edit.
+
+    Every case is a dict with the `case_id`, the `side`, the case `folder`, the `meshes`
+    per organ, the first `image`, the `frames` folder, the `gt_pose` and the `seg_mask`
+    paths (None when missing).
+    """
+
+    def __init__(self, data_dir=None, seg_mask_dir=None, index_path=None):
+        self.data_dir = pathlib.Path(data_dir) if data_dir is not None else vis.config.OP_DATA_DIR
+        self.seg_mask_dir = pathlib.Path(seg_mask_dir) if seg_mask_dir is not None else vis.config.YOLOV8_DATA_DIR / "runs" / "segment"
+        self.index_path = pathlib.Path(index_path) if index_path is not None else vis.config.CACHE_DIR / "case_index.json"
+        self.cases = {}
+        self.folders = {}
+        if not self.load(): self.scan()
+
+    def roots(self):
+        return [self.data_dir / "surgical_planning", self.data_dir / "frames", self.data_dir / "gt_poses", self.seg_mask_dir]
+
+    def case_folders(self, folder):
+        # the folders scan_case reads, besides the roots
+        seg_masks = self.seg_mask_dir / f"{folder}_right_with_poses" / "seg_masks"
+        return [self.data_dir / "surgical_planning" / folder, self.data_dir / "surgical_planning" / folder / "mesh", self.data_dir / "surgical_planning" / folder / "mesh" / "processed_meshes",
+                self.data_dir / "frames" / folder, seg_masks.parent, seg_masks, seg_masks / "ossicles"]
+
+    def stamp(self, folders):
+        # a folder mtime changes when an entry is added, removed or renamed in it, a missing folder has none
+        return {str(folder): os.stat(folder).st_mtime_ns if os.path.isdir(folder) else None for folder in folders}
+
+    def load(self):
+        try:
+            with open(self.index_path, "r") as f: index = json.load(f)
+        except (OSError, ValueError):
+            return False
+        stamp = index.get("stamp", {})
+        if not {str(root) for root in self.roots()} <= stamp.keys() or stamp != self.stamp(stamp): return False
+        self.cases, self.folders = index["cases"], index["folders"]
+        return True
+
+    def scan(self):
+        """Walk the data directory and rebuild the index"""
+        folders = self.roots()
+        self.cases, self.folders = {}, {}
+        planning = self.data_dir / "surgical_planning"
+        for folder in sorted(planning.iterdir()) if planning.is_dir() else []:
+            folders.extend(self.case_folders(folder.name))
+            meshes = folder / "mesh" / "processed_meshes"
+            if not meshes.is_dir(): continue
+            for mesh_path in sorted(meshes.glob("*_processed.mesh")):
+                # <case id>_<side>_<organ>_processed.mesh
+                case_id, side, organ = mesh_path.name[:-len("_processed.mesh")].split("_", 2)
+                key = f"{case_id}_{side}"
+                if key not in self.cases: self.cases[key] = self.scan_case(case_id, side, folder.name)
+                self.cases[key]["meshes"][organ] = str(mesh_path)
+        # frames, masks and labels are named after the case folder, e.g. CIP.455.8381493978235_video_trim_0
+        for key, case in self.cases.items(): self.folders.setdefault(case["folder"].split("_")[0], []).append(key)
+        # stamped after the walk, so the folders modified during it are scanned again on the next load
+        stamp = self.stamp(folders)
+
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.index_path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, "w") as f: json.dump({"stamp": stamp, "cases": self.cases, "folders": self.folders}, f)
+        os.replace(tmp_path, self.index_path)
+        logger.debug(f"indexed {len(self.cases)} cases from {self.data_dir} to {self.index_path}")
+        return self.cases
+
+    def scan_case(self, case_id, side, folder):
+        frames = self.data_dir / "frames" / folder
+        image = frames / f"{folder}_0.png"
+        gt_pose = self.data_dir / "gt_poses" / f"{case_id}_{side}_gt_pose.npy"
+        # the segmentation runs of both sides are stored under the "_right_with_poses" runs
+        seg_mask = self.seg_mask_dir / f"{folder}_right_with_poses" / "seg_masks" / "ossicles" / f"{folder}.png"
+        return {
+            "case_id": case_id,
+            "side": side,
+            "folder": folder,
+            "meshes": {},
+            "image": str(image) if image.exists() else None,
+            "frames": str(frames) if frames.is_dir() else None,
+            "gt_pose": str(gt_pose) if gt_pose.exists() else None,
+            "seg_mask": str(seg_mask) if seg_mask.exists() else None,
+        }
+
+    def __len__(self):
+        return len(self.cases)
+
+    def __iter__(self):
+        return iter(self.cases.values())
+
+    def __contains__(self, key):
+        return f"{key[0]}_{key[1]}" in self.cases
+
+    def get(self, case_id, side="right"):
+        key = f"{case_id}_{side}"
+        if key not in self.cases: raise KeyError(f"no {side} case {case_id} in {self.data_dir}")
+        return self.cases[key]
+
+    def mesh_path(self, case_id, side="right", organ="ossicles"):
+        case = self.get(case_id, side)
+        if organ not in case["meshes"]: raise KeyError(f"case {case_id} {side} has no {organ} mesh")
+        return pathlib.Path(case["meshes"][organ])
+
+    def gt_pose(self, case_id, side="right"):
+        case = self.get(case_id, side)
+        if case["gt_pose"] is None: raise KeyError(f"case {case_id} {side} has no gt pose")
+        return np.load(case["gt_pose"])
+
+    def find(self, path, side=None):
+        """Case of a frame, mask or label file named after its case folder, e.g. `CIP.455.8381493978235_video_trim_0.png`"""
+        keys = self.folders.get(pathlib.Path(path).stem.split("_")[0], [])
+        if side is not None: keys = [key for key in keys if self.cases[key]["side"] == side]
+        if not keys: raise KeyError(f"no case matches {path}")
+        return self.cases[keys[0]]
+
+_case_index = None
+
+def get_case_index():
+    global _case_index
+    if _case_index is None: _case_index = CaseIndex()
+    return _case_index
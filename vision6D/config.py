@@ -6,6 +6,9 @@ CWD = pathlib.Path(os.path.abspath(__file__)).parent
 GITROOT = CWD.parent
 OP_DATA_DIR = GITROOT.parent / 'ossicles_6D_pose_estimation' / 'data'
 YOLOV8_DATA_DIR = GITROOT.parent / 'yolov8'
+CACHE_DIR = pathlib.Path(os.environ.get("VISION6D_CACHE_DIR", pathlib.Path.home() / ".cache" / "vision6D"))
+# VISION6D_DEBUG=1 turns on the expensive consistency checks (e.g. full-frame comparisons)
+DEBUG = os.environ.get("VISION6D_DEBUG", "0") == "1"
 
 #~ right ossicles
 #* 455
@@ -97,20 +100,29 @@ FACIAL_NERVE_MESH_PATH_6087_left = OP_DATA_DIR / "surgical_planning"/ "CIP.6087.
 CHORDA_MESH_PATH_6087_left = OP_DATA_DIR / "surgical_planning"/ "CIP.6087.8415865242263_video_trim" / "mesh" / "processed_meshes" / "6087_left_chorda_processed.mesh"
 SCALA_TYMPANI_MESH_PATH_6087_left = OP_DATA_DIR / "surgical_planning"/ "CIP.6087.8415865242263_video_trim" / "mesh" / "processed_meshes" / "6087_left_scala_tympani_processed.mesh"
 
-# right ossicles
-# actual pose for the 455 mesh
-gt_pose_455_right = np.load(OP_DATA_DIR / "gt_poses" / "455_right_gt_pose.npy")
-gt_pose_5997_right = np.load(OP_DATA_DIR / "gt_poses" / "5997_right_gt_pose.npy")
-gt_pose_6088_right = np.load(OP_DATA_DIR / "gt_poses" / "6088_right_gt_pose.npy")
-gt_pose_6108_right = np.load(OP_DATA_DIR / "gt_poses" / "6108_right_gt_pose.npy")
-gt_pose_632_right = np.load(OP_DATA_DIR / "gt_poses" / "632_right_gt_pose.npy")
-
-gt_pose_6320_right = np.load(OP_DATA_DIR / "gt_poses" / "6320_right_gt_pose.npy")
-gt_pose_6329_right = np.load(OP_DATA_DIR / "gt_poses" / "6329_right_gt_pose.npy")
-gt_pose_6602_right = np.load(OP_DATA_DIR / "gt_poses" / "6602_right_gt_pose.npy")
-gt_pose_6751_right = np.load(OP_DATA_DIR / "gt_poses" / "6751_right_gt_pose.npy")
-
-# left ossicles
-gt_pose_6742_left = np.load(OP_DATA_DIR / "gt_poses" / "6742_left_gt_pose.npy")
-gt_pose_6087_left = np.load(OP_DATA_DIR / "gt_poses" / "6087_left_gt_pose.npy")
-
+# actual poses, loaded (and cached) on first access so importing the config never reads OP_DATA_DIR
+GT_POSE_PATHS = {
+    # right ossicles
+    "gt_pose_455_right": OP_DATA_DIR / "gt_poses" / "455_right_gt_pose.npy",
+    "gt_pose_5997_right": OP_DATA_DIR / "gt_poses" / "5997_right_gt_pose.npy",
+    "gt_pose_6088_right": OP_DATA_DIR / "gt_poses" / "6088_right_gt_pose.npy",
+    "gt_pose_6108_right": OP_DATA_DIR / "gt_poses" / "6108_right_gt_pose.npy",
+    "gt_pose_632_right": OP_DATA_DIR / "gt_poses" / "632_right_gt_pose.npy",
+    "gt_pose_6320_right": OP_DATA_DIR / "gt_poses" / "6320_right_gt_pose.npy",
+    "gt_pose_6329_right": OP_DATA_DIR / "gt_poses" / "6329_right_gt_pose.npy",
+    "gt_pose_6602_right": OP_DATA_DIR / "gt_poses" / "6602_right_gt_pose.npy",
+    "gt_pose_6751_right": OP_DATA_DIR / "gt_poses" / "6751_right_gt_pose.npy",
+    # left ossicles
+    "gt_pose_6742_left": OP_DATA_DIR / "gt_poses" / "6742_left_gt_pose.npy",
+    "gt_pose_6087_left": OP_DATA_DIR / "gt_poses" / "6087_left_gt_pose.npy",
+}
+
+def __getattr__(name):
+    if name in GT_POSE_PATHS:
+        pose = np.load(GT_POSE_PATHS[name])
+        globals()[name] = pose
+        return pose
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def __dir__():
+    return sorted(list(globals()) + list(GT_POSE_PATHS))
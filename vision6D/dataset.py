@@ -0,0 +1,126 @@
+import os
+import csv
+import time
+import pathlib
+import logging
+import argparse
+import concurrent.futures
+
+import numpy as np
+import PIL.Image
+import vision6D as vis
+
+logger = logging.getLogger("vision6D")
+
+def read_manifest(manifest_path):
+    """Read a dataset manifest
+
+    The manifest is a CSV file with a header and one row per frame. The `mesh` and `pose`
+    (a 4x4 `.npy`) columns are required, `image`, `seg_mask` and `name` are optional.
+    Relative paths are resolved against the folder of the manifest.
+    """
+    manifest_path = pathlib.Path(manifest_path)
+    with open(manifest_path, "r", newline="") as f: rows = list(csv.DictReader(f))
+
+    manifest = []
+    for i, row in enumerate(rows):
+        assert row.get("mesh") and row.get("pose"), f"row {i} of {manifest_path} needs a mesh and a pose"
+        entry = {}
+        for key in ("mesh", "pose", "image", "seg_mask"):
+            path = row.get(key)
+            entry[key] = manifest_path.parent / path if path else None
+        if row.get("name"): entry["name"] = row["name"]
+        elif entry["image"] is not None: entry["name"] = entry["image"].stem
+        else: entry["name"] = f"{entry['mesh'].stem}_{i}"
+        manifest.append(entry)
+    return manifest
+
+def render_row(app, row, output_dir, mesh_path=None):
+    """Render one manifest row with `app` and write its outputs, returns the mesh now loaded in `app`"""
+    pose = np.load(row["pose"])
+    assert pose.shape == (4, 4), f"{row['pose']} is not a 4x4 pose"
+    app.set_transformation_matrix(pose)
+    if row["mesh"] != mesh_path:
+        app.clear_meshes()
+        app.load_meshes({'mesh': str(row["mesh"])})
+
+    color_mask, depth_map = app.plot(return_depth_map=True)
+
+    if row["seg_mask"] is not None:
+        seg_mask = np.array(PIL.Image.open(row["seg_mask"])).astype("bool")
+        assert seg_mask.shape == color_mask.shape[:2], f"{row['seg_mask']} should be {app.window_size[0]}x{app.window_size[1]}"
+        if app.mirror_objects: seg_mask = seg_mask[..., ::-1]
+        color_mask = (color_mask * np.expand_dims(seg_mask, axis=-1)).astype(np.uint8)
+        depth_map = np.where(seg_mask, depth_map, np.nan)
+
+    PIL.Image.fromarray(color_mask).save(output_dir / "color_mask" / (row["name"] + ".png"))
+    np.save(output_dir / "depth" / (row["name"] + ".npy"), depth_map)
+    np.save(output_dir / "gt_poses" / (row["name"] + ".npy"), pose)
+    return row["mesh"]
+
+# long-lived state of a render farm worker process
+_worker = {}
+
+def _init_worker(output_dir, nocs_color, mirror_objects, width, height):
+    _worker["app"] = vis.App(off_screen=True, nocs_color=nocs_color, width=width, height=height, mirror_objects=mirror_objects)
+    _worker["output_dir"] = output_dir
+    _worker["mesh_path"] = None
+
+def _render_shard(shard):
+    for row in shard: _worker["mesh_path"] = render_row(_worker["app"], row, _worker["output_dir"], _worker["mesh_path"])
+    return [row["name"] for row in shard]
+
+def shard_by_case(manifest, num_shards):
+    """Group the rows by mesh, then split the groups in about `num_shards` shards that never mix two meshes"""
+    cases = {}
+    for row in manifest: cases.setdefault(row["mesh"], []).append(row)
+    shard_size = max(1, int(np.ceil(len(manifest) / num_shards)))
+    return [rows[i:i+shard_size] for rows in cases.values() for i in range(0, len(rows), shard_size)]
+
+def render_dataset(manifest, output_dir, nocs_color=True, mirror_objects=False, width=1920, height=1080, workers=1):
+    """Render the color mask, the depth map and the pose of every manifest row
+
+    With `workers=1` a single off-screen `App` (and therefore a single plotter and render
+    window) is used for the whole manifest; the mesh is only reloaded when it differs from
+    the previous row. With more workers the rows are sharded by mesh over a process pool
+    where every process keeps its own `App` and mesh cache, and the shards are collected
+    in order, case by case. The outputs are written to `output_dir / {color_mask, depth, gt_poses} / <name>`.
+    """
+    output_dir = pathlib.Path(output_dir)
+    for folder in ("color_mask", "depth", "gt_poses"): (output_dir / folder).mkdir(parents=True, exist_ok=True)
+
+    start = time.perf_counter()
+    if workers == 1:
+        app = vis.App(off_screen=True, nocs_color=nocs_color, width=width, height=height, mirror_objects=mirror_objects)
+        mesh_path = None
+        for i, row in enumerate(manifest):
+            mesh_path = render_row(app, row, output_dir, mesh_path)
+            print(f"[{i+1}/{len(manifest)}] {row['name']}: {(i+1) / (time.perf_counter() - start):.2f} FPS", flush=True)
+    else:
+        # a few shards per worker keeps every process busy until the end
+        shards = shard_by_case(manifest, workers * 4)
+        done = 0
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(output_dir, nocs_color, mirror_objects, width, height)) as executor:
+            for names in executor.map(_render_shard, shards):
+                done += len(names)
+                print(f"[{done}/{len(manifest)}] {names[-1]}: {done / (time.perf_counter() - start):.2f} FPS", flush=True)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="vision6d-render", description="Render color masks, depth maps and poses for every row of a manifest")
+    parser.add_argument("manifest", type=pathlib.Path, help="CSV file with mesh, pose, image and seg_mask columns")
+    parser.add_argument("output_dir", type=pathlib.Path, help="folder the color_mask, depth and gt_poses folders are written to")
+    parser.add_argument("--latlon", action="store_true", help="render the latitude/longitude colors instead of NOCS")
+    parser.add_argument("--mirror", action="store_true", help="mirror the objects (and the segmentation masks)")
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--workers", type=int, default=1, help="number of render processes, 0 for one per core")
+    args = parser.parse_args(argv)
+
+    manifest = read_manifest(args.manifest)
+    start = time.perf_counter()
+    render_dataset(manifest, args.output_dir, nocs_color=not args.latlon, mirror_objects=args.mirror, width=args.width, height=args.height, workers=args.workers or os.cpu_count())
+    elapsed = time.perf_counter() - start
+    print(f"Rendered {len(manifest)} frames in {elapsed:.2f} s ({len(manifest) / elapsed:.2f} FPS) to {args.output_dir}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+import re
+import pathlib
+import logging
+import threading
+import collections
+
+import numpy as np
+import PIL.Image
+import cv2
+
+logger = logging.getLogger("vision6D")
+
+IMAGE_SUFFIXES = ('.png', '.jpg')
+
+def frame_number(path):
+    # CIP.455.8381493978235_video_trim_12.png -> 12, so that frame 10 comes after frame 9
+    match = re.search(r"(\d+)$", pathlib.Path(path).stem)
+    return (int(match.group(1)) if match else -1, pathlib.Path(path).name)
+
+class FrameSequence:
+    """Frames of a video trim, decoded ahead by a background thread
+
+    `source` is a video file or a folder of frames (e.g. `frames/<case>_video_trim`). The
+    frames are kept in a bounded buffer of `capacity` decoded frames, least recently used
+    first out, and the thread decodes up to `prefetch` frames ahead in the direction the
+    sequence was last stepped, so stepping forward and back rarely waits on the decoder.
+    Every frame is a uint8 (H, W, C) RGB array like `np.array(PIL.Image.open(path))`.
+    """
+
+    def __init__(self, source, capacity=64, prefetch=16):
+        assert capacity > 1, "capacity should at least hold the current and the next frame"
+        self.source = pathlib.Path(source)
+        self.capture = None
+        if self.source.is_dir():
+            self.paths = sorted((path for path in self.source.iterdir() if path.suffix in IMAGE_SUFFIXES), key=frame_number)
+            self.length = len(self.paths)
+        else:
+            self.paths = None
+            self.capture = cv2.VideoCapture(str(self.source))
+            assert self.capture.isOpened(), f"cannot open the video {self.source}"
+            self.length = int(self.capture.get(cv2.CAP_PROP_FRAME_COUNT))
+            self.next_video_frame = 0
+        assert self.length > 0, f"no frames found in {self.source}"
+
+        self.capacity = capacity
+        self.prefetch = min(prefetch, capacity - 1)
+        self.buffer = collections.OrderedDict()
+        self.condition = threading.Condition()
+        self.position = 0
+        self.direction = 1
+        self.requested = None
+        self.closed = False
+        self.thread = threading.Thread(target=self.run, name=f"FrameSequence({self.source.name})", daemon=True)
+        self.thread.start()
+
+    def __len__(self):
+        return self.length
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def name(self, index):
+        """Path of frame `index`, a `<video stem>_<index>.png` next to the video for a video source"""
+        if self.paths is not None: return self.paths[index]
+        return self.source.parent / f"{self.source.stem}_{index}.png"
+
+    def index(self, path):
+        return self.paths.index(pathlib.Path(path)) if self.paths is not None else frame_number(path)[0]
+
+    def decode(self, index):
+        if self.paths is not None:
+            frame = np.array(PIL.Image.open(self.paths[index]), dtype='uint8')
+        else:
+            # only seek when the frames are not read in order, seeking restarts from a key frame
+            if index != self.next_video_frame: self.capture.set(cv2.CAP_PROP_POS_FRAMES, index)
+            success, frame = self.capture.read()
+            assert success, f"cannot decode frame {index} of {self.source}"
+            self.next_video_frame = index + 1
+            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        if len(frame.shape) == 2: frame = frame[..., None]
+        return frame
+
+    def next_index(self):
+        if self.requested is not None and self.requested not in self.buffer: return self.requested
+        for step in range(1, self.prefetch + 1):
+            index = self.position + self.direction * step
+            if 0 <= index < self.length and index not in self.buffer: return index
+        return None
+
+    def run(self):
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.closed or self.next_index() is not None)
+                if self.closed: return
+                index = self.next_index()
+            # decode without holding the lock, so the GUI can keep reading the buffer
+            try: frame = self.decode(index)
+            except Exception as e: frame = e
+            with self.condition:
+                self.buffer[index] = frame
+                while len(self.buffer) > self.capacity: self.buffer.popitem(last=False)
+                self.condition.notify_all()
+
+    def __getitem__(self, index):
+        if index < 0: index += self.length
+        if not 0 <= index < self.length: raise IndexError(f"frame {index} is out of range for {self.length} frames")
+        with self.condition:
+            assert not self.closed, "the frame sequence is closed"
+            if index != self.position: self.direction = 1 if index > self.position else -1
+            self.position = index
+            if index not in self.buffer:
+                self.requested = index
+                self.condition.notify_all()
+                self.condition.wait_for(lambda: index in self.buffer or self.closed)
+                self.requested = None
+                assert not self.closed, "the frame sequence is closed"
+            frame = self.buffer[index]
+            self.buffer.move_to_end(index)
+            # wake the decoder up to prefetch from the new position
+            self.condition.notify_all()
+        if isinstance(frame, Exception): raise frame
+        return frame
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        self.thread.join()
+        if self.capture is not None: self.capture.release()
@@ -0,0 +1,72 @@
+import logging
+import numpy as np
+
+logger = logging.getLogger("vision6D")
+
+class PoseHistory:
+    """Undo and redo of the actor poses, a bounded ring buffer per actor
+
+    Every actor name gets a preallocated (capacity, 4, 4) float64 buffer of the poses it
+    went through, with `start` the slot of the oldest pose, `count` the number of poses
+    and `cursor` the offset of the pose the actor is at. Pushing on a full buffer
+    overwrites the oldest pose, so push, undo and redo are O(1) and nothing is shifted.
+    A pose equal to the one at the cursor is not pushed again, so clicking an actor
+    without moving it does not add an undo step.
+    """
+
+    def __init__(self, capacity=20):
+        assert capacity > 1, "capacity should at least hold the current and the previous pose"
+        self.capacity = capacity
+        self.rings = {}
+
+    def ring(self, name):
+        if name not in self.rings: self.rings[name] = {"poses": np.empty((self.capacity, 4, 4)), "start": 0, "count": 0, "cursor": -1}
+        return self.rings[name]
+
+    def slot(self, ring, offset):
+        return (ring["start"] + offset) % self.capacity
+
+    def at_cursor(self, ring, pose):
+        return ring["cursor"] >= 0 and np.array_equal(ring["poses"][self.slot(ring, ring["cursor"])], pose)
+
+    def push(self, name, pose):
+        """Record `pose`, e.g. before the actor is dragged, and drop the poses that could be redone"""
+        ring = self.ring(name)
+        if self.at_cursor(ring, pose): return
+        ring["count"] = ring["cursor"] + 1
+        if ring["count"] == self.capacity:
+            # overwrite the oldest pose
+            ring["start"] = self.slot(ring, 1)
+            ring["count"] -= 1
+        ring["poses"][self.slot(ring, ring["count"])] = pose
+        ring["count"] += 1
+        ring["cursor"] = ring["count"] - 1
+
+    def undo(self, name, current):
+        """Pose before `current` (the pose the actor is at now), None when there is none"""
+        ring = self.ring(name)
+        # the actor moved since the last push, keep where it is now to redo it
+        self.push(name, current)
+        if ring["cursor"] <= 0: return None
+        ring["cursor"] -= 1
+        return ring["poses"][self.slot(ring, ring["cursor"])].copy()
+
+    def redo(self, name, current):
+        """Pose undone from `current`, None when there is none or the actor moved since"""
+        ring = self.ring(name)
+        if not self.at_cursor(ring, current):
+            self.push(name, current)
+            return None
+        if ring["cursor"] >= ring["count"] - 1: return None
+        ring["cursor"] += 1
+        return ring["poses"][self.slot(ring, ring["cursor"])].copy()
+
+    def undoable(self, name):
+        return max(self.rings[name]["cursor"], 0) if name in self.rings else 0
+
+    def redoable(self, name):
+        return self.rings[name]["count"] - 1 - self.rings[name]["cursor"] if name in self.rings else 0
+
+    def clear(self, name=None):
+        if name is None: self.rings = {}
+        else: self.rings.pop(name, None)
@@ -46,10 +46,15 @@ class Interface(MyMainWindow):
         self.image_actor = None
         self.mask_actor = None
         self.mesh_actors = {}
+        self.image_layer = vis.layers.ImageLayer(self.plotter, 'image', backend='texture')
+        self.mask_layer = vis.layers.ImageLayer(self.plotter, 'mask')
+        # property and pose changes of the actors, rendered once per event
+        self.scene = vis.layers.SceneBatch(self.plotter)
         
         self.track_actors_names = []
-        self.undo_poses = []
+        self.history = vis.history.PoseHistory()
         self.latlon = vis.utils.load_latitude_longitude()
+        self.latlon_index = None
 
         self.colors = ["cyan", "magenta", "yellow", "lime", "deepskyblue", "salmon", "silver", "aquamarine", "plum", "blueviolet"]
         self.used_colors = []
@@ -68,25 +73,20 @@ class Interface(MyMainWindow):
     def set_image_opacity(self, image_opacity: float):
         assert image_opacity>=0 and image_opacity<=1, "image opacity should range from 0 to 1!"
         self.image_opacity = image_opacity
-        if self.image_actor is not None:
-            self.image_actor.GetProperty().opacity = image_opacity
-            self.plotter.add_actor(self.image_actor, pickable=False, name='image')
+        if self.image_actor is not None: self.scene.set_opacity(self.image_actor, image_opacity)
 
     def set_mask_opacity(self, mask_opacity: float):
         assert mask_opacity>=0 and mask_opacity<=1, "image opacity should range from 0 to 1!"
         self.mask_opacity = mask_opacity
-        if self.mask_actor is not None:
-            self.mask_actor.GetProperty().opacity = mask_opacity
-            self.plotter.add_actor(self.mask_actor, pickable=False, name='mask')
+        if self.mask_actor is not None: self.scene.set_opacity(self.mask_actor, mask_opacity)
 
     def set_mesh_opacity(self, surface_opacity: float):
         assert surface_opacity>=0 and surface_opacity<=1, "mesh opacity should range from 0 to 1!"
         self.surface_opacity = surface_opacity
-        if len(self.mesh_actors) != 0:
-            for actor_name, actor in self.mesh_actors.items():
-                actor.user_matrix = pv.array_from_vtkmatrix(actor.GetMatrix())
-                actor.GetProperty().opacity = self.surface_opacity
-                self.plotter.add_actor(actor, pickable=True, name=actor_name)
+        with self.scene:
+            for actor in self.mesh_actors.values():
+                self.scene.set_matrix(actor, pv.array_from_vtkmatrix(actor.GetMatrix()))
+                self.scene.set_opacity(actor, self.surface_opacity)
     
     def set_camera_extrinsics(self, cam_position, cam_viewup):
         self.camera.SetPosition((0,0,cam_position))
@@ -126,22 +126,9 @@ class Interface(MyMainWindow):
         self.plotter.camera = self.camera.copy()
 
     def add_image(self, image_source):
-        dim = image_source.shape
-        h, w, channel = dim[0], dim[1], dim[2]
-
-        image = pv.UniformGrid(dimensions=(w, h, 1), spacing=self.spacing, origin=(0.0, 0.0, 0.0))
-        image.point_data["values"] = image_source.reshape((w * h, channel)) # order = 'C
-        image = image.translate(-1 * np.array(image.center), inplace=False)
-
-        # Then add it to the plotter
-        image = self.plotter.add_mesh(image, cmap='gray', opacity=self.mask_opacity, name='image') if channel == 1 else self.plotter.add_mesh(image, rgb=True, opacity=self.image_opacity, name='image')
-        actor, _ = self.plotter.add_actor(image, pickable=False, name='image')
-        # Save actor for later
-        self.image_actor = actor
-        
-        # get the image scalar
-        image_data = vis.utils.get_image_mask_actor_scalars(self.image_actor)
-        assert (image_data == image_source).all() or (image_data*255 == image_source).all(), "image_data and image_source should be equal"
+        channel = image_source.shape[2] if len(image_source.shape) == 3 else 1
+        # the layer keeps its grid and only swaps the scalars when the size is unchanged
+        self.image_actor = self.image_layer.set_data(image_source, self.spacing, self.mask_opacity if channel == 1 else self.image_opacity)
 
         # add remove current image to removeMenu
         if 'image' not in self.track_actors_names:
@@ -153,22 +140,7 @@ class Interface(MyMainWindow):
         self.reset_camera()
 
     def add_mask(self, mask_source):
-        dim = mask_source.shape
-        h, w, channel = dim[0], dim[1], dim[2]
-        
-        mask = pv.UniformGrid(dimensions=(w, h, 1), spacing=self.spacing, origin=(0.0, 0.0, 0.0))
-        mask.point_data["values"] = mask_source.reshape((w * h, channel)) # order = 'C
-        mask = mask.translate(-1 * np.array(mask.center), inplace=False)
-
-        # Then add it to the plotter
-        mask = self.plotter.add_mesh(mask, cmap='gray', opacity=self.mask_opacity, name='mask') if channel == 1 else self.plotter.add_mesh(mask, rgb=True, opacity=self.mask_opacity, name='mask')
-        actor, _ = self.plotter.add_actor(mask, pickable=False, name='mask')
-        # Save actor for later
-        self.mask_actor = actor
-
-        # get the image scalar
-        mask_data = vis.utils.get_image_mask_actor_scalars(self.mask_actor)
-        assert (mask_data == mask_source).all() or (mask_data*255 == mask_source).all(), "mask_data and mask_source should be equal"
+        self.mask_actor = self.mask_layer.set_data(mask_source, self.spacing, self.mask_opacity)
 
         # add remove current image to removeMenu
         if 'mask' not in self.track_actors_names:
@@ -192,7 +164,7 @@ class Interface(MyMainWindow):
                               
         if isinstance(mesh_source, pathlib.WindowsPath) or isinstance(mesh_source, str):
             # Load the '.mesh' file
-            if '.mesh' in str(mesh_source): mesh_source = vis.utils.load_trimesh(mesh_source)
+            if '.mesh' in str(mesh_source): mesh_source = vis.cache.load_trimesh(mesh_source)
             # Load the '.ply' file
             elif '.ply' in str(mesh_source): mesh_source = pv.read(mesh_source)
 
@@ -248,9 +220,7 @@ class Interface(MyMainWindow):
             self.image_opacity -= 0.2
             if self.image_opacity <= 0: self.image_opacity = 0
         
-        if self.image_actor is not None:
-            self.image_actor.GetProperty().opacity = self.image_opacity
-            self.plotter.add_actor(self.image_actor, pickable=False, name="image")
+        if self.image_actor is not None: self.scene.set_opacity(self.image_actor, self.image_opacity)
 
     def toggle_mask_opacity(self, *args, up):
         if up:
@@ -260,9 +230,7 @@ class Interface(MyMainWindow):
             self.mask_opacity -= 0.2
             if self.mask_opacity <= 0: self.mask_opacity = 0
         
-        if self.mask_actor is not None:
-            self.mask_actor.GetProperty().opacity = self.mask_opacity
-            self.plotter.add_actor(self.mask_actor, pickable=False, name="mask")
+        if self.mask_actor is not None: self.scene.set_opacity(self.mask_actor, self.mask_opacity)
 
     def toggle_surface_opacity(self, *args, up):    
         if up:
@@ -274,10 +242,10 @@ class Interface(MyMainWindow):
                 
         if len(self.mesh_actors) != 0:
             transformation_matrix = self.mesh_actors[self.reference].user_matrix
-            for actor_name, actor in self.mesh_actors.items():
-                actor.user_matrix = transformation_matrix
-                actor.GetProperty().opacity = self.surface_opacity
-                self.plotter.add_actor(actor, pickable=True, name=actor_name)
+            with self.scene:
+                for actor in self.mesh_actors.values():
+                    self.scene.set_matrix(actor, transformation_matrix)
+                    self.scene.set_opacity(actor, self.surface_opacity)
 
     def reset_camera(self, *args):
         self.plotter.camera = self.camera.copy()
@@ -289,15 +257,13 @@ class Interface(MyMainWindow):
         self.plotter.camera.zoom(0.5)
 
     def track_click_callback(self, *args):
-        if len(self.undo_poses) > 20: self.undo_poses.pop(0)
-        if self.reference is not None: self.undo_poses.append(self.mesh_actors[self.reference].user_matrix)
+        if self.reference is not None: self.history.push(self.reference, self.mesh_actors[self.reference].user_matrix)
 
     @try_except
     def reset_gt_pose(self, *args):
         print(f"\nRT: \n{self.initial_pose}\n")
-        for actor_name, actor in self.mesh_actors.items():
-            actor.user_matrix = self.initial_pose
-            self.plotter.add_actor(actor, pickable=True, name=actor_name)
+        with self.scene:
+            for actor in self.mesh_actors.values(): self.scene.set_matrix(actor, self.initial_pose)
 
     def update_gt_pose(self, *args):
         if self.reference is not None:
@@ -309,18 +275,22 @@ class Interface(MyMainWindow):
         if self.reference is not None:
             transformation_matrix = self.mesh_actors[self.reference].user_matrix
             print(f"\nRT: \n{transformation_matrix}\n")
-            for actor_name, actor in self.mesh_actors.items():
-                actor.user_matrix = transformation_matrix
-                self.plotter.add_actor(actor, pickable=True, name=actor_name)
+            with self.scene:
+                for actor in self.mesh_actors.values(): self.scene.set_matrix(actor, transformation_matrix)
 
     def undo_pose(self, *args):
-        if len(self.undo_poses) != 0: 
-            transformation_matrix = self.undo_poses.pop()
-            if (transformation_matrix == self.mesh_actors[self.reference].user_matrix).all():
-                if len(self.undo_poses) != 0: transformation_matrix = self.undo_poses.pop()
-            for actor_name, actor in self.mesh_actors.items():
-                actor.user_matrix = transformation_matrix
-                self.plotter.add_actor(actor, pickable=True, name=actor_name)
+        if self.reference is None: return
+        transformation_matrix = self.history.undo(self.reference, self.mesh_actors[self.reference].user_matrix)
+        if transformation_matrix is not None:
+            with self.scene:
+                for actor in self.mesh_actors.values(): self.scene.set_matrix(actor, transformation_matrix)
+
+    def redo_pose(self, *args):
+        if self.reference is None: return
+        transformation_matrix = self.history.redo(self.reference, self.mesh_actors[self.reference].user_matrix)
+        if transformation_matrix is not None:
+            with self.scene:
+                for actor in self.mesh_actors.values(): self.scene.set_matrix(actor, transformation_matrix)
 
     def set_color(self, nocs_color):
         self.nocs_color = nocs_color
@@ -358,7 +328,6 @@ class Interface(MyMainWindow):
         # swap the points for opencv, maybe because they handle RGB image differently (RGB -> BGR in opencv)
         idx = idx[:2][::-1]
         pts2d = np.stack((idx[0], idx[1]), axis=1)
-        pts3d = []
         
         # Obtain the rg color
         color = color_mask[pts2d[:,1], pts2d[:,0]][..., :2]
@@ -366,15 +335,8 @@ class Interface(MyMainWindow):
         gx = color[:, 0]
         gy = color[:, 1]
 
-        lat = np.array(self.latlon[..., 0])
-        lon = np.array(self.latlon[..., 1])
-        lonf = lon[mesh.faces]
-        msk = (np.sum(lonf>=0, axis=1)==3) & (np.sum(lat[mesh.faces]>=0, axis=1)==3)
-        for i in range(len(pts2d)):
-            pt = vis.utils.latLon2xyz(mesh, lat, lonf, msk, gx[i], gy[i])
-            pts3d.append(pt)
-       
-        pts3d = np.array(pts3d).reshape((len(pts3d), 3))
+        self.latlon_index = vis.utils.get_latlon_index(self.latlon, mesh.faces, self.latlon_index)
+        pts3d = self.latlon_index.query(mesh.vertices, gx, gy)
 
         pts2d = pts2d.astype('float32')
         pts3d = pts3d.astype('float32')
@@ -440,10 +402,7 @@ class Interface(MyMainWindow):
                         gt_pose_dir = pathlib.Path(self.mask_path).parent.parent.parent/ 'labels' / 'info.json'
                         with open(gt_pose_dir) as f: data = json.load(f)
                         gt_pose = np.array(data[pathlib.Path(self.mask_path).stem]['gt_pose'])
-                        id = pathlib.Path(self.mask_path).stem.split('_')[0].split('.')[1]
-                        #TODO: hard coded, and needed to be updated in the future
-                        mesh_path = pathlib.Path(self.mask_path).stem.split('_')[0] + '_video_trim' 
-                        mesh = vis.utils.load_trimesh(pathlib.Path(self.mesh_dir / mesh_path / "mesh" / "processed_meshes" / f"{id}_right_ossicles_processed.mesh"))
+                        mesh = vis.cache.load_trimesh(vis.cases.get_case_index().find(self.mask_path, side="right")["meshes"]["ossicles"])
                     else:
                         QMessageBox.warning(self, 'vision6D', "A color mask need to be loaded", QMessageBox.Ok, QMessageBox.Ok)
                         return 0
@@ -36,9 +36,17 @@ class Interface_GUI(MyMainWindow):
         self.image_actor = None
         self.mask_actor = None
         self.mesh_actors = {}
+        self.image_layer = vis.layers.ImageLayer(self.plotter, 'image', backend='texture')
+        self.mask_layer = vis.layers.ImageLayer(self.plotter, 'mask')
+        # property and pose changes of the actors, rendered once per event
+        self.scene = vis.layers.SceneBatch(self.plotter)
         
-        self.undo_poses = {}
+        self.history = vis.history.PoseHistory()
+        # the committed poses survive a crash, they are restored when the same mesh is loaded again
+        self.journal = vis.journal.PoseJournal()
+        self.signal_close.connect(self.journal.close)
         self.latlon = vis.utils.load_latitude_longitude()
+        self.latlon_index = None
 
         self.colors = ["cyan", "magenta", "yellow", "lime", "deepskyblue", "salmon", "silver", "aquamarine", "plum", "blueviolet"]
         self.used_colors = []
@@ -75,48 +83,24 @@ class Interface_GUI(MyMainWindow):
     def set_image_opacity(self, image_opacity: float):
         assert image_opacity>=0 and image_opacity<=1, "image opacity should range from 0 to 1!"
         self.image_opacity = image_opacity
-        self.image_actor.GetProperty().opacity = image_opacity
-        self.plotter.add_actor(self.image_actor, pickable=False, name='image')
+        self.scene.set_opacity(self.image_actor, image_opacity)
 
     def set_mask_opacity(self, mask_opacity: float):
         assert mask_opacity>=0 and mask_opacity<=1, "image opacity should range from 0 to 1!"
         self.mask_opacity = mask_opacity
-        self.mask_actor.GetProperty().opacity = mask_opacity
-        self.plotter.add_actor(self.mask_actor, pickable=False, name='mask')
+        self.scene.set_opacity(self.mask_actor, mask_opacity)
 
     def set_mesh_opacity(self, name: str, surface_opacity: float):
         assert surface_opacity>=0 and surface_opacity<=1, "mesh opacity should range from 0 to 1!"
         self.mesh_opacity[name] = surface_opacity
-        self.mesh_actors[name].user_matrix = pv.array_from_vtkmatrix(self.mesh_actors[name].GetMatrix())
-        self.mesh_actors[name].GetProperty().opacity = surface_opacity
-        self.plotter.add_actor(self.mesh_actors[name], pickable=True, name=name)
+        with self.scene:
+            self.scene.set_matrix(self.mesh_actors[name], pv.array_from_vtkmatrix(self.mesh_actors[name].GetMatrix()))
+            self.scene.set_opacity(self.mesh_actors[name], surface_opacity)
 
     def add_image(self, image_source):
 
-        if isinstance(image_source, pathlib.WindowsPath) or isinstance(image_source, str):
-            image_source = np.array(PIL.Image.open(image_source), dtype='uint8')
-        if len(image_source.shape) == 2: 
-            image_source = image_source[..., None]
-
-        if self.mirror_x: image_source = image_source[:, ::-1, :]
-        if self.mirror_y: image_source = image_source[::-1, :, :]
-
-        dim = image_source.shape
-        h, w, channel = dim[0], dim[1], dim[2]
-
-        image = pv.UniformGrid(dimensions=(w, h, 1), spacing=self.image_spacing, origin=(0.0, 0.0, 0.0))
-        image.point_data["values"] = image_source.reshape((w * h, channel)) # order = 'C
-        image = image.translate(-1 * np.array(image.center), inplace=False)
-
-        # Then add it to the plotter
-        image = self.plotter.add_mesh(image, cmap='gray', opacity=self.image_opacity, name='image') if channel == 1 else self.plotter.add_mesh(image, rgb=True, opacity=self.image_opacity, name='image')
-        actor, _ = self.plotter.add_actor(image, pickable=False, name='image')
-        # Save actor for later
-        self.image_actor = actor
-        
-        # get the image scalar
-        image_data = vis.utils.get_image_mask_actor_scalars(self.image_actor)
-        assert (image_data == image_source).all() or (image_data*255 == image_source).all(), "image_data and image_source should be equal"
+        # the layer keeps its grid and swaps the scalars, the source is mirrored by the layer
+        self.image_actor = self.image_layer.set_data(image_source, self.image_spacing, self.image_opacity, self.mirror_x, self.mirror_y)
 
         # add remove current image to removeMenu
         if 'image' not in self.track_actors_names:
@@ -128,32 +112,15 @@ class Interface_GUI(MyMainWindow):
         # reset the camera
         self.reset_camera()
 
-    def add_mask(self, mask_source):
-
-        if isinstance(mask_source, pathlib.WindowsPath) or isinstance(mask_source, str):
-            mask_source = np.array(PIL.Image.open(mask_source), dtype='uint8')
-        if len(mask_source.shape) == 2: 
-            mask_source = mask_source[..., None]
+    def update_image(self, image_source):
+        """Show another frame in the image actor, without resetting the camera"""
+        if self.image_actor is None: return self.add_image(image_source)
+        self.image_actor = self.image_layer.set_data(image_source, self.image_spacing, self.image_opacity, self.mirror_x, self.mirror_y)
+        self.plotter.render()
 
-        if self.mirror_x: mask_source = mask_source[:, ::-1, :]
-        if self.mirror_y: mask_source = mask_source[::-1, :, :]
-
-        dim = mask_source.shape
-        h, w, channel = dim[0], dim[1], dim[2]
-        
-        mask = pv.UniformGrid(dimensions=(w, h, 1), spacing=self.mask_spacing, origin=(0.0, 0.0, 0.0))
-        mask.point_data["values"] = mask_source.reshape((w * h, channel)) # order = 'C
-        mask = mask.translate(-1 * np.array(mask.center), inplace=False)
-
-        # Then add it to the plotter
-        mask = self.plotter.add_mesh(mask, cmap='gray', opacity=self.mask_opacity, name='mask') if channel == 1 else self.plotter.add_mesh(mask, rgb=True, opacity=self.mask_opacity, name='mask')
-        actor, _ = self.plotter.add_actor(mask, pickable=False, name='mask')
-        # Save actor for later
-        self.mask_actor = actor
+    def add_mask(self, mask_source):
 
-        # get the image scalar
-        mask_data = vis.utils.get_image_mask_actor_scalars(self.mask_actor)
-        assert (mask_data == mask_source).all() or (mask_data*255 == mask_source).all(), "mask_data and mask_source should be equal"
+        self.mask_actor = self.mask_layer.set_data(mask_source, self.mask_spacing, self.mask_opacity, self.mirror_x, self.mirror_y)
 
         # add remove current image to removeMenu
         if 'mask' not in self.track_actors_names:
@@ -178,7 +145,7 @@ class Interface_GUI(MyMainWindow):
                               
         if isinstance(mesh_source, pathlib.WindowsPath) or isinstance(mesh_source, str):
             # Load the '.mesh' file
-            if pathlib.Path(mesh_source).suffix == '.mesh': mesh_source = vis.utils.load_trimesh(mesh_source)
+            if pathlib.Path(mesh_source).suffix == '.mesh': mesh_source = vis.cache.load_polydata(mesh_source)
             # Load the '.ply' file
             else: mesh_source = pv.read(mesh_source)
 
@@ -260,17 +227,19 @@ class Interface_GUI(MyMainWindow):
         if picked_actor is not None:
             actor_name = picked_actor.name
             if actor_name in self.mesh_actors:        
-                if actor_name not in self.undo_poses: self.undo_poses[actor_name] = []
-                self.undo_poses[actor_name].append(self.mesh_actors[actor_name].user_matrix)
-                if len(self.undo_poses[actor_name]) > 20: self.undo_poses[actor_name].pop(0)
+                self.history.push(actor_name, self.mesh_actors[actor_name].user_matrix)
                 # check the picked mesh actor
                 self.check_button(actor_name)
 
+    def journal_poses(self, *args):
+        # keyed by the mesh file so that only the same mesh restores the pose, unchanged poses are skipped
+        for actor_name, actor in self.mesh_actors.items(): self.journal.append(pathlib.Path(self.meshdict[actor_name]).stem, actor.user_matrix)
+
     def reset_gt_pose(self, *args):
         self.output_text.clear(); self.output_text.append(f"\nReset the GT pose to: \n{self.initial_pose}\n")
-        for actor_name, actor in self.mesh_actors.items():
-            actor.user_matrix = self.initial_pose
-            self.plotter.add_actor(actor, pickable=True, name=actor_name)
+        with self.scene:
+            for actor in self.mesh_actors.values(): self.scene.set_matrix(actor, self.initial_pose)
+        self.journal_poses()
 
     def update_gt_pose(self, *args):
         if self.reference is not None:
@@ -278,9 +247,9 @@ class Interface_GUI(MyMainWindow):
             self.transformation_matrix = self.mesh_actors[self.reference].user_matrix
             self.initial_pose = self.transformation_matrix
             self.output_text.append(f"\nUpdate the GT pose to: \n{self.initial_pose}\n")
-            for actor_name, actor in self.mesh_actors.items():
-                actor.user_matrix = self.initial_pose
-                self.plotter.add_actor(actor, pickable=True, name=actor_name)
+            with self.scene:
+                for actor in self.mesh_actors.values(): self.scene.set_matrix(actor, self.initial_pose)
+            self.journal_poses()
 
     def current_pose(self, *args):
         if self.reference is not None:
@@ -288,28 +257,31 @@ class Interface_GUI(MyMainWindow):
             self.output_text.clear(); 
             self.output_text.append(f"Current reference mesh is: <span style='background-color:yellow; color:black;'>{self.reference}</span>")
             self.output_text.append(f"\nCurrent pose is: \n{transformation_matrix}\n")
-            for actor_name, actor in self.mesh_actors.items():
-                actor.user_matrix = transformation_matrix
-                self.plotter.add_actor(actor, pickable=True, name=actor_name)
+            with self.scene:
+                for actor in self.mesh_actors.values(): self.scene.set_matrix(actor, transformation_matrix)
+            self.journal_poses()
 
     def undo_pose(self, *args):
-        if self.button_group_actors_names.checkedButton() is not None:
+        self.step_pose(undo=True)
+
+    def redo_pose(self, *args):
+        self.step_pose(undo=False)
+
+    def step_pose(self, undo):
+        if self.button_group_actors_names.checkedButton() is not None and self.button_group_actors_names.checkedButton().text() in self.mesh_actors:
             actor_name = self.button_group_actors_names.checkedButton().text()
         else:
             QtWidgets.QMessageBox.warning(self, 'vision6D', "Choose a mesh actor first", QtWidgets.QMessageBox.Ok, QtWidgets.QMessageBox.Ok)
             return 0
-        if len(self.undo_poses[actor_name]) != 0: 
-            transformation_matrix = self.undo_poses[actor_name].pop()
-            if (transformation_matrix == self.mesh_actors[actor_name].user_matrix).all():
-                if len(self.undo_poses[actor_name]) != 0: 
-                    transformation_matrix = self.undo_poses[actor_name].pop()
-
+        current = self.mesh_actors[actor_name].user_matrix
+        transformation_matrix = self.history.undo(actor_name, current) if undo else self.history.redo(actor_name, current)
+        if transformation_matrix is not None:
             self.output_text.clear(); 
             self.output_text.append(f"Current reference mesh is: <span style='background-color:yellow; color:black;'>{actor_name}</span>")
-            self.output_text.append(f"\nUndo pose to: \n{transformation_matrix}\n")
+            self.output_text.append(f"\n{'Undo' if undo else 'Redo'} pose to: \n{transformation_matrix}\n")
                 
-            self.mesh_actors[actor_name].user_matrix = transformation_matrix
-            self.plotter.add_actor(self.mesh_actors[actor_name], pickable=True, name=actor_name)
+            self.scene.set_matrix(self.mesh_actors[actor_name], transformation_matrix)
+            self.journal_poses()
 
     def set_scalar(self, nocs, actor_name):
         vertices, faces = vis.utils.get_mesh_actor_vertices_faces(self.mesh_actors[actor_name])
@@ -323,7 +295,7 @@ class Interface_GUI(MyMainWindow):
             return 0
         assert colors.shape == vertices.shape, "colors shape should be the same as vertices shape"
         # color the mesh and actor
-        mesh_data = pv.wrap(trimesh.Trimesh(vertices, faces, process=False))
+        mesh_data = vis.utils.get_mesh_actor_polydata(self.mesh_actors[actor_name])
         mesh = self.plotter.add_mesh(mesh_data, scalars=colors, rgb=True, opacity=self.mesh_opacity[actor_name], name=actor_name)
         transformation_matrix = pv.array_from_vtkmatrix(self.mesh_actors[actor_name].GetMatrix())
         mesh.user_matrix = transformation_matrix
@@ -334,8 +306,7 @@ class Interface_GUI(MyMainWindow):
         self.mesh_actors[actor_name] = actor
 
     def set_color(self, color, actor_name):
-        vertices, faces = vis.utils.get_mesh_actor_vertices_faces(self.mesh_actors[actor_name])
-        mesh_data = pv.wrap(trimesh.Trimesh(vertices, faces, process=False))
+        mesh_data = vis.utils.get_mesh_actor_polydata(self.mesh_actors[actor_name])
         mesh = self.plotter.add_mesh(mesh_data, color=color, opacity=self.mesh_opacity[actor_name], name=actor_name)
         transformation_matrix = pv.array_from_vtkmatrix(self.mesh_actors[actor_name].GetMatrix())
         mesh.user_matrix = transformation_matrix
@@ -343,38 +314,49 @@ class Interface_GUI(MyMainWindow):
         assert actor.name == actor_name, "actor's name should equal to actor_name"
         self.mesh_actors[actor_name] = actor
         
-    def nocs_epnp(self, color_mask, mesh):
+    def surface_pairs(self, color_mask, actor_name, flipped=False):
+        # the colored pixels of a render of the actor, looked up in its id buffer; the pixels are flipped
+        # back like the unmirrored mesh points, so EPnP gives the unmirrored pose (flipped: the mask already is)
+        face_ids = vis.utils.get_mesh_actor_face_ids(self.mesh_actors[actor_name], self.id_buffer, self.camera.copy())
+        mask = vis.utils.color2binary_mask(color_mask)[..., 0]
+        if flipped and self.mirror_x: mask = mask[:, ::-1]
+        if flipped and self.mirror_y: mask = mask[::-1, :]
+        vertices, faces = vis.utils.get_mesh_actor_vertices_faces(self.mesh_actors[actor_name])
+        pts3d, pts2d = vis.utils.pick_surface_points(face_ids, vertices, faces, self.camera_intrinsics, self.mesh_actors[actor_name].user_matrix, self.camera.position, mask=mask)
+        if self.mirror_x: pts2d[:, 0] = self.window_size[0] - pts2d[:, 0]
+        if self.mirror_y: pts2d[:, 1] = self.window_size[1] - pts2d[:, 1]
+        return pts3d, pts2d
+
+    def nocs_epnp(self, color_mask, mesh, actor_name=None):
         vertices = mesh.vertices
-        pts3d, pts2d = vis.utils.create_2d_3d_pairs(color_mask, vertices)
+        # a mask rendered from an actor does not need its colors inverted, and its pose is already unmirrored
+        if actor_name is not None: pts3d, pts2d = self.surface_pairs(color_mask, actor_name)
+        else: pts3d, pts2d = vis.utils.create_2d_3d_pairs(color_mask, vertices)
         pts2d = pts2d.astype('float32')
         pts3d = pts3d.astype('float32')
         camera_intrinsics = self.camera_intrinsics.astype('float32')
         predicted_pose = vis.utils.solve_epnp_cv2(pts2d, pts3d, camera_intrinsics, self.camera.position)
         return predicted_pose
 
-    def latlon_epnp(self, color_mask, mesh):
-        binary_mask = vis.utils.color2binary_mask(color_mask)
-        idx = np.where(binary_mask == 1)
-        # swap the points for opencv, maybe because they handle RGB image differently (RGB -> BGR in opencv)
-        idx = idx[:2][::-1]
-        pts2d = np.stack((idx[0], idx[1]), axis=1)
-        pts3d = []
-        
-        # Obtain the rg color
-        color = color_mask[pts2d[:,1], pts2d[:,0]][..., :2]
-        if np.max(color) > 1: color = color / 255
-        gx = color[:, 0]
-        gy = color[:, 1]
-
-        lat = np.array(self.latlon[..., 0])
-        lon = np.array(self.latlon[..., 1])
-        lonf = lon[mesh.faces]
-        msk = (np.sum(lonf>=0, axis=1)==3) & (np.sum(lat[mesh.faces]>=0, axis=1)==3)
-        for i in range(len(pts2d)):
-            pt = vis.utils.latLon2xyz(mesh, lat, lonf, msk, gx[i], gy[i])
-            pts3d.append(pt)
-       
-        pts3d = np.array(pts3d).reshape((len(pts3d), 3))
+    def latlon_epnp(self, color_mask, mesh, actor_name=None):
+        if actor_name is not None:
+            # epnp_mask flips the latlon color mask back when the actors are mirrored
+            pts3d, pts2d = self.surface_pairs(color_mask, actor_name, flipped=True)
+        else:
+            binary_mask = vis.utils.color2binary_mask(color_mask)
+            idx = np.where(binary_mask == 1)
+            # swap the points for opencv, maybe because they handle RGB image differently (RGB -> BGR in opencv)
+            idx = idx[:2][::-1]
+            pts2d = np.stack((idx[0], idx[1]), axis=1)
+            
+            # Obtain the rg color
+            color = color_mask[pts2d[:,1], pts2d[:,0]][..., :2]
+            if np.max(color) > 1: color = color / 255
+            gx = color[:, 0]
+            gy = color[:, 1]
+
+            self.latlon_index = vis.utils.get_latlon_index(self.latlon, mesh.faces, self.latlon_index)
+            pts3d = self.latlon_index.query(mesh.vertices, gx, gy)
 
         pts2d = pts2d.astype('float32')
         pts3d = pts3d.astype('float32')
@@ -402,9 +384,7 @@ class Interface_GUI(MyMainWindow):
             if self.mesh_colors[self.reference] == 'nocs':
                 vertices, faces = vis.utils.get_mesh_actor_vertices_faces(self.mesh_actors[self.reference])
                 mesh = trimesh.Trimesh(vertices, faces, process=False)
-                predicted_pose = self.nocs_epnp(color_mask, mesh)
-                if self.mirror_x: predicted_pose = np.array([[-1, 0, 0, 0], [0, 1, 0, 0], [0, 0, 1, 0], [0, 0, 0, 1]]) @ predicted_pose @ np.array([[-1, 0, 0, 0], [0, 1, 0, 0], [0, 0, 1, 0], [0, 0, 0, 1]])
-                if self.mirror_y: predicted_pose = np.array([[1, 0, 0, 0], [0, -1, 0, 0], [0, 0, 1, 0], [0, 0, 0, 1]]) @ predicted_pose @ np.array([[1, 0, 0, 0], [0, -1, 0, 0], [0, 0, 1, 0], [0, 0, 0, 1]])
+                predicted_pose = self.nocs_epnp(color_mask, mesh, self.reference)
                 error = np.sum(np.abs(predicted_pose - gt_pose))
                 self.output_text.clear()
                 self.output_text.append(f"PREDICTED POSE WITH <span style='background-color:yellow; color:black;'>NOCS COLOR</span>: ")
@@ -417,6 +397,35 @@ class Interface_GUI(MyMainWindow):
             QtWidgets.QMessageBox.warning(self, 'vision6D', "A mesh need to be loaded/mesh reference need to be set", QtWidgets.QMessageBox.Ok, QtWidgets.QMessageBox.Ok)
             return 0
 
+    def epnp_meshes(self):
+        # every nocs colored mesh is solved from one render of all of them, occlusions included
+        names = [name for name in self.mesh_actors if self.mesh_colors[name] == 'nocs']
+        if len(names) == 0:
+            QtWidgets.QMessageBox.warning(self, 'vision6D', "The meshes need to be colored with nocs", QtWidgets.QMessageBox.Ok, QtWidgets.QMessageBox.Ok)
+            return 0
+
+        meshes, objects = [], {}
+        for label, name in enumerate(names):
+            vertices, faces = vis.utils.get_mesh_actor_vertices_faces(self.mesh_actors[name])
+            self.render.set_mesh(name, vertices, faces, colors=vis.utils.get_mesh_actor_scalars(self.mesh_actors[name]), user_matrix=self.mesh_actors[name].user_matrix)
+            meshes.append((vertices, faces, self.mesh_actors[name].user_matrix))
+            objects[name] = (label, vertices)
+        color_mask = self.render.show(names, self.camera.copy())
+        label_mask = vis.raster.rasterize_labels(meshes, self.camera_intrinsics, self.window_size[0], self.window_size[1], self.camera.position)
+        poses, stats, seconds = vis.pnp.solve_epnp_objects(color_mask, label_mask, objects, self.camera_intrinsics, self.camera.position)
+
+        self.output_text.clear()
+        self.output_text.append(f"SOLVED {len(poses)} MESHES WITH <span style='background-color:yellow; color:black;'>NOCS COLOR</span> IN {seconds:.3f} s")
+        for name, predicted_pose in poses.items():
+            gt_pose = self.mesh_actors[name].user_matrix
+            if self.mirror_x: gt_pose = np.array([[-1, 0, 0, 0], [0, 1, 0, 0], [0, 0, 1, 0], [0, 0, 0, 1]]) @ gt_pose
+            if self.mirror_y: gt_pose = np.array([[1, 0, 0, 0], [0, -1, 0, 0], [0, 0, 1, 0], [0, 0, 0, 1]]) @ gt_pose
+            if self.mirror_x: predicted_pose = np.array([[-1, 0, 0, 0], [0, 1, 0, 0], [0, 0, 1, 0], [0, 0, 0, 1]]) @ predicted_pose @ np.array([[-1, 0, 0, 0], [0, 1, 0, 0], [0, 0, 1, 0], [0, 0, 0, 1]])
+            if self.mirror_y: predicted_pose = np.array([[1, 0, 0, 0], [0, -1, 0, 0], [0, 0, 1, 0], [0, 0, 0, 1]]) @ predicted_pose @ np.array([[1, 0, 0, 0], [0, -1, 0, 0], [0, 0, 1, 0], [0, 0, 0, 1]])
+            error = np.sum(np.abs(predicted_pose - gt_pose))
+            self.output_text.append(f"\n{name}: {stats[name]['inliers']}/{stats[name]['correspondences']} inliers in {stats[name]['seconds']:.3f} s")
+            self.output_text.append(f"\n{predicted_pose}\n\nERROR: {error}")
+
     def epnp_mask(self, nocs_method):
         if self.mask_actor is not None:
             mask_data = vis.utils.get_image_mask_actor_scalars(self.mask_actor)
@@ -437,6 +446,8 @@ class Interface_GUI(MyMainWindow):
                     if self.mirror_y: gt_pose = np.array([[1, 0, 0, 0], [0, -1, 0, 0], [0, 0, 1, 0], [0, 0, 0, 1]]) @ gt_pose
                     vertices, faces = vis.utils.get_mesh_actor_vertices_faces(self.mesh_actors[self.reference])
                     mesh = trimesh.Trimesh(vertices, faces, process=False)
+                    # the color mask is a render of the reference actor
+                    actor_name = self.reference
                 else: 
                     QtWidgets.QMessageBox.warning(self, 'vision6D', "A mesh need to be loaded/mesh reference need to be set", QtWidgets.QMessageBox.Ok, QtWidgets.QMessageBox.Ok)
                     return 0
@@ -452,9 +463,8 @@ class Interface_GUI(MyMainWindow):
                         gt_pose_dir = pathlib.Path(self.mask_path).parent.parent.parent/ 'labels' / 'info.json'
                         with open(gt_pose_dir) as f: data = json.load(f)
                         gt_pose = np.array(data[pathlib.Path(self.mask_path).stem]['gt_pose'])
-                        #TODO: hard coded, and needed to be updated in the future
-                        mesh_path = pathlib.Path(self.mask_path).stem.split('_')[0] + '_video_trim' 
-                        mesh = vis.utils.load_trimesh(next(pathlib.Path(vis.config.OP_DATA_DIR / "surgical_planning" / mesh_path / "mesh" / "processed_meshes").glob("*_ossicles_processed.mesh")))
+                        mesh = vis.cache.load_trimesh(vis.cases.get_case_index().find(self.mask_path)["meshes"]["ossicles"])
+                        actor_name = None
                     else:
                         QtWidgets.QMessageBox.warning(self, 'vision6D', "A color mask need to be loaded", QtWidgets.QMessageBox.Ok, QtWidgets.QMessageBox.Ok)
                         return 0
@@ -465,14 +475,15 @@ class Interface_GUI(MyMainWindow):
                 
             if nocs_method == nocs_color:
                 if nocs_method: 
-                    predicted_pose = self.nocs_epnp(color_mask, mesh)
-                    if self.mirror_x: predicted_pose = np.array([[-1, 0, 0, 0], [0, 1, 0, 0], [0, 0, 1, 0], [0, 0, 0, 1]]) @ predicted_pose @ np.array([[-1, 0, 0, 0], [0, 1, 0, 0], [0, 0, 1, 0], [0, 0, 0, 1]])
-                    if self.mirror_y: predicted_pose = np.array([[1, 0, 0, 0], [0, -1, 0, 0], [0, 0, 1, 0], [0, 0, 0, 1]]) @ predicted_pose @ np.array([[1, 0, 0, 0], [0, -1, 0, 0], [0, 0, 1, 0], [0, 0, 0, 1]])
+                    predicted_pose = self.nocs_epnp(color_mask, mesh, actor_name)
+                    # the id buffer pairs of a rendered mask give the unmirrored pose already
+                    if actor_name is None and self.mirror_x: predicted_pose = np.array([[-1, 0, 0, 0], [0, 1, 0, 0], [0, 0, 1, 0], [0, 0, 0, 1]]) @ predicted_pose @ np.array([[-1, 0, 0, 0], [0, 1, 0, 0], [0, 0, 1, 0], [0, 0, 0, 1]])
+                    if actor_name is None and self.mirror_y: predicted_pose = np.array([[1, 0, 0, 0], [0, -1, 0, 0], [0, 0, 1, 0], [0, 0, 0, 1]]) @ predicted_pose @ np.array([[1, 0, 0, 0], [0, -1, 0, 0], [0, 0, 1, 0], [0, 0, 0, 1]])
                     color_theme = 'NOCS'
                 else: 
                     if self.mirror_x: color_mask = color_mask[:, ::-1, :]
                     if self.mirror_y: color_mask = color_mask[::-1, :, :]
-                    predicted_pose = self.latlon_epnp(color_mask, mesh)
+                    predicted_pose = self.latlon_epnp(color_mask, mesh, actor_name)
                     color_theme = 'LATLON'
                 error = np.sum(np.abs(predicted_pose - gt_pose))
                 self.output_text.clear()
@@ -0,0 +1,141 @@
+import os
+import time
+import hashlib
+import pathlib
+import logging
+import threading
+try: import fcntl
+except ImportError: import msvcrt; fcntl = None
+
+import numpy as np
+import vision6D as vis
+
+logger = logging.getLogger("vision6D")
+
+# one fixed-size record per committed pose, 200 bytes
+RECORD = np.dtype([("actor", "S64"), ("time", "<f8"), ("pose", "<f8", (4, 4))])
+
+def record_key(actor):
+    """The `RECORD` key of `actor`, a name longer than the 64 bytes of the field keeps its start and a hash of the rest"""
+    name = actor.encode()
+    if len(name) <= RECORD["actor"].itemsize: return actor
+    return name[:RECORD["actor"].itemsize - 16].decode(errors="ignore") + hashlib.sha1(name).hexdigest()[:16]
+
+def lock_file(path):
+    # an exclusive lock held until the returned fd is closed (or the process dies), None when it is already held
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        if fcntl is not None: fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else: msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+    except OSError:
+        os.close(fd)
+        return None
+    return fd
+
+def read_journal(path):
+    """All the complete records of the journal at `path`, a partial record at the end is ignored"""
+    try: data = np.fromfile(path, dtype=np.uint8)
+    except FileNotFoundError: return np.zeros(0, dtype=RECORD)
+    return data[:len(data) // RECORD.itemsize * RECORD.itemsize].view(RECORD)
+
+def latest_records(records):
+    # the last record of every actor, in the journal order
+    _, index = np.unique(records["actor"][::-1], return_index=True)
+    return records[np.sort(len(records) - 1 - index)]
+
+class PoseJournal:
+    """Append-only journal of the committed poses of an annotation session
+
+    Every pose change is appended to `path` as a fixed-size `RECORD` (actor, timestamp,
+    4x4 pose) with a single unbuffered `os.write`, so the GUI callbacks never wait on the
+    disk. A background thread fsyncs the journal every `sync_interval` seconds when it
+    was written to. On open the journal of the previous session is replayed with one
+    `np.fromfile`, and the last pose of every actor is kept in `restored`. `compact` saves
+    the last pose of the exported actors to their `.npy` outputs and drops their records.
+
+    The actors are keyed by `record_key`. The journal is locked by its session, another
+    session opening the same `path` gets a journal of its own process instead, e.g.
+    `session.1234.journal`, so the two never replace each other's records.
+    """
+
+    def __init__(self, path=None, sync_interval=1.0):
+        self.path = pathlib.Path(path) if path is not None else vis.config.CACHE_DIR / "session.journal"
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.lock_fd = lock_file(self.path.with_name(self.path.name + ".lock"))
+        if self.lock_fd is None:
+            self.path = self.path.with_name(f"{self.path.stem}.{os.getpid()}{self.path.suffix}")
+            self.lock_fd = lock_file(self.path.with_name(self.path.name + ".lock"))
+            logger.warning(f"the journal is used by another session, journaling to {self.path}")
+        records = read_journal(self.path)
+        self.restored = {record["actor"].decode(): record["pose"].copy() for record in latest_records(records)}
+        self.poses = dict(self.restored)
+        self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o644)
+        # a crash in the middle of a write leaves a partial record, drop it to keep the next records aligned
+        os.ftruncate(self.fd, len(records) * RECORD.itemsize)
+        logger.debug(f"replayed {len(records)} records of {len(self.restored)} actors from {self.path}")
+
+        self.sync_interval = sync_interval
+        self.lock = threading.Lock()
+        self.dirty = False
+        self.closed = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="PoseJournal", daemon=True)
+        self.thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def restore(self, actor):
+        """Pop the pose of `actor` restored from the previous session, None when there is none"""
+        return self.restored.pop(record_key(actor), None)
+
+    def append(self, actor, pose):
+        """Journal `pose` of `actor`, nothing is written when it did not change"""
+        actor = record_key(actor)
+        if actor in self.poses and np.array_equal(self.poses[actor], pose): return
+        record = np.zeros(1, dtype=RECORD)
+        record["actor"], record["time"], record["pose"] = actor.encode(), time.time(), pose
+        with self.lock:
+            os.write(self.fd, record.tobytes())
+            self.dirty = True
+        self.poses[actor] = record["pose"][0]
+
+    def run(self):
+        while not self.closed.wait(self.sync_interval): self.sync()
+
+    def sync(self):
+        with self.lock:
+            if not self.dirty: return
+            self.dirty = False
+            os.fsync(self.fd)
+
+    def compact(self, outputs):
+        """Save the last pose of every actor of `outputs` ({actor: .npy path}) and drop the actors from the journal"""
+        outputs = {record_key(actor): output_path for actor, output_path in outputs.items()}
+        for actor, output_path in outputs.items(): np.save(output_path, self.poses[actor])
+        with self.lock:
+            records = latest_records(read_journal(self.path))
+            records = records[~np.isin(records["actor"], [actor.encode() for actor in outputs])]
+            # write the remaining records aside, then swap the journals so a crash keeps one of them
+            tmp_path = self.path.with_suffix(f".{os.getpid()}.tmp")
+            with open(tmp_path, "wb") as f:
+                records.tofile(f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+            os.close(self.fd)
+            self.fd = os.open(self.path, os.O_RDWR | os.O_APPEND)
+            self.dirty = False
+        for actor in outputs:
+            self.poses.pop(actor, None)
+            self.restored.pop(actor, None)
+
+    def close(self):
+        if self.closed.is_set(): return
+        self.closed.set()
+        self.thread.join()
+        self.sync()
+        os.close(self.fd)
+        if self.lock_fd is not None: os.close(self.lock_fd)
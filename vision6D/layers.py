@@ -0,0 +1,164 @@
+import pathlib
+import logging
+
+import numpy as np
+import PIL.Image
+import pyvista as pv
+import vtk
+import vtk.util.numpy_support as vtknp
+import vision6D as vis
+
+logger = logging.getLogger("vision6D")
+
+class ImageLayer:
+    """An image or a mask shown as a flat grid centered at the origin of a plotter
+
+    The layer owns one grid and one actor and keeps them as long as the frame size and the
+    number of channels do not change. A new frame, a mirror or a new spacing only swaps
+    the point data for a zero-copy VTK view of the array (`numpy_to_vtk(deep=False)`) or
+    moves the grid origin, so nothing is re-read from disk nor re-added to the plotter.
+    The unmirrored source is kept and mirroring is a strided view of it.
+
+    With `backend='texture'` an RGB(A) frame is not drawn as a grid of w * h colored points
+    but uploaded once as a `vtkTexture` on a single quad of 4 points. The quad is w * h
+    texels large so the texel centers fall on the grid points, with the same spacing and
+    centering. Single channel data (masks) always uses the grid backend, so it keeps its
+    gray colormap.
+    """
+
+    def __init__(self, plotter, name, backend='grid'):
+        assert backend in ('grid', 'texture'), "backend should be 'grid' or 'texture'"
+        self.plotter = plotter
+        self.name = name
+        self.backend = backend
+        self.grid = None
+        self.quad = None
+        self.actor = None
+        self.source = None
+        self.data = None
+        self.mirror_x = False
+        self.mirror_y = False
+
+    def set_data(self, source, spacing=[0.01, 0.01, 1], opacity=1.0, mirror_x=False, mirror_y=False):
+        """Show `source` (an image path or a (H, W) or (H, W, C) array) and return the actor"""
+        if isinstance(source, (str, pathlib.Path)): source = np.array(PIL.Image.open(source), dtype='uint8')
+        if len(source.shape) == 2: source = source[..., None]
+        self.source, self.mirror_x, self.mirror_y = source, mirror_x, mirror_y
+
+        h, w, channel = source.shape
+        if self.actor is None or self.grid.dimensions != (w, h, 1) or self.data.shape[-1] != channel:
+            # the new actor replaces the previous one of the same name
+            self.actor = None
+            self.grid = pv.UniformGrid(dimensions=(w, h, 1), spacing=spacing, origin=(0.0, 0.0, 0.0))
+            self.quad = self.build_quad() if self.backend == 'texture' and channel != 1 else None
+            self.set_spacing(spacing)
+            self.swap()
+            # Then add it to the plotter
+            if self.quad is not None:
+                # the grid is only the texture image, the quad is what gets rendered
+                texture = vtk.vtkTexture()
+                texture.SetInputData(self.grid)
+                texture.SetColorModeToDirectScalars()
+                texture.InterpolateOn()
+                # the texture colors are multiplied by the mesh color, so it has to be white
+                actor = self.plotter.add_mesh(self.quad, color='white', opacity=opacity, name=self.name)
+                actor.SetTexture(texture)
+            else:
+                actor = self.plotter.add_mesh(self.grid, scalars="values", cmap='gray', opacity=opacity, name=self.name) if channel == 1 else self.plotter.add_mesh(self.grid, scalars="values", rgb=True, opacity=opacity, name=self.name)
+            self.actor, _ = self.plotter.add_actor(actor, pickable=False, name=self.name)
+            logger.debug(f"{self.name} layer: built a {w}x{h}x{channel} {'texture' if self.quad is not None else 'grid'}")
+        else:
+            if tuple(self.grid.spacing) != tuple(spacing): self.set_spacing(spacing)
+            self.swap()
+            self.actor.GetProperty().opacity = opacity
+        return self.actor
+
+    def swap(self):
+        view = self.source
+        if self.mirror_x: view = view[:, ::-1, :]
+        if self.mirror_y: view = view[::-1, :, :]
+        h, w, channel = view.shape
+
+        # VTK reads the buffer in place, it is only copied when the view is mirrored or strided
+        self.data = np.ascontiguousarray(view).reshape((w * h, channel)) # order = 'C
+        array = vtknp.numpy_to_vtk(self.data, deep=False)
+        array.SetName("values")
+        self.grid.GetPointData().SetScalars(array)
+        if channel == 1 and self.actor is not None: self.actor.GetMapper().SetScalarRange(self.data.min(), self.data.max())
+
+        if vis.config.DEBUG:
+            if self.actor is not None: self.actor.GetMapper().Update()
+            data = vis.utils.get_image_mask_actor_scalars(self.actor) if self.actor is not None else self.data.reshape((h, w, channel))
+            assert (data == view).all() or (data*255 == view).all(), f"{self.name} data and {self.name} source should be equal"
+
+    def set_mirror(self, mirror_x, mirror_y):
+        if self.source is None: return
+        self.mirror_x, self.mirror_y = mirror_x, mirror_y
+        self.swap()
+
+    def build_quad(self):
+        # the texture coordinates go from (0, 0) at the origin to (1, 1), like the grid indices
+        plane = vtk.vtkPlaneSource()
+        plane.SetResolution(1, 1)
+        plane.Update()
+        return pv.wrap(plane.GetOutput())
+
+    def set_spacing(self, spacing):
+        # keep the grid centered at the origin
+        w, h, _ = self.grid.dimensions
+        self.grid.spacing = spacing
+        self.grid.origin = (-(w - 1) * spacing[0] / 2, -(h - 1) * spacing[1] / 2, 0.0)
+        if self.quad is not None:
+            # one texel per grid point, so the quad is half a spacing larger on every side
+            x, y = w * spacing[0] / 2, h * spacing[1] / 2
+            self.quad.points = np.array([[-x, -y, 0.0], [x, -y, 0.0], [-x, y, 0.0], [x, y, 0.0]])
+
+    def remove(self):
+        if self.actor is not None: self.plotter.remove_actor(self.actor)
+        self.grid = None
+        self.quad = None
+        self.actor = None
+        self.source = None
+        self.data = None
+
+class SceneBatch:
+    """Opacity and pose changes of the plotter actors, applied together with one render
+
+    The actors stay registered in the renderer, a change only sets their property or
+    user_matrix, so nothing is removed and re-added like `plotter.add_actor` does for
+    every actor. Inside a `with batch:` block the changes are queued, the last change of
+    an actor wins, and they are flushed on exit with a single `plotter.render()`. Outside
+    of a block every change is flushed right away.
+    """
+
+    def __init__(self, plotter):
+        self.plotter = plotter
+        self.pending = {}
+        self.depth = 0
+
+    def __enter__(self):
+        self.depth += 1
+        return self
+
+    def __exit__(self, *exc):
+        self.depth -= 1
+        if self.depth == 0: self.flush()
+
+    def set(self, actor, **changes):
+        self.pending.setdefault(actor, {}).update(changes)
+        if self.depth == 0: self.flush()
+
+    def set_matrix(self, actor, matrix):
+        self.set(actor, user_matrix=matrix)
+
+    def set_opacity(self, actor, opacity):
+        self.set(actor, opacity=opacity)
+
+    def flush(self):
+        if len(self.pending) == 0: return
+        for actor, changes in self.pending.items():
+            if 'user_matrix' in changes: actor.user_matrix = changes['user_matrix']
+            if 'opacity' in changes: actor.GetProperty().opacity = changes['opacity']
+        logger.debug(f"scene batch: flushed {len(self.pending)} actors")
+        self.pending = {}
+        self.plotter.render()
@@ -64,8 +64,7 @@ class MyMainWindow(MainWindow):
         # add the pyvista interactor object
         self.plotter = QtInteractor(self.frame)
         # self.plotter.setFixedSize(*self.window_size) # but camera locate in the center instead of top left
-        self.render = pv.Plotter(window_size=[self.window_size[0], self.window_size[1]], lighting=None, off_screen=True) 
-        self.render.set_background('black'); 
+        self.render = vis.render.RenderSession(self.window_size, background='black')
         assert self.render.background_color == "black", "render's background need to be black"
 
         vlayout.addWidget(self.plotter.interactor)
@@ -142,6 +141,7 @@ class MyMainWindow(MainWindow):
         RegisterMenu.addAction('Update GT Pose (l)', self.update_gt_pose)
         RegisterMenu.addAction('Current Pose (t)', self.current_pose)
         RegisterMenu.addAction('Undo Pose (s)', self.undo_pose)
+        RegisterMenu.addAction('Redo Pose (d)', self.redo_pose)
 
         # Add coloring related actions
         RegisterMenu = mainMenu.addMenu('Color')
@@ -174,6 +174,7 @@ class MyMainWindow(MainWindow):
             self.plotter.add_key_event('l', self.update_gt_pose)
             self.plotter.add_key_event('t', self.current_pose)
             self.plotter.add_key_event('s', self.undo_pose)
+            self.plotter.add_key_event('d', self.redo_pose)
 
             # opacity related key bindings
             toggle_image_opacity_up = functools.partial(self.toggle_image_opacity, up=True)
@@ -248,8 +249,9 @@ class MyMainWindow(MainWindow):
         if ok: 
             try: 
                 self.spacing = ast.literal_eval(spacing)
-                if self.image_path: self.add_image(self.image_path)
-                if self.mask_path: self.add_mask(self.mask_path)
+                if self.image_actor is not None: self.image_layer.set_spacing(self.spacing)
+                if self.mask_actor is not None: self.mask_layer.set_spacing(self.spacing)
+                self.reset_camera()
             except: 
                 QMessageBox.warning(self, 'vision6D', "Spacing format is not correct", QMessageBox.Ok, QMessageBox.Ok)
 
@@ -287,7 +289,7 @@ class MyMainWindow(MainWindow):
             mesh_name, ok = self.input_dialog.getText(self, 'Input', 'Specify the object Class name', text='ossicles')
             if ok: 
                 self.meshdict[mesh_name] = self.mesh_path
-                mesh_source = vis.utils.load_trimesh(self.mesh_path)
+                mesh_source = vis.cache.load_trimesh(self.mesh_path)
 
                 transformation_matrix = self.transformation_matrix
                 if self.mirror_x: transformation_matrix = np.array([[-1, 0, 0, 0], [0, 1, 0, 0], [0, 0, 1, 0], [0, 0, 0, 1]]) @ transformation_matrix
@@ -312,45 +314,26 @@ class MyMainWindow(MainWindow):
         if direction == 'x': mirror_x = True; mirror_y = False
         elif direction == 'y': mirror_x = False; mirror_y = True
 
-        #^ mirror the image actor
+        #^ mirror the image actor, a strided view of the data the layer already holds
         if self.image_actor is not None:
-            original_image_data = np.array(PIL.Image.open(self.image_path), dtype='uint8')
-            if len(original_image_data.shape) == 2: original_image_data = original_image_data[..., None]
-            curr_image_data = vis.utils.get_image_mask_actor_scalars(self.image_actor)
-            if mirror_x: curr_image_data = curr_image_data[:, ::-1, :]
-            if mirror_y: curr_image_data = curr_image_data[::-1, :, :]
-            if (curr_image_data == original_image_data).all(): 
-                self.mirror_x = False
-                self.mirror_y = False
-            elif (curr_image_data == original_image_data[:, ::-1, :]).all(): 
-                self.mirror_x = True
-                self.mirror_y = False
-            elif (curr_image_data == original_image_data[::-1, :, :]).all():
-                self.mirror_x = False
-                self.mirror_y = True
-            elif (curr_image_data == original_image_data[:, ::-1, :][::-1, :, :]).all():
-                self.mirror_x = True
-                self.mirror_y = True
-            self.add_image(curr_image_data)
+            # the mirror state is relative to the image file
+            self.mirror_x = self.mirror_x != mirror_x
+            self.mirror_y = self.mirror_y != mirror_y
+            self.image_layer.set_mirror(self.image_layer.mirror_x != mirror_x, self.image_layer.mirror_y != mirror_y)
         else:
             QMessageBox.warning(self, 'vision6D', "Need to load an image first!", QMessageBox.Ok, QMessageBox.Ok)
             return 0
 
-        if self.mask_actor is not None:
-            #^ mirror the mask actor
-            curr_mask_data = vis.utils.get_image_mask_actor_scalars(self.mask_actor)
-            if mirror_x: curr_mask_data = curr_mask_data[:, ::-1, :]
-            if mirror_y: curr_mask_data = curr_mask_data[::-1, :, :]
-            self.add_mask(curr_mask_data)
+        #^ mirror the mask actor
+        if self.mask_actor is not None: self.mask_layer.set_mirror(self.mask_layer.mirror_x != mirror_x, self.mask_layer.mirror_y != mirror_y)
 
         #^ mirror the mesh actors
-        if len(self.mesh_actors) != 0:
-            for actor_name, actor in self.mesh_actors.items():
-                transformation_matrix = self.mesh_actors[actor_name].user_matrix
+        with self.scene:
+            for actor in self.mesh_actors.values():
+                transformation_matrix = actor.user_matrix
                 if mirror_x: transformation_matrix = np.array([[-1, 0, 0, 0], [0, 1, 0, 0], [0, 0, 1, 0], [0, 0, 0, 1]]) @ transformation_matrix
                 if mirror_y: transformation_matrix = np.array([[1, 0, 0, 0], [0, -1, 0, 0], [0, 0, 1, 0], [0, 0, 0, 1]]) @ transformation_matrix
-                actor.user_matrix = transformation_matrix
-                self.plotter.add_actor(actor, pickable=True, name=actor_name)
+                self.scene.set_matrix(actor, transformation_matrix)
 
     def remove_actor(self, name):
         if self.reference == name: self.reference = None
@@ -358,10 +341,12 @@ class MyMainWindow(MainWindow):
             actor = self.image_actor
             self.image_actor = None
             self.image_path = None
+            self.image_layer.remove()
         elif name == 'mask':
             actor = self.mask_actor
             self.mask_actor = None
             self.mask_path = None
+            self.mask_layer.remove()
         else: 
             actor = self.mesh_actors[name]
              # remove the item from the mesh dictionary
@@ -372,11 +357,12 @@ class MyMainWindow(MainWindow):
                 self.meshdict = {}
                 self.reference = None
                 self.transformation_matrix = np.eye(4)
-                self.undo_poses = []
+                self.history.clear()
                 self.colors = ["cyan", "magenta", "yellow", "lime", "deepskyblue", "salmon", "silver", "aquamarine", "plum", "blueviolet"]
                 self.used_colors = []
 
         self.plotter.remove_actor(actor)
+        self.render.remove(name)
         actions_to_remove = [action for action in self.removeMenu.actions() if action.text() == name]
 
         if (len(actions_to_remove) != 1):
@@ -397,6 +383,11 @@ class MyMainWindow(MainWindow):
             self.plotter.remove_actor(actor)
             self.removeMenu.removeAction(remove_action)
 
+        # Drop the cached off-screen actors and the image/mask grids
+        self.render.clear()
+        self.image_layer.remove()
+        self.mask_layer.remove()
+
         # Re-initial the dictionaries
         self.image_path = None
         self.mask_path = None
@@ -412,7 +403,7 @@ class MyMainWindow(MainWindow):
         self.image_actor = None
         self.mask_actor = None
         self.mesh_actors = {}
-        self.undo_poses = []
+        self.history.clear()
         self.track_actors_names = []
 
         self.colors = ["cyan", "magenta", "yellow", "lime", "deepskyblue", "salmon", "silver", "aquamarine", "plum", "blueviolet"]
@@ -428,16 +419,9 @@ class MyMainWindow(MainWindow):
         if reply == QMessageBox.Yes: camera = self.camera.copy()
         else: camera = self.plotter.camera.copy()
 
-        self.render.clear()
-        image_actor = self.image_actor.copy(deep=True)
-        image_actor.GetProperty().opacity = 1
-        self.render.add_actor(image_actor, pickable=False, name="image")
-        self.render.camera = camera
-        self.render.disable()
-        self.render.show(auto_close=False)
-
+        self.render.set_actor("image", self.image_actor)
         # obtain the rendered image
-        image = self.render.last_image
+        image = self.render.show(["image"], camera)
         mirror = np.any((self.mirror_x, self.mirror_y))
         output_name = pathlib.Path(self.image_path).stem if not mirror else pathlib.Path(self.image_path).stem + "_mirrored"
         output_path = vis.config.GITROOT / "output" / "image" / (output_name + '.png')
@@ -454,16 +438,9 @@ class MyMainWindow(MainWindow):
         if reply == QMessageBox.Yes: camera = self.camera.copy()
         else: camera = self.plotter.camera.copy()
 
-        self.render.clear()
-        mask_actor = self.mask_actor.copy(deep=True)
-        mask_actor.GetProperty().opacity = 1
-        self.render.add_actor(mask_actor, pickable=False, name="mask")
-        self.render.camera = camera
-        self.render.disable()
-        self.render.show(auto_close=False)
-
+        self.render.set_actor("mask", self.mask_actor)
         # obtain the rendered image
-        image = self.render.last_image
+        image = self.render.show(["mask"], camera)
         mirror = np.any((self.mirror_x, self.mirror_y))
         output_name = pathlib.Path(self.mask_path).stem if not mirror else pathlib.Path(self.mask_path).stem + "_mirrored"
         output_path = vis.config.GITROOT / "output" / "mask" / (output_name + '.png')
@@ -488,7 +465,6 @@ class MyMainWindow(MainWindow):
         if reply_export_surface == QMessageBox.No: point_clouds = True
         else: point_clouds = False
         
-        self.render.clear()
         reference_name = pathlib.Path(self.meshdict[self.reference]).stem
 
         mirror = np.any((self.mirror_x, self.mirror_y))
@@ -506,15 +482,10 @@ class MyMainWindow(MainWindow):
                 if colors is None: colors = np.ones((len(vertices), 3)) * 0.5
                 assert colors.shape == vertices.shape, "colors shape should be the same as vertices shape"
                 
-                mesh_data = pv.wrap(trimesh.Trimesh(vertices, faces, process=False))
-                mesh = self.render.add_mesh(mesh_data, scalars=colors, rgb=True, style='surface', opacity=1, name=mesh_name) if not point_clouds else self.render.add_mesh(mesh_data, scalars=colors, rgb=True, style='points', point_size=1, render_points_as_spheres=False, opacity=1, name=mesh_name)
-                mesh.user_matrix = transformation_matrix
-
-            self.render.camera = camera
-            self.render.disable(); self.render.show(auto_close=False)
+                self.render.set_mesh(mesh_name, vertices, faces, colors=colors, point_clouds=point_clouds, user_matrix=transformation_matrix)
 
             # obtain the rendered image
-            image = self.render.last_image
+            image = self.render.show(list(self.mesh_actors), camera)
             output_path = vis.config.GITROOT / "output" / "mesh" / (output_name + ".png")
             rendered_image = PIL.Image.fromarray(image)
             rendered_image.save(output_path)
@@ -528,14 +499,10 @@ class MyMainWindow(MainWindow):
             if colors is None: colors = np.ones((len(vertices), 3)) * 0.5
             assert colors.shape == vertices.shape, "colors shape should be the same as vertices shape"
             
-            mesh_data = pv.wrap(trimesh.Trimesh(vertices, faces, process=False))
-            mesh = self.render.add_mesh(mesh_data, scalars=colors, rgb=True, style='surface', opacity=1, name=mesh_name) if not point_clouds else self.render.add_mesh(mesh_data, scalars=colors, rgb=True, style='points', point_size=1, render_points_as_spheres=False, opacity=1, name=mesh_name)
-            mesh.user_matrix = transformation_matrix
-            self.render.camera = camera
-            self.render.disable(); self.render.show(auto_close=False)
+            self.render.set_mesh(mesh_name, vertices, faces, colors=colors, point_clouds=point_clouds, user_matrix=transformation_matrix)
 
             # obtain the rendered image
-            image = self.render.last_image
+            image = self.render.show([mesh_name], camera)
             if save_render:
                 output_path = vis.config.GITROOT / "output" / "mesh" / (output_name + ".png")
                 rendered_image = PIL.Image.fromarray(image)
@@ -564,17 +531,10 @@ class MyMainWindow(MainWindow):
         if reply_export_surface == QMessageBox.No: point_clouds = True
         else: point_clouds = False
 
-        self.render.clear()
-        mask_actor = self.mask_actor.copy(deep=True)
-        mask_actor.GetProperty().opacity = 1
-        self.render.add_actor(mask_actor, pickable=False, name="mask")
-        self.render.camera = camera
-        self.render.disable()
-        self.render.show(auto_close=False)
-        segmask = self.render.last_image
+        self.render.set_actor("mask", self.mask_actor)
+        segmask = self.render.show(["mask"], camera)
         if np.max(segmask) > 1: segmask = segmask / 255
 
-        self.render.clear()
         reference_name = pathlib.Path(self.meshdict[self.reference]).stem
 
         mirror = np.any((self.mirror_x, self.mirror_y))
@@ -591,15 +551,10 @@ class MyMainWindow(MainWindow):
             if colors is None: colors = np.ones((len(vertices), 3)) * 0.5
             assert colors.shape == vertices.shape, "colors shape should be the same as vertices shape"
            
-            mesh_data = pv.wrap(trimesh.Trimesh(vertices, faces, process=False))
-            mesh = self.render.add_mesh(mesh_data, scalars=colors, rgb=True, style='surface', opacity=1, name=mesh_name) if not point_clouds else self.render.add_mesh(mesh_data, scalars=colors, rgb=True, style='points', point_size=1, render_points_as_spheres=False, opacity=1, name=mesh_name)
-            mesh.user_matrix = transformation_matrix
-
-        self.render.camera = camera
-        self.render.disable(); self.render.show(auto_close=False)
+            self.render.set_mesh(mesh_name, vertices, faces, colors=colors, point_clouds=point_clouds, user_matrix=transformation_matrix)
 
         # obtain the rendered image
-        image = self.render.last_image
+        image = self.render.show(list(self.mesh_actors), camera)
         image = (image * segmask).astype(np.uint8)
         output_path = vis.config.GITROOT / "output" / "segmesh" / (output_name + ".png")
         rendered_image = PIL.Image.fromarray(image)
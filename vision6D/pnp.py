@@ -0,0 +1,207 @@
+import os
+import time
+import logging
+import concurrent.futures
+
+import numpy as np
+import cv2
+import vision6D as vis
+
+logger = logging.getLogger("vision6D")
+
+# the cv2 flag of every named backend, run inside cv2.solvePnPRansac
+PNP_BACKENDS = {
+    "epnp": cv2.SOLVEPNP_EPNP,
+    "sqpnp": cv2.SOLVEPNP_SQPNP,
+    "ippe": cv2.SOLVEPNP_IPPE,
+    "p3p": cv2.SOLVEPNP_P3P,
+    "ap3p": cv2.SOLVEPNP_AP3P,
+    "iterative": cv2.SOLVEPNP_ITERATIVE,
+}
+
+PNP_REFINEMENTS = {
+    "lm": cv2.solvePnPRefineLM,
+    "vvs": cv2.solvePnPRefineVVS,
+}
+
+def sample_grid(pts2d, count, rng):
+    """One random point per cell of a square pixel grid, sized so that about `count` cells are covered"""
+    cell = max(np.sqrt(len(pts2d) / count), 1)
+    cells = (pts2d // cell).astype(np.int64)
+    cells = cells[:, 1] * (cells[:, 0].max() + 1) + cells[:, 0]
+    order = rng.permutation(len(pts2d))
+    _, first = np.unique(cells[order], return_index=True)
+    return order[first]
+
+def sample_farthest(pts2d, count, rng):
+    """Farthest point sampling in the image, started from a random point
+
+    It runs on a grid sample of 4 * `count` candidates, the full mask would cost O(N * count).
+    """
+    candidates = sample_grid(pts2d, 4 * count, rng) if len(pts2d) > 4 * count else np.arange(len(pts2d))
+    points = pts2d[candidates].astype(np.float32)
+    picked = np.empty(min(count, len(points)), dtype=np.int64)
+    picked[0] = rng.integers(len(points))
+    distances = np.full(len(points), np.inf, dtype=np.float32)
+    for i in range(1, len(picked)):
+        distances = np.minimum(distances, ((points - points[picked[i - 1]]) ** 2).sum(axis=1))
+        picked[i] = np.argmax(distances)
+    return candidates[picked]
+
+def sample_edge(pts2d, count, rng):
+    """Random points weighted by their distance to the edge of the mask
+
+    The colors along the segmentation edge are blended with the background and the other
+    objects, so the interior points are the confident ones.
+    """
+    origin = pts2d.min(axis=0).astype(np.int64)
+    pixels = pts2d.astype(np.int64) - origin
+    mask = np.zeros(pixels.max(axis=0)[::-1] + 3, dtype=np.uint8)
+    mask[pixels[:, 1] + 1, pixels[:, 0] + 1] = 1
+    weights = cv2.distanceTransform(mask, cv2.DIST_L2, 3)[pixels[:, 1] + 1, pixels[:, 0] + 1].astype(np.float64)
+    return rng.choice(len(pts2d), size=count, replace=False, p=weights / weights.sum())
+
+SAMPLERS = {
+    "grid": sample_grid,
+    "farthest": sample_farthest,
+    "edge": sample_edge,
+}
+
+def sample_correspondences(pts2d, count, method="grid", seed=0):
+    """Indices of about `count` of the 2D-3D correspondences, sorted, all of them when there are fewer
+
+    Parameters
+    ----------
+    pts2d (np.ndarray)
+        Pixel coordinates of the correspondences, shape (N, 2)
+    count (int)
+        Target number of correspondences, the grid sampler can return a few more or less
+    method (str)
+        'grid' for one point per cell of a pixel grid, 'farthest' for farthest point sampling
+        in the image, 'edge' for random points weighted by their distance to the mask edge
+
+    """
+    assert method in SAMPLERS, f"method should be one of {list(SAMPLERS)}"
+    if len(pts2d) <= count: return np.arange(len(pts2d))
+    return np.sort(SAMPLERS[method](np.asarray(pts2d), count, np.random.default_rng(seed)))
+
+def register_backend(name, flag):
+    """Make the cv2 PnP `flag` available to `PnPSolver` as `name`"""
+    PNP_BACKENDS[name] = flag
+
+class PnPSolver:
+    """A named PnP backend inside RANSAC, with an optional refinement of the inliers
+
+    `PnPSolver()` is what `vis.utils.solve_epnp_cv2` always did: EPnP with the default
+    `cv2.solvePnPRansac` iterations and threshold and a 0.999 confidence.
+
+    Parameters
+    ----------
+    backend (str)
+        Name of the minimal solver in `PNP_BACKENDS`, e.g. 'epnp', 'sqpnp', 'ippe' or 'p3p'
+    iterations (int)
+        Maximum number of RANSAC iterations
+    reprojection_error (float)
+        RANSAC inlier threshold in pixels
+    confidence (float)
+        RANSAC confidence
+    refine (str)
+        None, or 'lm' / 'vvs' to refine the RANSAC pose on its inliers with
+        `cv2.solvePnPRefineLM` / `cv2.solvePnPRefineVVS`
+    sampler (str)
+        None, or a method of `sample_correspondences` to solve with `samples` of the correspondences
+    samples (int)
+        Target number of correspondences of the sampler
+
+    """
+
+    def __init__(self, backend="epnp", iterations=100, reprojection_error=8.0, confidence=0.999, refine=None, sampler=None, samples=2000):
+        assert backend in PNP_BACKENDS, f"backend should be one of {list(PNP_BACKENDS)}"
+        assert refine is None or refine in PNP_REFINEMENTS, f"refine should be None or one of {list(PNP_REFINEMENTS)}"
+        self.backend = backend
+        self.iterations = iterations
+        self.reprojection_error = reprojection_error
+        self.confidence = confidence
+        self.refine = refine
+        assert sampler is None or sampler in SAMPLERS, f"sampler should be None or one of {list(SAMPLERS)}"
+        self.sampler = sampler
+        self.samples = samples
+
+    def __repr__(self):
+        return f"PnPSolver({self.backend!r}, iterations={self.iterations}, reprojection_error={self.reprojection_error}, refine={self.refine!r}, sampler={self.sampler!r}, samples={self.samples})"
+
+    def solve(self, pts2d, pts3d, camera_intrinsics, camera_position):
+        """Returns the predicted pose, the identity when it failed, and the indices of the inliers"""
+        index = sample_correspondences(pts2d, self.samples, self.sampler) if self.sampler is not None else np.arange(len(pts2d))
+        pts2d, pts3d = pts2d[index], pts3d[index]
+        pts2d = pts2d.astype('float32')
+        pts3d = pts3d.astype('float32')
+        camera_intrinsics = camera_intrinsics.astype('float32')
+        dist_coeffs = np.zeros((4, 1))
+
+        predicted_pose = np.eye(4)
+        inliers = np.zeros(0, dtype=np.int64)
+        if pts2d.shape[0] > 4:
+            success, rotation_vector, translation_vector, ransac_inliers = cv2.solvePnPRansac(pts3d, pts2d, camera_intrinsics, distCoeffs=dist_coeffs, iterationsCount=self.iterations, reprojectionError=self.reprojection_error, confidence=self.confidence, flags=PNP_BACKENDS[self.backend])
+            if success and ransac_inliers is not None:
+                inliers = ransac_inliers.ravel()
+                if self.refine is not None and len(inliers) > 3:
+                    rotation_vector, translation_vector = PNP_REFINEMENTS[self.refine](pts3d[inliers], pts2d[inliers], camera_intrinsics, dist_coeffs, rotation_vector, translation_vector)
+                inliers = index[inliers]
+                predicted_pose[:3, :3] = cv2.Rodrigues(rotation_vector)[0]
+                predicted_pose[:3, 3] = np.squeeze(translation_vector) + np.array(camera_position)
+        return predicted_pose, inliers
+
+def pose_error(predicted_pose, gt_pose):
+    """Rotation error in degrees and translation error in the mesh unit (mm)"""
+    cos = (np.trace(predicted_pose[:3, :3].T @ gt_pose[:3, :3]) - 1) / 2
+    return np.degrees(np.arccos(np.clip(cos, -1, 1))), np.linalg.norm(predicted_pose[:3, 3] - gt_pose[:3, 3])
+
+def solve_object(color_mask, label_mask, label, vertices, camera_intrinsics, camera_position, solver):
+    start = time.perf_counter()
+    pts3d, pts2d = vis.utils.create_2d_3d_pairs(color_mask, vertices, binary_mask=(label_mask == label))
+    predicted_pose, inliers = solver.solve(pts2d, pts3d, camera_intrinsics, camera_position)
+    stats = {"correspondences": len(pts2d), "inliers": len(inliers), "inlier_ratio": len(inliers) / max(len(pts2d), 1), "seconds": time.perf_counter() - start}
+    return predicted_pose, stats
+
+def solve_epnp_objects(color_mask, label_mask, objects, camera_intrinsics, camera_position, workers=None, solver=None):
+    """EPnP with RANSAC for every object of a multi-label nocs color mask, solved in parallel
+
+    The correspondences are split per object with `label_mask` and every object is solved
+    in a thread pool, `cv2.solvePnPRansac` releases the GIL so the objects run concurrently.
+
+    Parameters
+    ----------
+    color_mask (np.ndarray)
+        Rendered or segmented nocs colors of all the objects, shape (H, W, 3)
+    label_mask (np.ndarray)
+        Label of the object per pixel, e.g. from `vis.raster.rasterize_labels`, shape (H, W)
+    objects (dict)
+        {name: (label, vertices)} with the vertices the nocs colors were computed from
+    workers (int)
+        Number of threads, one per object up to the number of cpus by default
+    solver (PnPSolver)
+        EPnP with RANSAC, `PnPSolver()`, by default
+
+    Returns
+    -------
+    poses (dict)
+        {name: predicted pose}, the identity when the object could not be solved
+    stats (dict)
+        {name: {"correspondences", "inliers", "inlier_ratio", "seconds"}}
+    seconds (float)
+        Total solve time of all the objects
+
+    """
+    solver = solver if solver is not None else PnPSolver()
+    start = time.perf_counter()
+    workers = workers if workers is not None else max(min(len(objects), os.cpu_count()), 1)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {name: executor.submit(solve_object, color_mask, label_mask, label, vertices, camera_intrinsics, camera_position, solver) for name, (label, vertices) in objects.items()}
+        results = {name: future.result() for name, future in futures.items()}
+    seconds = time.perf_counter() - start
+
+    poses = {name: result[0] for name, result in results.items()}
+    stats = {name: result[1] for name, result in results.items()}
+    logger.debug(f"solved {len(objects)} objects with {workers} threads in {seconds:.3f} s")
+    return poses, stats, seconds
@@ -0,0 +1,230 @@
+import logging
+import numpy as np
+
+logger = logging.getLogger("vision6D")
+
+def project_vertices(vertices, camera_intrinsics, pose, camera_position=(0, 0, -500)):
+    """Project the vertices with `pose` through the App camera
+
+    The App camera sits at `camera_position` looking down +z with (0, -1, 0) as view up,
+    so its axes are the OpenCV camera axes. Returns the pixel coordinates (N, 2), in the
+    `camera_intrinsics` convention, and the distance of every vertex along the view axis (N,).
+    """
+    vertices = np.asarray(vertices, dtype=np.float64)
+    points = vertices @ pose[:3, :3].T + pose[:3, 3] - np.asarray(camera_position, dtype=np.float64)
+    z = points[:, 2]
+    uv = points[:, :2] / z[:, None] * np.array([camera_intrinsics[0, 0], camera_intrinsics[1, 1]]) + camera_intrinsics[:2, 2]
+    return uv, z
+
+def rasterize_faces(uv, z, faces, width=1920, height=1080, max_fragments=1 << 18):
+    """Z-buffered rasterization of projected triangles
+
+    Every pixel (i, j) is sampled at (i + 0.5, j + 0.5) like the VTK render window does.
+
+    Parameters
+    ----------
+    uv (np.ndarray)
+        Projected vertices from `project_vertices`, shape (N, 2)
+    z (np.ndarray)
+        Distance of the vertices along the view axis, shape (N,)
+    faces (np.ndarray)
+        Triangles, shape (F, 3)
+    max_fragments (int, optional)
+        Number of (face, pixel) fragments tested at once, bounds the memory of a chunk
+        whatever the size of the triangles
+
+    Returns
+    -------
+    face_ids (np.ndarray)
+        Index of the visible face per pixel, -1 for the background, shape (H, W)
+    barycentric (np.ndarray)
+        Perspective correct barycentric coordinates of the pixel in its face, shape (H, W, 3)
+    zbuffer (np.ndarray)
+        Distance along the view axis, inf for the background, shape (H, W)
+
+    """
+    faces = np.asarray(faces)
+    face_ids = np.full(width * height, -1, dtype=np.int64)
+    barycentric = np.zeros((width * height, 3))
+    zbuffer = np.full(width * height, np.inf)
+
+    # drop the faces behind the camera
+    faces_index = np.flatnonzero(np.all(z[faces] > 0, axis=1))
+
+    tri = uv[faces[faces_index]]
+    # pixel bounding box of every face, clipped to the window
+    lo = np.clip(np.ceil(tri.min(axis=1) - 0.5), 0, [width, height]).astype(np.int64)
+    hi = np.clip(np.floor(tri.max(axis=1) - 0.5), -1, [width - 1, height - 1]).astype(np.int64)
+    nx = np.maximum(hi[:, 0] - lo[:, 0] + 1, 0)
+    ny = np.maximum(hi[:, 1] - lo[:, 1] + 1, 0)
+    counts = nx * ny
+    ends = np.cumsum(counts)
+
+    # one fragment per (face, pixel in its bounding box), the chunks split the fragments and not the faces
+    for start in range(0, ends[-1] if len(ends) else 0, max_fragments):
+        fragments = np.arange(start, min(start + max_fragments, ends[-1]))
+        owner = np.searchsorted(ends, fragments, side="right")
+        k = fragments - (ends[owner] - counts[owner])
+        px = lo[owner, 0] + k % nx[owner]
+        py = lo[owner, 1] + k // nx[owner]
+        p = np.stack((px + 0.5, py + 0.5), axis=1)
+
+        # screen space barycentric coordinates from the edge functions
+        a, b, c = tri[owner, 0], tri[owner, 1], tri[owner, 2]
+        area = (b[:, 0] - a[:, 0]) * (c[:, 1] - a[:, 1]) - (b[:, 1] - a[:, 1]) * (c[:, 0] - a[:, 0])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            l1 = ((p[:, 0] - a[:, 0]) * (c[:, 1] - a[:, 1]) - (p[:, 1] - a[:, 1]) * (c[:, 0] - a[:, 0])) / area
+            l2 = ((b[:, 0] - a[:, 0]) * (p[:, 1] - a[:, 1]) - (b[:, 1] - a[:, 1]) * (p[:, 0] - a[:, 0])) / area
+        l0 = 1 - l1 - l2
+        inside = (area != 0) & (l0 >= 0) & (l1 >= 0) & (l2 >= 0)
+
+        owner, l = owner[inside], np.stack((l0, l1, l2), axis=1)[inside]
+        pixel = py[inside] * width + px[inside]
+
+        # perspective correct interpolation
+        zf = z[faces[faces_index[owner]]]
+        w = l / zf
+        depth = 1 / w.sum(axis=1)
+        w *= depth[:, None]
+
+        # keep the closest fragment per pixel, then test it against the z-buffer
+        order = np.lexsort((depth, pixel))
+        first = order[np.r_[True, pixel[order][1:] != pixel[order][:-1]]]
+        closer = depth[first] < zbuffer[pixel[first]]
+        first = first[closer]
+        zbuffer[pixel[first]] = depth[first]
+        face_ids[pixel[first]] = faces_index[owner[first]]
+        barycentric[pixel[first]] = w[first]
+
+    return face_ids.reshape((height, width)), barycentric.reshape((height, width, 3)), zbuffer.reshape((height, width))
+
+def rasterize(vertices, faces, colors, camera_intrinsics, pose, width=1920, height=1080, camera_position=(0, 0, -500), dtype=np.uint8):
+    """Software version of `App.plot(return_depth_map=True)` for a single colored mesh
+
+    Parameters
+    ----------
+    vertices, faces (np.ndarray)
+        Mesh in its own frame, shapes (N, 3) and (F, 3)
+    colors (np.ndarray)
+        Per-vertex rgb colors in [0, 1], e.g. from `vis.utils.color_mesh`, shape (N, 3)
+    camera_intrinsics (np.ndarray)
+        App.camera_intrinsics, shape (3, 3)
+    pose (np.ndarray)
+        Transformation matrix of the mesh, shape (4, 4)
+    dtype (np.dtype)
+        np.uint8 for the 8-bit colors of a render, a float dtype for the interpolated
+        colors in [0, 1] without the 8-bit quantization
+
+    Returns
+    -------
+    color_mask (np.ndarray)
+        Rendered colors on a black background, shape (H, W, 3)
+    depth_map (np.ndarray)
+        Negative distance to the camera plane with NaN on the background, the same as
+        `pv.Plotter.get_image_depth`, shape (H, W)
+
+    """
+    uv, z = project_vertices(vertices, camera_intrinsics, pose, camera_position)
+    face_ids, barycentric, zbuffer = rasterize_faces(uv, z, faces, width, height)
+
+    visible = face_ids != -1
+    color_mask = np.zeros((height, width, 3), dtype=dtype)
+    if np.issubdtype(dtype, np.floating):
+        color_mask[visible] = np.einsum("ni,nij->nj", barycentric[visible], np.asarray(colors, dtype=np.float64)[np.asarray(faces)[face_ids[visible]]])
+    else:
+        # VTK casts every vertex color to unsigned char (c * 255 + 0.5) before interpolating,
+        # so the -1 of the invalid lat/lon vertices wraps around instead of being clamped
+        colors = np.trunc(np.asarray(colors, dtype=np.float64) * 255 + 0.5) % 256
+        color_mask[visible] = np.clip(np.rint(np.einsum("ni,nij->nj", barycentric[visible], colors[np.asarray(faces)[face_ids[visible]]])), 0, 255)
+
+    depth_map = np.where(visible, -zbuffer, np.nan)
+    return color_mask, depth_map
+
+def backproject_depth(depth_map, camera_intrinsics, pose, camera_position=(0, 0, -500)):
+    """Surface point of every pixel of a depth map in the frame of the mesh rendered with `pose`
+
+    `depth_map` is the float depth buffer of `App.plot(return_depth_map=True)` (or `rasterize`),
+    so the points are not quantized like the 8-bit colors. The pixels are taken at their
+    centers, NaN stays NaN on the background. Returns shape (H, W, 3).
+    """
+    height, width = depth_map.shape
+    z = -depth_map
+    rows, cols = np.mgrid[:height, :width]
+    points = np.stack(((cols + 0.5 - camera_intrinsics[0, 2]) / camera_intrinsics[0, 0] * z, (rows + 0.5 - camera_intrinsics[1, 2]) / camera_intrinsics[1, 1] * z, z), axis=-1)
+    points += np.asarray(camera_position, dtype=np.float64)
+    # the inverse and not the transpose, the pose of a mirrored mesh is not a rotation
+    inverse = np.linalg.inv(pose)
+    return points @ inverse[:3, :3].T + inverse[:3, 3]
+
+def visible_vertices(vertices, faces, camera_intrinsics, pose, width=1920, height=1080, camera_position=(0, 0, -500)):
+    """Indices of the vertices that are not occluded, with their exact projections
+
+    A vertex passes the z-buffer test when one of its faces is the visible face of a pixel
+    in the 3x3 neighborhood of its projection, so no depth tolerance needs to be tuned.
+    Returns the indices (M,) and the pixel coordinates (M, 2).
+    """
+    faces = np.asarray(faces)
+    uv, z = project_vertices(vertices, camera_intrinsics, pose, camera_position)
+    face_ids, _, _ = rasterize_faces(uv, z, faces, width, height)
+
+    with np.errstate(invalid="ignore"):
+        inside = (z > 0) & np.all((uv >= 0) & (uv < [width, height]), axis=1)
+    inds = np.flatnonzero(inside)
+    px = np.floor(uv[inds]).astype(np.int64)
+    offsets = np.stack(np.meshgrid([-1, 0, 1], [-1, 0, 1]), axis=-1).reshape((-1, 2))
+    neighbors = np.clip(px[:, None] + offsets, 0, [width - 1, height - 1])
+    ids = face_ids[neighbors[..., 1], neighbors[..., 0]]
+    visible = ((faces[ids] == inds[:, None, None]).any(axis=-1) & (ids != -1)).any(axis=-1)
+    return inds[visible], uv[inds[visible]]
+
+def correspondences(vertices, faces, camera_intrinsics, pose, width=1920, height=1080, camera_position=(0, 0, -500), surface=True):
+    """Exact 2D-3D correspondences of a mesh, ready for `vis.utils.solve_epnp_cv2`
+
+    This skips the render and the 8-bit color round-trip of `vis.utils.create_2d_3d_pairs`.
+
+    Parameters
+    ----------
+    vertices, faces (np.ndarray)
+        Mesh in its own frame, shapes (N, 3) and (F, 3)
+    camera_intrinsics (np.ndarray)
+        App.camera_intrinsics, shape (3, 3)
+    pose (np.ndarray)
+        Transformation matrix of the mesh, shape (4, 4)
+    surface (bool)
+        True for one surface point per covered pixel (the pixel center and the barycentric
+        interpolation of its face), False for the visible vertices and their projections
+
+    Returns
+    -------
+    pts2d (np.ndarray)
+        float32 pixel coordinates, shape (M, 2)
+    pts3d (np.ndarray)
+        float32 points in the mesh frame, shape (M, 3)
+
+    """
+    vertices, faces = np.asarray(vertices, dtype=np.float64), np.asarray(faces)
+    if not surface:
+        inds, pts2d = visible_vertices(vertices, faces, camera_intrinsics, pose, width, height, camera_position)
+        return pts2d.astype(np.float32), vertices[inds].astype(np.float32)
+
+    uv, z = project_vertices(vertices, camera_intrinsics, pose, camera_position)
+    face_ids, barycentric, _ = rasterize_faces(uv, z, faces, width, height)
+    y, x = np.nonzero(face_ids != -1)
+    pts2d = np.stack((x + 0.5, y + 0.5), axis=1)
+    pts3d = np.einsum("ni,nij->nj", barycentric[y, x], vertices[faces[face_ids[y, x]]])
+    return pts2d.astype(np.float32), pts3d.astype(np.float32)
+
+def rasterize_labels(meshes, camera_intrinsics, width=1920, height=1080, camera_position=(0, 0, -500)):
+    """Index of the visible mesh per pixel, -1 for the background, shape (H, W)
+
+    `meshes` is a list of (vertices, faces, pose), the closest mesh wins like in a render
+    of all of them together.
+    """
+    labels = np.full((height, width), -1, dtype=np.int64)
+    zbuffer = np.full((height, width), np.inf)
+    for label, (vertices, faces, pose) in enumerate(meshes):
+        uv, z = project_vertices(vertices, camera_intrinsics, pose, camera_position)
+        _, _, depth = rasterize_faces(uv, z, faces, width, height)
+        closer = depth < zbuffer
+        labels[closer], zbuffer[closer] = label, depth[closer]
+    return labels
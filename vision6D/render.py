@@ -0,0 +1,114 @@
+import logging
+import numpy as np
+import trimesh
+
+import pyvista as pv
+import vtk
+import vision6D as vis
+
+logger = logging.getLogger("vision6D")
+
+def unchanged(array, previous):
+    # the cached geometry of vis.utils.get_mesh_actor_geometry is read-only and replaced when the actor changes,
+    # so the same read-only array holds the same values
+    return array is previous and isinstance(array, np.ndarray) and not array.flags.writeable
+
+class RenderSession:
+    """Persistent off-screen renderer used by the export buttons and EPnP
+
+    The plotter, the render window and one mapper per named actor are created once and
+    kept alive between frames. Re-rendering only updates what changed (user_matrix,
+    scalars, camera and visibility), so the geometry is not re-uploaded to the GPU on
+    every click. An actor is only rebuilt when its topology or render style changes.
+    """
+
+    def __init__(self, window_size, background='black', anti_aliasing=True):
+        self.plotter = pv.Plotter(window_size=[window_size[0], window_size[1]], lighting=None, off_screen=True)
+        self.plotter.set_background(background)
+        # an id buffer needs every pixel to keep the exact color of one triangle
+        if not anti_aliasing: self.plotter.disable_anti_aliasing()
+        self.plotter.disable()
+        self.meshes = {}
+        self.actors = {}
+        self.shown = False
+
+    @property
+    def background_color(self):
+        return self.plotter.background_color
+
+    def set_actor(self, name, actor):
+        """Show a copy of an image/mask `actor`, only copied again when its data changed"""
+        texture = actor.GetTexture()
+        key = (actor.GetMapper().GetInput().GetMTime(), texture.GetInput().GetMTime() if texture is not None else None)
+        if name not in self.actors or self.actors[name][0] is not actor or self.actors[name][1] != key:
+            copy = actor.copy(deep=True)
+            copy.GetProperty().opacity = 1
+            if texture is not None:
+                # a texture belongs to one render window, share the image but not the texture
+                copy.SetTexture(vtk.vtkTexture())
+                copy.GetTexture().SetInputData(texture.GetInput())
+                copy.GetTexture().SetColorMode(texture.GetColorMode())
+                copy.GetTexture().SetInterpolate(texture.GetInterpolate())
+            self.plotter.add_actor(copy, pickable=False, name=name)
+            self.actors[name] = (actor, key, copy)
+        return self.actors[name][2]
+
+    def set_mesh(self, name, vertices, faces, colors=None, color=None, point_clouds=False, user_matrix=None):
+        """Show a mesh under `name`, reusing its mapper when the faces and the render style are unchanged"""
+        style = (point_clouds, colors is not None)
+        entry = self.meshes.get(name)
+        if entry is None or entry["style"] != style or entry["mesh_data"].n_points != len(vertices) or not (unchanged(faces, entry["source"][1]) or np.array_equal(entry["faces"], faces)):
+            mesh_data = pv.wrap(trimesh.Trimesh(vertices, faces, process=False))
+            if colors is not None:
+                mesh_data.point_data["colors"] = colors
+                mesh = self.plotter.add_mesh(mesh_data, scalars="colors", rgb=True, style='surface', opacity=1, name=name) if not point_clouds else self.plotter.add_mesh(mesh_data, scalars="colors", rgb=True, style='points', point_size=1, render_points_as_spheres=False, opacity=1, name=name)
+            else:
+                mesh = self.plotter.add_mesh(mesh_data, color=color, style='surface', opacity=1, name=name) if not point_clouds else self.plotter.add_mesh(mesh_data, color=color, style='points', point_size=1, render_points_as_spheres=False, opacity=1, name=name)
+            entry = self.meshes[name] = {"style": style, "mesh_data": mesh_data, "faces": np.array(faces), "actor": mesh}
+            logger.debug(f"render session: built the {name} mapper")
+        else:
+            # only touch the arrays that changed, VTK re-uploads modified arrays only
+            mesh_data = entry["mesh_data"]
+            if not unchanged(vertices, entry["source"][0]) and not np.array_equal(mesh_data.points, vertices): mesh_data.points = np.array(vertices)
+            if colors is not None and not unchanged(colors, entry["source"][2]) and not np.array_equal(mesh_data.point_data["colors"], colors): mesh_data.point_data["colors"] = colors
+            if colors is None: entry["actor"].prop.color = color
+        entry["source"] = (vertices, faces, colors)
+
+        entry["actor"].user_matrix = user_matrix if user_matrix is not None else np.eye(4)
+        return entry["actor"]
+
+    def set_face_ids(self, name, vertices, faces, user_matrix=None):
+        """Show a mesh under `name` with every triangle in its `vis.utils.encode_face_ids` color, unlit"""
+        entry = self.meshes.get(name)
+        if entry is None or entry["style"] != "face_ids" or entry["mesh_data"].n_points != len(vertices) or not (unchanged(faces, entry["source"][1]) or np.array_equal(entry["faces"], faces)):
+            mesh_data = pv.wrap(trimesh.Trimesh(vertices, faces, process=False))
+            mesh_data.cell_data["face_ids"] = vis.utils.encode_face_ids(len(faces))
+            mesh = self.plotter.add_mesh(mesh_data, scalars="face_ids", rgb=True, preference='cell', lighting=False, style='surface', opacity=1, name=name)
+            entry = self.meshes[name] = {"style": "face_ids", "mesh_data": mesh_data, "faces": np.array(faces), "actor": mesh}
+            logger.debug(f"render session: built the {name} id buffer")
+        elif not unchanged(vertices, entry["source"][0]) and not np.array_equal(entry["mesh_data"].points, vertices): entry["mesh_data"].points = np.array(vertices)
+        entry["source"] = (vertices, faces)
+
+        entry["actor"].user_matrix = user_matrix if user_matrix is not None else np.eye(4)
+        return entry["actor"]
+
+    def remove(self, name):
+        if name in self.actors: del self.actors[name]
+        if name in self.meshes: del self.meshes[name]
+        self.plotter.remove_actor(name)
+
+    def clear(self):
+        self.plotter.clear()
+        self.meshes = {}
+        self.actors = {}
+
+    def show(self, names, camera):
+        """Render only the actors in `names` through `camera` and return the image"""
+        for name, actor in self.plotter.actors.items(): actor.SetVisibility(name in names)
+        self.plotter.camera = camera
+        if not self.shown:
+            self.plotter.show(auto_close=False)
+            self.shown = True
+            return self.plotter.last_image
+        self.plotter.render()
+        return self.plotter.screenshot(return_img=True)
@@ -1,5 +1,7 @@
 import __future__
 import copy
+import weakref
+import struct
 from typing import Type
 import logging
 
@@ -15,6 +17,8 @@ import cv2
 import pygeodesic.geodesic as geodesic
 import vtk.util.numpy_support as vtknp
 import json
+import scipy.spatial
+import vision6D as vis
 
 CWD = pathlib.Path(os.path.abspath(__file__)).parent
 logger = logging.getLogger("vision6D")
@@ -97,23 +101,75 @@ def load_meshobj(meshpath):
         meshobj = meshread(fid)
     return meshobj
 
+class MeshFile:
+    """Memory-mapped reader for the binary `.mesh` format
+
+    The fixed header is parsed once with a struct layout, and the vertex/triangle
+    blocks are exposed as read-only `np.memmap` views of shape (N, 3), which is
+    exactly the on-disk (Fortran ordered 3 x N) layout seen from the C side.
+    Nothing is copied until `oriented_vertices` applies the orient flip and the
+    voxel size scaling.
+
+    Parameters
+    ----------
+    meshpath (str or pathlib.Path)
+        Path to the `.mesh` file
+    linesread (bool, optional)
+        Read 2 indices per primitive instead of 3 (same as `meshread`)
+    meshread2 (bool, optional)
+        Read the vertices as double instead of float32 (same as `meshread`)
+
+    """
+
+    HEADER = struct.Struct("<4i") # id, numverts, numtris, n
+    ORIENT_HEADER = struct.Struct("<3i3i3f3i") # orient, dim, sz, color
+    COLOR_HEADER = struct.Struct("<2i") # color[1:3] when n != -1
+
+    def __init__(self, meshpath, linesread=False, meshread2=False):
+        self.path = pathlib.Path(meshpath)
+
+        with open(self.path, "rb") as fid:
+            self.id, self.numverts, self.numtris, n = self.HEADER.unpack(fid.read(self.HEADER.size))
+            if n == -1:
+                fields = self.ORIENT_HEADER.unpack(fid.read(self.ORIENT_HEADER.size))
+                self.orient = np.array(fields[0:3], dtype=np.int32)
+                self.dim = np.array(fields[3:6], dtype=np.int32)
+                self.sz = np.array(fields[6:9], dtype=np.float32)
+                self.color = np.array(fields[9:12], dtype=np.int32)
+            else:
+                self.orient = None
+                self.dim = None
+                self.sz = None
+                self.color = np.array((n, *self.COLOR_HEADER.unpack(fid.read(self.COLOR_HEADER.size))), dtype=np.int32)
+            offset = fid.tell()
+
+        vertices_dtype = np.dtype(np.double) if meshread2 else np.dtype(np.float32)
+        ncols = 2 if linesread else 3
+        self.vertices = self._memmap(vertices_dtype, offset, (self.numverts, 3))
+        offset += self.vertices.nbytes
+        self.triangles = self._memmap(np.dtype(np.int32), offset, (self.numtris, ncols))
+
+    def _memmap(self, dtype, offset, shape):
+        # np.memmap cannot map a zero-length region
+        if shape[0] == 0: return np.empty(shape, dtype=dtype)
+        return np.memmap(self.path, dtype=dtype, mode="r", offset=offset, shape=shape)
+
+    def oriented_vertices(self):
+        """Return a (N, 3) copy of the vertices in mm, matching `load_trimesh`"""
+        vertices = np.array(self.vertices)
+        if self.orient is not None:
+            idx = np.where(self.orient != np.array((1, 2, 3)))[0]
+            # flip the axes that are not stored in the (1, 2, 3) orientation
+            vertices[:, idx] = (self.dim[idx] - 1) - vertices[:, idx]
+        if self.sz is not None: vertices *= self.sz
+        return vertices
+
+    def to_trimesh(self):
+        return trimesh.Trimesh(vertices=self.oriented_vertices(), faces=self.triangles, process=False)
+
 def load_trimesh(meshpath):
-    meshobj = load_meshobj(meshpath)
-    # load the original ossicles
-    idx = np.where(meshobj.orient != np.array((1,2,3)))
-    for i in idx: meshobj.vertices[i] = (meshobj.dim[i] - 1).reshape((-1,1)) - meshobj.vertices[i]
-    # check the results
-    # writemesh(meshpath, meshobj, mirror)
-
-    # Reflection Relative to YZ Plane (x):
-    # if mirror: 
-    #     meshobj.vertices[0] = (meshobj.dim[0] - 1) - meshobj.vertices[0].T
-    #     writemesh(meshpath, meshobj, mirror=mirror)
-        
-    meshobj.vertices = meshobj.vertices * meshobj.sz.reshape((-1, 1))
-    mesh = trimesh.Trimesh(vertices=meshobj.vertices.T, faces=meshobj.triangles.T, process=False) # mesh.vertices = meshobj.vertices.T.astype(np.float32) # mesh.faces = meshobj.triangles.T.astype(np.float32)
-    assert mesh.vertices.shape == meshobj.vertices.T.shape
-    assert mesh.faces.shape == meshobj.triangles.T.shape
+    mesh = MeshFile(meshpath).to_trimesh()
+    assert mesh.vertices.shape[1] == 3 and mesh.faces.shape[1] == 3, "it should be N by 3 matrix"
     return mesh
 
 def writemesh(meshpath, output_path, mesh, mirror=False, suffix=''):
@@ -157,28 +213,74 @@ def writemesh(meshpath, output_path, mesh, mirror=False, suffix=''):
         #         f.write(mesh.colormap.vertexindexes.T.tobytes(order='C'))
         """
         
+def colored_pixels(color_mask):
+    # per channel comparisons, much faster than any(axis=-1) over the 3 interleaved channels
+    return (color_mask[..., 0] != 0) | (color_mask[..., 1] != 0) | (color_mask[..., 2] != 0)
+
 def color2binary_mask(color_mask):
-    binary_mask = np.zeros(color_mask[...,:1].shape, dtype=np.uint8)
-    x, y, _ = np.where(color_mask != [0., 0., 0.])
-    binary_mask[x, y] = 1 
-    return binary_mask
+    return colored_pixels(color_mask)[..., None].astype(np.uint8)
 
-def create_2d_3d_pairs(color_mask:np.ndarray, vertices:pv.pyvista_ndarray, binary_mask:np.ndarray=None):
+def mask_bbox(mask):
+    """Bounding box (top, bottom, left, right) of the nonzero pixels of a 2D `mask`, None when it is empty"""
+    rows, cols = np.flatnonzero(mask.any(axis=1)), np.flatnonzero(mask.any(axis=0))
+    if len(rows) == 0: return None
+    return rows[0], rows[-1] + 1, cols[0], cols[-1] + 1
 
-    if binary_mask is None: 
-        binary_mask = color2binary_mask(color_mask)
-        assert (binary_mask == (0.3*color_mask[..., :1] + 0.59*color_mask[..., 1:2] + 0.11*color_mask[..., 2:]).astype("bool").astype('uint8')).all()
+def extract_correspondences(color_mask:np.ndarray, binary_mask:np.ndarray=None, stride:int=1, roi:bool=True):
+    """Pixels of a color mask packed as (u, v, r, g, b) records in one pass
 
-    idx = np.where(binary_mask == 1)
+    The colored pixels, or the pixels of `binary_mask` when it is given, are selected with
+    a single `np.flatnonzero` over the (cropped) frame and gathered into one array, in
+    the same row-major order as `np.where`.
 
-    # swap the points for opencv, maybe because they handle RGB image differently (RGB -> BGR in opencv)
-    idx = idx[:2][::-1]
+    Parameters
+    ----------
+    color_mask (np.ndarray)
+        Rendered or predicted colors on a black background, shape (H, W, 3)
+    binary_mask (np.ndarray)
+        Pixels to keep, shape (H, W) or (H, W, 1), the colored pixels by default
+    stride (int)
+        Keep every `stride`-th pixel along the rows and the columns
+    roi (bool)
+        Crop the frame to the bounding box of the selected pixels first
+
+    Returns
+    -------
+    records (np.ndarray)
+        (u, v, r, g, b) per pixel, u the column and v the row, shape (N, 5), float32 for
+        integer color masks (exact) and the color dtype for float ones
 
-    pts = np.stack((idx[0], idx[1]), axis=1)
+    """
+    height, width = color_mask.shape[:2]
+    select = colored_pixels(color_mask) if binary_mask is None else binary_mask.reshape(height, width) == 1
+    top, left = 0, 0
+    if roi:
+        bbox = mask_bbox(select)
+        if bbox is None: return np.zeros((0, 5), dtype=np.result_type(np.float32, color_mask.dtype))
+        top, bottom, left, right = bbox
+        # keep the crop on the stride grid of the full frame
+        top, left = top + (-top) % stride, left + (-left) % stride
+        select, color_mask = select[top:bottom, left:right], color_mask[top:bottom, left:right]
+    if stride > 1: select, color_mask = select[::stride, ::stride], color_mask[::stride, ::stride]
+
+    index = np.flatnonzero(select)
+    records = np.empty((len(index), 5), dtype=np.result_type(np.float32, color_mask.dtype))
+    v, u = np.divmod(index, select.shape[1])
+    records[:, 0] = u * stride + left
+    records[:, 1] = v * stride + top
+    records[:, 2:] = color_mask.reshape(-1, 3)[index] if color_mask.flags.c_contiguous else color_mask[v, u]
+    return records
+
+def create_2d_3d_pairs(color_mask:np.ndarray, vertices:pv.pyvista_ndarray, binary_mask:np.ndarray=None, stride:int=1):
+
+    records = extract_correspondences(color_mask, binary_mask, stride)
+
+    # (u, v) pixel coordinates are the (x, y) opencv expects
+    pts = records[:, :2].astype(np.int64)
     
     # Obtain the 3D verticies (normaize rgb values)
-    rgb = color_mask[pts[:,1], pts[:,0]]
-    if np.max(rgb) > 1: rgb = rgb / 255
+    rgb = records[:, 2:].astype(color_mask.dtype)
+    if len(rgb) and np.max(rgb) > 1: rgb = rgb / 255
 
     # denormalize to get the rgb value for vertices respectively
     r = de_normalize(rgb[:, 0], vertices[..., 0])
@@ -188,20 +290,10 @@ def create_2d_3d_pairs(color_mask:np.ndarray, vertices:pv.pyvista_ndarray, binar
     
     return vtx, pts
 
-def solve_epnp_cv2(pts2d, pts3d, camera_intrinsics, camera_position):
-    pts2d = pts2d.astype('float32')
-    pts3d = pts3d.astype('float32')
-    camera_intrinsics = camera_intrinsics.astype('float32')
-
-    predicted_pose = np.eye(4)
-    if pts2d.shape[0] > 4:
-        # Use EPNP, inliers are the indices of the inliers
-        success, rotation_vector, translation_vector, inliers = cv2.solvePnPRansac(pts3d, pts2d, camera_intrinsics, distCoeffs=np.zeros((4, 1)), confidence=0.999, flags=cv2.SOLVEPNP_EPNP)
-        if success:
-            predicted_pose[:3, :3] = cv2.Rodrigues(rotation_vector)[0]
-            predicted_pose[:3, 3] = np.squeeze(translation_vector) + np.array(camera_position)
-
-    return predicted_pose
+def solve_epnp_cv2(pts2d, pts3d, camera_intrinsics, camera_position, return_inliers=False):
+    # EPnP inside RANSAC, see vis.pnp.PnPSolver for the other backends and the refinement
+    predicted_pose, inliers = vis.pnp.PnPSolver("epnp").solve(pts2d, pts3d, camera_intrinsics, camera_position)
+    return (predicted_pose, inliers) if return_inliers else predicted_pose
 
 def transform_vertices(vertices, transformation_matrix=np.eye(4)):
 
@@ -234,7 +326,7 @@ def save_image(array, folder, name):
     img.save(folder / name)
 
 def mesh2ply(meshpath, output_path):
-    mesh = load_trimesh(meshpath)
+    mesh = vis.cache.load_trimesh(meshpath)
     ply_file = trimesh.exchange.ply.export_ply(mesh)
     with open(output_path, "wb") as fid:
         fid.write(ply_file)
@@ -353,8 +445,223 @@ def latLon2xyz(m,lat,lonf,msk,gx,gy):
                 xyz.append(xyznode(m.vertices[f[1]] + e * (m.vertices[f[2]] - m.vertices[f[1]]),d3))
     return np.min(xyz).pnt
 
+class LatLonIndex:
+    """Spatial index over the (latitude, longitude) domain of a mesh
+
+    Built once per mesh from `load_latitude_longitude()` and `mesh.faces`. The uv bounding
+    boxes of the valid faces are binned into a uniform `resolution` x `resolution` grid, so
+    a pixel only tests the few faces of its cell instead of scanning every face, and the
+    closest-corner fallback of `latLon2xyz` is answered by a KD-tree over the uv corners.
+    The per-face pseudo inverses and edges are precomputed as well, and `query` returns
+    the same points as calling `latLon2xyz` once per pixel.
+
+    Parameters
+    ----------
+    lat, lon (np.ndarray)
+        Per-vertex latitude and longitude, shape (V,)
+    faces (np.ndarray)
+        Mesh faces, shape (F, 3)
+    resolution (int, optional)
+        Number of grid cells per axis, defaults to about one cell per face
+
+    """
+
+    def __init__(self, lat, lon, faces, resolution=None):
+        self.faces = np.array(faces)
+        self.latf = lat[self.faces]
+        self.lonf = lon[self.faces]
+        self.msk = (np.sum(self.lonf>=0, axis=1)==3) & (np.sum(self.latf>=0, axis=1)==3)
+        self.bbox = np.stack((self.latf.min(axis=1), self.latf.max(axis=1), self.lonf.min(axis=1), self.lonf.max(axis=1)), axis=1)
+
+        # V = [[lat1 - lat0, lat2 - lat0], [lon1 - lon0, lon2 - lon0]] for every face
+        self.V = np.stack((np.stack((self.latf[:, 1] - self.latf[:, 0], self.latf[:, 2] - self.latf[:, 0]), axis=1),
+                           np.stack((self.lonf[:, 1] - self.lonf[:, 0], self.lonf[:, 2] - self.lonf[:, 0]), axis=1)), axis=1)
+        self.pinv = np.linalg.pinv(self.V)
+        # uv edges 0->1, 0->2, 1->2 and their squared norms, computed with np.linalg.norm like `latLon2xyz`
+        self.edges = np.stack((self.V[:, :, 0], self.V[:, :, 1], np.stack((self.latf[:, 2] - self.latf[:, 1], self.lonf[:, 2] - self.lonf[:, 1]), axis=1)), axis=1)
+        self.sqnorms = np.array([np.linalg.norm(edge)**2 for edge in self.edges.reshape((-1, 2))]).reshape((-1, 3))
+
+        self._build_grid(resolution)
+        self._build_corners()
+
+    def _build_grid(self, resolution):
+        valid = np.flatnonzero(self.msk)
+        if resolution is None: resolution = max(1, int(np.ceil(np.sqrt(len(valid)))))
+        self.resolution = resolution
+        if len(valid) != 0:
+            self.origin = self.bbox[valid][:, [0, 2]].min(axis=0)
+            self.cell_size = np.maximum((self.bbox[valid][:, [1, 3]].max(axis=0) - self.origin) / resolution, np.finfo(np.float64).tiny)
+        else:
+            self.origin, self.cell_size = np.zeros(2), np.ones(2)
+
+        # every valid face is listed in all the cells its bounding box overlaps
+        lo = self.cell(self.bbox[valid, 0], self.bbox[valid, 2])
+        hi = self.cell(self.bbox[valid, 1], self.bbox[valid, 3])
+        nx = hi[0] - lo[0] + 1
+        ny = hi[1] - lo[1] + 1
+        counts = nx * ny
+        owner = np.repeat(np.arange(len(valid)), counts)
+        k = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        cells = (lo[0][owner] + k // ny[owner]) * resolution + lo[1][owner] + k % ny[owner]
+
+        # CSR layout, faces sorted by index inside every cell to keep the `latLon2xyz` scan order
+        order = np.lexsort((valid[owner], cells))
+        self.cell_faces = valid[owner][order]
+        self.cell_start = np.searchsorted(cells[order], np.arange(resolution * resolution + 1))
+
+    def _build_corners(self):
+        # unique uv corners, each remembering the lowest face index that uses it
+        corners, inverse = np.unique(np.stack((self.latf.ravel(), self.lonf.ravel()), axis=1), axis=0, return_inverse=True)
+        self.corners = corners
+        self.corner_face = np.full(len(corners), len(self.faces))
+        np.minimum.at(self.corner_face, inverse.reshape(-1), np.repeat(np.arange(len(self.faces)), 3))
+        self.tree = scipy.spatial.cKDTree(corners)
+
+    def cell(self, gx, gy):
+        ix = np.clip(np.floor((gx - self.origin[0]) / self.cell_size[0]), 0, self.resolution - 1).astype(np.int64)
+        iy = np.clip(np.floor((gy - self.origin[1]) / self.cell_size[1]), 0, self.resolution - 1).astype(np.int64)
+        return ix, iy
+
+    def matches(self, faces):
+        return self.faces.shape == np.shape(faces) and np.array_equal(self.faces, faces)
+
+    def candidates(self, gx, gy):
+        """(pixel, face) pairs whose face is valid and bounds the pixel in uv, sorted by pixel then face"""
+        ix, iy = self.cell(gx, gy)
+        cells = ix * self.resolution + iy
+        counts = self.cell_start[cells + 1] - self.cell_start[cells]
+        rows = np.repeat(np.arange(len(gx)), counts)
+        k = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        inds = self.cell_faces[self.cell_start[cells][rows] + k]
+        bbox = self.bbox[inds]
+        keep = (bbox[:, 0] <= gx[rows]) & (bbox[:, 1] >= gx[rows]) & (bbox[:, 2] <= gy[rows]) & (bbox[:, 3] >= gy[rows])
+        return rows[keep], inds[keep]
+
+    def closest_faces(self, gx, gy, k=8):
+        """Lowest index face among the faces with the closest uv corner, the `latLon2xyz` fallback"""
+        k = min(k, len(self.corners))
+        _, nearest = self.tree.query(np.stack((gx, gy), axis=1), k=k)
+        nearest = nearest.reshape((len(gx), k))
+        # exact squared distances, the same expression as `latLon2xyz`
+        dists = (self.corners[nearest, 0] - gx[:, None])*(self.corners[nearest, 0] - gx[:, None]) + (self.corners[nearest, 1] - gy[:, None])*(self.corners[nearest, 1] - gy[:, None])
+        closest = dists == dists.min(axis=1, keepdims=True)
+        inds = np.where(closest, self.corner_face[nearest], len(self.faces)).min(axis=1)
+        # more than k corners tie for the minimum, gather them all
+        for i in np.flatnonzero(closest[:, -1] & (k < len(self.corners))):
+            ball = np.array(self.tree.query_ball_point((gx[i], gy[i]), np.sqrt(dists[i].min()) * (1 + 1e-9) + 1e-12))
+            d = (self.corners[ball, 0] - gx[i])*(self.corners[ball, 0] - gx[i]) + (self.corners[ball, 1] - gy[i])*(self.corners[ball, 1] - gy[i])
+            inds[i] = self.corner_face[ball[d == d.min()]].min()
+        return inds
+
+    def query(self, vertices, gx, gy, chunk_size=65536):
+        """Map the (gx, gy) latitude/longitude of every pixel to a 3D point on the mesh with `vertices`"""
+        vertices = np.asarray(vertices)
+        gx = np.asarray(gx, dtype=np.float64).reshape(-1)
+        gy = np.asarray(gy, dtype=np.float64).reshape(-1)
+
+        xyz = np.zeros((len(gx), 3))
+        for start in range(0, len(gx), chunk_size):
+            cgx = gx[start:start+chunk_size]
+            cgy = gy[start:start+chunk_size]
+            rows, inds = self.candidates(cgx, cgy)
+
+            # fall back to the face with the closest corner when no face bounds the pixel
+            empty = np.setdiff1d(np.arange(len(cgx)), rows, assume_unique=False)
+            if len(empty) != 0:
+                order = np.argsort(np.concatenate((rows, empty)), kind="stable")
+                inds = np.concatenate((inds, self.closest_faces(cgx[empty], cgy[empty])))[order]
+                rows = np.concatenate((rows, empty))[order]
+
+            pnts, d = _latlon_candidates(vertices, self, inds, cgx[rows], cgy[rows])
+            winners = _sequential_argmin(rows, d)
+            xyz[start + rows[winners]] = pnts[winners]
+
+        return xyz
+
+def get_latlon_index(latlon, faces, index=None):
+    """The `LatLonIndex` of `faces`, `index` is reused when it was built for the same faces
+
+    Parameters
+    ----------
+    latlon (np.ndarray)
+        Per-vertex latitude and longitude from `load_latitude_longitude()`, shape (V, 2)
+    faces (np.ndarray)
+        Mesh faces, shape (F, 3)
+    index (LatLonIndex, optional)
+        The index of the previous query
+    """
+    # the index only depends on the faces, rebuild it when a different mesh is used
+    if index is None or not index.matches(faces): index = LatLonIndex(latlon[..., 0], latlon[..., 1], faces)
+    return index
+
+def latlon_to_xyz(m, lat, lon, gx, gy):
+    """Batched version of `latLon2xyz` for all the (gx, gy) pixels at once
+
+    Builds a one-off `LatLonIndex`; keep the index around (see `get_latlon_index`) when the
+    same mesh is queried repeatedly.
+    """
+    return LatLonIndex(lat, lon, m.faces).query(m.vertices, gx, gy)
+
+def _latlon_candidates(vertices, index, inds, gx, gy):
+    """Closest point and squared uv distance of every (pixel, face) pair, see `latLon2xyz`"""
+    f = index.faces[inds]
+    v0, v1, v2 = vertices[f[:, 0]], vertices[f[:, 1]], vertices[f[:, 2]]
+    p0 = np.stack((index.latf[inds, 0], index.lonf[inds, 0]), axis=1)
+    p1 = np.stack((index.latf[inds, 1], index.lonf[inds, 1]), axis=1)
+    g = np.stack((gx, gy), axis=1)
+
+    # matmul keeps the same rounding as the per pixel `@` products
+    ab = np.matmul(index.pinv[inds], (g - p0)[..., None])[..., 0]
+    a = ab[:, 0]
+    b = ab[:, 1]
+    inside = (a>=0) & (b>=0) & (a + b<=1)
+
+    pnts = v0 + a[:, None] * (v1 - v0) + b[:, None] * (v2 - v0)
+    d = np.sum((p0 + np.matmul(index.V[inds], ab[..., None])[..., 0] - g)**2, axis=1)
+
+    # otherwise project the pixel on the closest of the three edges
+    out = np.flatnonzero(~inside)
+    if len(out) != 0:
+        g, p0, p1 = g[out], p0[out], p1[out]
+        e = index.edges[inds[out]]
+        n = index.sqnorms[inds[out]]
+        r = np.stack((g - p0, g - p0, g - p1), axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t = np.clip(np.matmul(e[:, :, None, :], r[..., None])[..., 0, 0] / n, 0, 1)
+        origins = np.stack((p0, p0, p1), axis=1)
+        dists = np.sum((t[..., None] * e + origins - g[:, None, :])**2, axis=2)
+        d1, d2, d3 = dists[:, 0], dists[:, 1], dists[:, 2]
+
+        first = (d1 < d2) & (d1 < d3)
+        second = ~first & (d2 < d3)
+        v0, v1, v2 = v0[out], v1[out], v2[out]
+        pnts[out] = np.where(first[:, None], v0 + t[:, 0, None] * (v1 - v0),
+                             np.where(second[:, None], v0 + t[:, 1, None] * (v2 - v0), v1 + t[:, 2, None] * (v2 - v1)))
+        d[out] = np.where(first, d1, np.where(second, d2, d3))
+
+    return pnts, d
+
+def _sequential_argmin(rows, d):
+    """Index of the winner per row, reproducing `np.min` over `xyznode` objects (compared with `<=`)
+
+    The reduction keeps the earliest minimum, except that a NaN distance is always
+    replaced by the next candidate, so only the candidates after the last NaN compete.
+    """
+    starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+    ends = np.r_[starts[1:], len(rows)]
+    pos = np.arange(len(rows))
+    last_nan = np.maximum.reduceat(np.where(np.isnan(d), pos, -1), starts)
+    # the winning NaN when it is the last candidate of its row, else the first candidate after it
+    first = np.where(last_nan == -1, starts, np.minimum(last_nan + 1, ends - 1))
+    valid = pos >= np.repeat(first, ends - starts)
+    key = np.where(np.isnan(d), np.inf, d)
+    # earliest minimum among the valid candidates: sort by (row, validity, distance, position)
+    order = np.lexsort((pos, key, ~valid, rows))
+    return order[starts]
+
 def get_image_mask_actor_scalars(actor):
-    input = actor.GetMapper().GetInput()
+    # a textured image actor keeps its pixels in the texture, not in the quad it is mapped on
+    input = actor.GetTexture().GetInput() if actor.GetTexture() is not None else actor.GetMapper().GetInput()
     shape = input.GetDimensions()[::-1]
     point_data = input.GetPointData().GetScalars()
     point_array = vtknp.vtk_to_numpy(point_data)
@@ -362,31 +669,117 @@ def get_image_mask_actor_scalars(actor):
     scalars = point_array.reshape(*shape[1:], point_array.shape[-1])
     return scalars
 
-def get_mesh_actor_vertices_faces(actor):
-    input = actor.GetMapper().GetInput()
-    points = input.GetPoints().GetData()
-    cells = input.GetPolys().GetData()
-    vertices = vtknp.vtk_to_numpy(points)
-    """
-    # popular presentation
-    Triangle 1: (0, 1, 2)
-    Triangle 2: (3, 4, 5)
-    Triangle 3: (6, 7, 8)
-    Triangle 4: (9, 10, 11)
-
-    # When PyVista converts this mesh into a vtkPolyData object, the faces are represented as a list of vertex indices and the number of vertices in each face:
-    Face 1: (3, 0, 1, 2)
-    Face 2: (3, 3, 4, 5)
-    Face 3: (3, 6, 7, 8)
-    Face 4: (3, 9, 10, 11)
+# geometry records of the mesh actors, dropped together with their actors
+_actor_geometry = weakref.WeakKeyDictionary()
+
+def get_mesh_actor_geometry(actor):
+    """Cached geometry record of a mesh actor, read again only when its polydata is modified
+
+    The record holds read-only zero-copy views of the VTK arrays: the vertices, the faces
+    (a view of the connectivity when every cell is a triangle) and the point scalars, so
+    the exports and the solves that ask for them again do no conversion. The record is
+    keyed by the actor and invalidated by the `GetMTime` of its input, which VTK bumps
+    whenever the points, the cells or the point data change.
     """
-    faces = vtknp.vtk_to_numpy(cells).reshape((-1, 4))
-    faces = faces[:, 1:] # trim the first element in each row
-    return vertices, faces
+    input = actor.GetMapper().GetInput()
+    record = _actor_geometry.get(actor)
+    if record is not None and record["input"] is input and record["mtime"] == input.GetMTime(): return record
+
+    vertices = vtknp.vtk_to_numpy(input.GetPoints().GetData())
+    polys = input.GetPolys()
+    offsets = vtknp.vtk_to_numpy(polys.GetOffsetsArray())
+    if np.all(np.diff(offsets) == 3): faces = vtknp.vtk_to_numpy(polys.GetConnectivityArray()).reshape((-1, 3))
+    else:
+        # the legacy cell array is (3, i, j, k) per triangle, trim the first element in each row
+        faces = vtknp.vtk_to_numpy(polys.GetData()).reshape((-1, 4))[:, 1:]
+    scalars = input.GetPointData().GetScalars()
+    if scalars is not None: scalars = vtknp.vtk_to_numpy(scalars)
+
+    for array in (vertices, faces, scalars):
+        # the views share the memory of the actor, editing them would bypass GetMTime
+        if array is not None: array.flags.writeable = False
+    record = _actor_geometry[actor] = {"input": input, "mtime": input.GetMTime(), "vertices": vertices, "faces": faces, "scalars": scalars}
+    return record
+
+def get_mesh_actor_vertices_faces(actor):
+    record = get_mesh_actor_geometry(actor)
+    return record["vertices"], record["faces"]
 
 def get_mesh_actor_scalars(actor):
+    return get_mesh_actor_geometry(actor)["scalars"]
+
+def get_mesh_actor_polydata(actor):
+    """A new polydata sharing the points and the triangles of a mesh actor, without its colors"""
     input = actor.GetMapper().GetInput()
-    point_data = input.GetPointData()
-    scalars = point_data.GetScalars()
-    if scalars is not None: scalars = vtknp.vtk_to_numpy(scalars)
-    return scalars
+    mesh_data = pv.PolyData()
+    mesh_data.SetPoints(input.GetPoints())
+    mesh_data.SetPolys(input.GetPolys())
+    return mesh_data
+
+def encode_face_ids(n_faces):
+    # index + 1 in 24 bits over (r, g, b), black stays the background
+    ids = np.arange(1, n_faces + 1, dtype=np.uint32)
+    assert n_faces < 2**24, "the face ids are encoded in 24 bits"
+    return np.stack((ids & 0xff, (ids >> 8) & 0xff, ids >> 16), axis=1).astype(np.uint8)
+
+def decode_face_ids(image):
+    """Triangle index per pixel of a render of `encode_face_ids` colors, -1 for the background, shape (H, W)"""
+    image = image[..., :3].astype(np.int64)
+    return (image[..., 0] | (image[..., 1] << 8) | (image[..., 2] << 16)) - 1
+
+def get_mesh_actor_face_ids(actor, session, camera):
+    """Triangle id buffer of a mesh actor at its user_matrix, rendered in `session` (a `vis.render.RenderSession` without anti-aliasing)"""
+    vertices, faces = get_mesh_actor_vertices_faces(actor)
+    session.set_face_ids("face_ids", vertices, faces, user_matrix=actor.user_matrix)
+    return decode_face_ids(session.show(["face_ids"], camera))
+
+def pick_surface_points(face_ids, vertices, faces, camera_intrinsics, pose, camera_position, mask=None):
+    """Exact surface point under every pixel of a triangle id buffer
+
+    The ray through the pixel center is intersected with the plane of the triangle of the
+    pixel, all pixels at once, and the barycentric coordinates of the hit interpolate the
+    vertices in the mesh frame, so no color has to be inverted.
+
+    Parameters
+    ----------
+    face_ids (np.ndarray)
+        Triangle index per pixel from `get_mesh_actor_face_ids` or `decode_face_ids`, shape (H, W)
+    vertices, faces (np.ndarray)
+        Mesh in its own frame, shapes (N, 3) and (F, 3)
+    pose (np.ndarray)
+        Transformation matrix the mesh was rendered with, shape (4, 4)
+    mask (np.ndarray)
+        Pixels to pick, e.g. the colored pixels of a color mask, all the mesh pixels by default
+
+    Returns
+    -------
+    pts3d (np.ndarray)
+        Surface points in the mesh frame, shape (M, 3)
+    pts2d (np.ndarray)
+        (x, y) pixel centers the rays went through, shape (M, 2)
+
+    """
+    select = face_ids != -1
+    if mask is not None: select &= mask.reshape(select.shape).astype(bool)
+    y, x = np.nonzero(select)
+    triangles = vertices[faces[face_ids[y, x]]]
+
+    # the App camera axes are the world axes, the rays start at the camera position
+    a, b, c = (transform_vertices(triangles[:, i], pose) - np.asarray(camera_position, dtype=np.float64) for i in range(3))
+    rays = np.stack(((x + 0.5 - camera_intrinsics[0, 2]) / camera_intrinsics[0, 0], (y + 0.5 - camera_intrinsics[1, 2]) / camera_intrinsics[1, 1], np.ones(len(x))), axis=1)
+
+    # Moller-Trumbore with the origin at the camera
+    e1, e2 = b - a, c - a
+    p = np.cross(rays, e2)
+    det = np.einsum("ij,ij->i", e1, p)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        l1 = np.einsum("ij,ij->i", -a, p) / det
+        l2 = np.einsum("ij,ij->i", rays, np.cross(-a, e1)) / det
+    # the pixel centers on the triangle edges may fall a bit outside of the triangle the GPU picked
+    l1, l2 = np.clip(np.nan_to_num(l1), 0, 1), np.clip(np.nan_to_num(l2), 0, 1)
+    l2 = np.minimum(l2, 1 - l1)
+    barycentric = np.stack((1 - l1 - l2, l1, l2), axis=1)
+
+    pts3d = np.einsum("ni,nij->nj", barycentric, triangles)
+    return pts3d, np.stack((x + 0.5, y + 0.5), axis=1)
+